@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Atomic File Writes for BABS10
+Crash-safe replacement of backup files such as data_backup.json. Content is
+written to a temp file in the same directory, fsynced and renamed over the
+target, so readers only ever see the old or the new file, never a truncated
+one. A ``<file>.sha256`` sidecar records the checksum and size of the new
+content, and a ``<file>.lock`` file lock keeps concurrent writers (the
+backup and data sync services) from interleaving.
+
+Usage:
+    with AtomicFile("data_backup.json") as tmp:
+        write_backup(tmp.tmp_path, all_data, codec_for_path("data_backup.json"))
+        # tmp.discard() keeps the current file untouched
+
+    if verify_checksum("data_backup.json") is False:
+        ...  # torn or corrupt snapshot, do not restore from it
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+CHUNK_SIZE = 1024 * 1024
+
+def checksum_path(path):
+    return f"{path}.sha256"
+
+def file_sha256(path):
+    """SHA-256 hex digest and size of a file"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an advisory lock on ``<path>.lock`` for the duration of the block
+
+    Only writers create the lock file. A shared lock on a file that no
+    writer has locked yet is skipped, so reading a backup never leaves a
+    lock file next to it.
+    """
+    lock_path = f"{path}.lock"
+    if shared and not os.path.exists(lock_path):
+        yield
+        return
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _fsync_directory(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _replace_durably(tmp_path, path):
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class AtomicFile:
+    """Context manager that atomically replaces ``path`` with a temp file's content
+
+    The exclusive lock is held from entry until the new file and its checksum
+    sidecar are in place. The temp file is removed instead of committed when
+    the block raises or ``discard()`` is called.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.tmp_path = None
+        self._lock = None
+        self._discarded = False
+
+    def __enter__(self):
+        self._lock = file_lock(self.path)
+        self._lock.__enter__()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, self.tmp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=directory
+        )
+        os.close(fd)
+        return self
+
+    def discard(self):
+        self._discarded = True
+
+    def commit(self):
+        checksum, size = file_sha256(self.tmp_path)
+        _replace_durably(self.tmp_path, self.path)
+
+        sidecar_path = checksum_path(self.path)
+        sidecar_tmp = f"{sidecar_path}.tmp"
+        with open(sidecar_tmp, "w") as f:
+            json.dump({"sha256": checksum, "size": size}, f)
+        _replace_durably(sidecar_tmp, sidecar_path)
+        _fsync_directory(self.path)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and not self._discarded:
+                self.commit()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+            self._lock.__exit__(exc_type, exc, tb)
+
+def verify_checksum(path):
+    """Check ``path`` against its sidecar under a shared lock
+
+    Returns True when the checksum matches, False when it does not (a torn or
+    corrupted file) and None for files written before sidecars existed.
+    """
+    if not os.path.exists(checksum_path(path)):
+        return None
+    with file_lock(path, shared=True):
+        try:
+            with open(checksum_path(path), "r") as f:
+                expected = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return False
+        checksum, size = file_sha256(path)
+    return checksum == expected.get("sha256") and size == expected.get("size")
@@ -4,7 +4,6 @@ Automatic Backup Service for BABS10
 This service continuously monitors the backend and creates local backups
 """
 
-import json
 import requests
 import time
 import datetime
@@ -13,10 +12,14 @@ import signal
 import sys
 from pathlib import Path
 
+from backup_store import ContentAddressedStore
+
 # Configuration
 BACKEND_URL = "https://babs10.onrender.com/api"
 BACKUP_DIR = "auto_backups"
 BACKUP_INTERVAL = 300  # 5 minutes
+STORE_DIR = f"{BACKUP_DIR}/store"  # Content-addressed snapshot store
+KEEP_SNAPSHOTS = 500  # Restore points kept in the store
 LOG_FILE = "auto_backup.log"
 
 def log_message(message):
@@ -91,17 +94,13 @@ def create_backup():
                 all_data["customers"].extend(customers)
                 log_message(f"📊 User {user['email']}: {len(customers)} customers")
         
-        # Create timestamped backup file
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{BACKUP_DIR}/auto_backup_{timestamp}.json"
-        
-        with open(backup_filename, 'w') as f:
-            json.dump(all_data, f, indent=2)
+        # Store the snapshot; unchanged records are shared with earlier ones
+        snapshot_id, new_objects = ContentAddressedStore(STORE_DIR).put_snapshot(all_data)
         
-        log_message(f"✅ Backup created: {backup_filename}")
+        log_message(f"✅ Backup snapshot stored: {snapshot_id} ({new_objects} new records)")
         log_message(f"📊 Total customers backed up: {len(all_data['customers'])}")
         
-        # Keep only last 10 backups to save space
+        # Bound the number of restore points to save space
         cleanup_old_backups()
         
         return True
@@ -111,8 +110,12 @@ def create_backup():
         return False
 
 def cleanup_old_backups():
-    """Keep only the last 10 backup files"""
+    """Prune old snapshots and keep only the last 10 legacy backup files"""
     try:
+        deleted_snapshots, deleted_objects = ContentAddressedStore(STORE_DIR).prune(KEEP_SNAPSHOTS)
+        if deleted_snapshots:
+            log_message(f"🗑️ Pruned {deleted_snapshots} old snapshots and {deleted_objects} unreferenced records")
+        
         backup_files = sorted(Path(BACKUP_DIR).glob("auto_backup_*.json"))
         if len(backup_files) > 10:
             files_to_delete = backup_files[:-10]
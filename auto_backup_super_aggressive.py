@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 """
 Super Aggressive Auto-Backup Service for BABS10
-This service creates backups every 2 minutes to ensure maximum data protection
+This service backs up within seconds of every data change
+
+The service long-polls the backend's /backup/changes feed and backs up only
+after a write, coalescing bursts of edits, so nothing runs while the data is
+idle. Backends without the feed are backed up every 2 minutes as before.
+
+Backups are incremental: snapshots go into a content-addressed store where
+unchanged records are shared with earlier snapshots, so each backup only adds
+the records changed since the previous one, and nothing is written at all
+when the data is unchanged. Only the changed records are downloaded too: the
+backend's /changes log is replayed on top of the previous snapshot, and the
+full /export is only read for the first backup or when the log cannot cover
+the gap (backend restart, expired entries, very large bursts).
 """
 
 import json
-import requests
 import time
 import datetime
 import os
@@ -13,12 +24,31 @@ import signal
 import sys
 from pathlib import Path
 
+from atomic_file import AtomicFile
+from backup_codec import BackupWriter, codec_for_path
+from backup_store import ContentAddressedStore, RECORD_KINDS
+from http_client import BackendClient
+
 # Configuration
 BACKEND_URL = "https://babs10-backend.vercel.app/api"  # Use Vercel backend (more reliable)
 BACKUP_DIR = "auto_backups_super"
-BACKUP_INTERVAL = 120  # 2 minutes instead of 5
+BACKUP_INTERVAL = 120  # Fixed interval when the backend has no change feed
+LONG_POLL_TIMEOUT = 25  # Seconds one change feed poll waits for a write
+BACKUP_DEBOUNCE = 3  # Seconds to let a burst of edits settle before backing up
+BACKUP_RETRY_DELAY = 30  # Seconds before retrying a failed change-driven backup
 LOG_FILE = "auto_backup_super_aggressive.log"
 MAIN_BACKUP_FILE = "data_backup.json"  # Main backup file for auto-restore
+STORE_DIR = f"{BACKUP_DIR}/store"  # Content-addressed snapshot store
+STATE_FILE = f"{BACKUP_DIR}/backup_state.json"  # Latest snapshot id and record fingerprints
+KEEP_SNAPSHOTS = 500  # Restore points kept in the store
+CHANGES_PAGE_SIZE = 1000  # Change log entries fetched per /changes request
+MAX_INCREMENTAL_CHANGES = 5000  # Beyond this many changes a full export is cheaper
+
+client = BackendClient(BACKEND_URL)  # Pooled keep-alive connections, retries and bounded concurrency
+
+# Last seen change feed position; ``retry_at`` defers polling a backend without the feed,
+# and ``pending`` marks changes that were seen but not yet backed up
+feed_state = {"epoch": None, "seq": None, "retry_at": 0.0, "pending": False}
 
 def log_message(message):
     """Log message to file and print to console"""
@@ -38,10 +68,36 @@ def create_backup_directory():
     Path(BACKUP_DIR).mkdir(exist_ok=True)
     log_message(f"📁 Backup directory: {BACKUP_DIR}")
 
+def iter_remote_records():
+    """Yield ``(type, data)`` records from the backend as they arrive
+
+    Uses the streamed /export endpoint when available and falls back to the
+    per-user crawl otherwise; users are always yielded before customers.
+    """
+    response = client.get("/export", timeout=60, stream=True)
+    if response.status_code == 200:
+        for line in response.iter_lines():
+            if line:
+                record = json.loads(line)
+                yield record["type"], record["data"]
+        return
+    
+    log_message(f"⚠️ Export endpoint unavailable: {response.status_code}")
+    users = get_all_users()
+    for user in users:
+        yield "user", user
+    for user, customers in client.fetch_customers(users):
+        if isinstance(customers, Exception):
+            log_message(f"❌ Error fetching customers for user {user['id']}: {customers}")
+            continue
+        log_message(f"📊 User {user['email']}: {len(customers)} customers")
+        for customer in customers:
+            yield "customer", customer
+
 def get_all_users():
     """Fetch all users from backend"""
     try:
-        response = requests.get(f"{BACKEND_URL}/users", timeout=30)
+        response = client.get("/users")
         if response.status_code == 200:
             return response.json()
         else:
@@ -51,71 +107,207 @@ def get_all_users():
         log_message(f"❌ Error fetching users: {e}")
         return []
 
-def get_customers_for_user(user_id):
-    """Fetch customers for a specific user"""
+def load_backup_state():
+    """Load the fingerprints of the last stored snapshot, or None"""
     try:
-        response = requests.get(f"{BACKEND_URL}/customers?user_id={user_id}", timeout=30)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            log_message(f"❌ Failed to fetch customers for user {user_id}: {response.status_code}")
-            return []
+        with open(STATE_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
     except Exception as e:
-        log_message(f"❌ Error fetching customers for user {user_id}: {e}")
-        return []
+        log_message(f"⚠️ Ignoring unreadable backup state: {e}")
+        return None
+
+def save_backup_state(state):
+    with AtomicFile(STATE_FILE) as state_file:
+        with open(state_file.tmp_path, 'w') as f:
+            json.dump(state, f)
+
+def diff_records(previous, current):
+    """Count records changed and deleted per kind since ``previous``"""
+    changed = 0
+    deleted = 0
+    for kind in RECORD_KINDS:
+        before = previous.get(kind, {})
+        after = current[kind]
+        changed += sum(1 for record_id, digest in after.items() if before.get(record_id) != digest)
+        deleted += sum(1 for record_id in before if record_id not in after)
+    return changed, deleted
+
+def changes_head():
+    """The change log position a full export covers, or None without /changes
+
+    Read before the export starts, so replaying from it later repeats at
+    most a few writes the export already saw; replaying them is harmless.
+    """
+    response = client.get("/changes", params={"since": 0, "limit": 1})
+    if response.status_code != 200:
+        return None
+    page = response.json()
+    return {"epoch": page["epoch"], "seq": page["head"]}
+
+def fetch_changes(position):
+    """Page through the change log after ``position``
+
+    Returns ``(changes, new_position)``, or None when the log cannot bring
+    the previous snapshot up to date and a full export is needed.
+    """
+    changes = []
+    seq = position["seq"]
+    while True:
+        response = client.get("/changes", params={"since": seq, "limit": CHANGES_PAGE_SIZE})
+        if response.status_code != 200:
+            return None
+        page = response.json()
+        if page["epoch"] != position["epoch"] or page["truncated"]:
+            return None
+        changes.extend(page["changes"])
+        if len(changes) > MAX_INCREMENTAL_CHANGES:
+            return None
+        seq = page["next"]
+        if not page["has_more"]:
+            return changes, {"epoch": page["epoch"], "seq": seq}
+
+def collect_updates(changes):
+    """Reduce change log entries to the latest state of each touched record
+
+    Returns ``(users, customers, orders)``: user and customer documents by id
+    (None for a deleted customer), and per customer id the order writes made
+    after its latest full document.
+    """
+    users = {}
+    customers = {}
+    orders = {}
+    for change in changes:
+        if change["collection"] == "users":
+            users[change["id"]] = change["doc"]
+        elif change["collection"] == "customers":
+            customers[change["id"]] = change.get("doc") if change["op"] != "delete" else None
+            orders.pop(change["id"], None)
+        elif change["collection"] == "orders":
+            order = dict(change["doc"])
+            customer_id = order.pop("customer_id")
+            orders.setdefault(customer_id, []).append((change["op"], change["id"], order))
+    return users, customers, orders
+
+def apply_order_changes(customer, order_changes):
+    """A copy of ``customer`` with order writes applied in sequence"""
+    orders = list(customer.get("orders") or [])
+    for op, order_id, order in order_changes:
+        index = next((i for i, existing in enumerate(orders) if existing.get("id") == order_id), None)
+        if op == "delete":
+            if index is not None:
+                del orders[index]
+        elif index is None:
+            orders.append(order)
+        else:
+            orders[index] = order
+    return {**customer, "orders": orders}
+
+def iter_updated_records(store, snapshot_id, changes):
+    """Yield ``(type, data)`` records of ``snapshot_id`` with ``changes`` applied
+
+    Reads the previous snapshot from the local store, so only the changed
+    records ever came over the network. Users come before customers, as in
+    /export.
+    """
+    users, customers, orders = collect_updates(changes)
+    for _, user in store.iter_snapshot(snapshot_id, kinds=("users",)):
+        yield "user", users.pop(user.get("id"), user)
+    for user in users.values():
+        yield "user", user
+    
+    for _, customer in store.iter_snapshot(snapshot_id, kinds=("customers",)):
+        customer_id = customer.get("id")
+        customer = customers.pop(customer_id, customer)
+        if customer is not None:
+            yield "customer", apply_order_changes(customer, orders.pop(customer_id, []))
+    for customer_id, customer in customers.items():
+        if customer is not None:
+            yield "customer", apply_order_changes(customer, orders.pop(customer_id, []))
+
+def load_latest_snapshot():
+    """Rebuild the newest full snapshot from the backup store"""
+    return ContentAddressedStore(STORE_DIR).load_snapshot()
 
 def create_backup():
-    """Create a complete backup of all data"""
+    """Create an incremental backup of all data
+
+    Records stream into the main backup file and the snapshot store, so
+    memory use does not grow with the dataset; only record ids and content
+    hashes are kept to detect changes. After the first backup they come
+    from the previous snapshot plus the change log, and from the API only
+    when the log cannot cover the gap. The main backup file is replaced
+    atomically under its lock, so the data sync service never interleaves
+    with it and a crash never leaves a truncated file.
+    """
     try:
         log_message("🔄 Starting super aggressive backup...")
         
-        # Get all users
-        users = get_all_users()
-        if not users:
-            log_message("⚠️ No users found, skipping backup")
-            return False
-        
-        log_message(f"👥 Found {len(users)} users")
-        
-        # Get customers for each user
-        all_data = {
+        metadata = {
             "backup_created": datetime.datetime.now().isoformat(),
             "backup_type": "super_aggressive_auto",
-            "backup_interval_minutes": BACKUP_INTERVAL / 60,
-            "users": users,
-            "customers": []
+            "backup_interval_minutes": BACKUP_INTERVAL / 60
         }
+        store = ContentAddressedStore(STORE_DIR)
+        snapshot = store.snapshot_writer(metadata)
+        fingerprints = {kind: {} for kind in RECORD_KINDS}
+        kinds = {"user": "users", "customer": "customers"}
         
-        total_customers = 0
-        for user in users:
-            user_id = user.get('id')
-            if user_id:
-                customers = get_customers_for_user(user_id)
-                all_data["customers"].extend(customers)
-                total_customers += len(customers)
-                log_message(f"📊 User {user['email']}: {len(customers)} customers")
-        
-        log_message(f"🏪 Total customers across all users: {total_customers}")
-        
-        # Create timestamped backup file
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{BACKUP_DIR}/super_backup_{timestamp}.json"
-        
-        with open(backup_filename, 'w') as f:
-            json.dump(all_data, f, indent=2)
+        state = load_backup_state()
+        has_previous = state is not None and state.get("snapshot") in store.list_snapshots()
+        fetched = fetch_changes(state["changes"]) if has_previous and state.get("changes") else None
+        if fetched is not None:
+            changes, position = fetched
+            if not changes:
+                log_message("💤 No changes since last backup, nothing written")
+                return True
+            log_message(f"📥 Replaying {len(changes)} changes onto snapshot {state['snapshot']}")
+            records = iter_updated_records(store, state["snapshot"], changes)
+        else:
+            if has_previous and state.get("changes"):
+                log_message("⚠️ Change log does not cover the gap since the last backup, reading a full export")
+            position = changes_head()
+            records = iter_remote_records()
         
-        log_message(f"✅ Super backup created: {backup_filename}")
+        with AtomicFile(MAIN_BACKUP_FILE) as main_backup:
+            with BackupWriter(main_backup.tmp_path, metadata, codec_for_path(MAIN_BACKUP_FILE)) as writer:
+                for record_type, data in records:
+                    if record_type not in kinds:
+                        continue
+                    kind = kinds[record_type]
+                    writer.write(record_type, data)
+                    digest = snapshot.add(kind, data)
+                    if data.get('id'):
+                        fingerprints[kind][data['id']] = digest
+            
+            if not writer.counts["users"]:
+                log_message("⚠️ No users found, skipping backup")
+                main_backup.discard()
+                return False
+            
+            log_message(f"👥 Found {writer.counts['users']} users")
+            log_message(f"🏪 Total customers across all users: {writer.counts['customers']}")
+            
+            if has_previous:
+                changed, deleted = diff_records(state["fingerprints"], fingerprints)
+                if not changed and not deleted:
+                    log_message("💤 No changes since last backup, nothing written")
+                    main_backup.discard()
+                    save_backup_state({**state, "changes": position})
+                    return True
+                log_message(f"🔍 {changed} records changed, {deleted} deleted since last backup")
+            
+            # Only records whose content is new were written; the rest are shared
+            snapshot_id = snapshot.commit()
+            save_backup_state({"snapshot": snapshot_id, "fingerprints": fingerprints, "changes": position})
+            log_message(f"✅ Super backup snapshot stored: {snapshot_id} ({snapshot.new_objects} new records)")
         
         # ALSO update the main backup file for auto-restore service
-        with open(MAIN_BACKUP_FILE, 'w') as f:
-            json.dump(all_data, f, indent=2)
         log_message(f"✅ Main backup file updated: {MAIN_BACKUP_FILE}")
+        log_message(f"📊 Total customers backed up: {writer.counts['customers']}")
         
-        # Count total customers
-        total_customers = len(all_data["customers"])
-        log_message(f"📊 Total customers backed up: {total_customers}")
-        
-        # Clean up old backups (keep only last 10)
+        # Clean up old snapshots and backups
         cleanup_old_backups()
         
         return True
@@ -125,8 +317,13 @@ def create_backup():
         return False
 
 def cleanup_old_backups():
-    """Clean up old backup files, keeping only the last 10"""
+    """Prune the snapshot store and legacy full backup files"""
     try:
+        deleted_snapshots, deleted_objects = ContentAddressedStore(STORE_DIR).prune(KEEP_SNAPSHOTS)
+        if deleted_snapshots:
+            log_message(f"🗑️ Pruned {deleted_snapshots} old snapshots and {deleted_objects} unreferenced records")
+        
+        # Full super_backup_*.json files are still written by the data sync service
         backup_files = []
         for file in os.listdir(BACKUP_DIR):
             if file.startswith("super_backup_") and file.endswith(".json"):
@@ -140,11 +337,81 @@ def cleanup_old_backups():
         if len(backup_files) > 10:
             for file_path, _ in backup_files[10:]:
                 os.remove(file_path)
+                for sidecar in (f"{file_path}.sha256", f"{file_path}.lock"):
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
                 log_message(f"🗑️ Deleted old backup: {os.path.basename(file_path)}")
                 
     except Exception as e:
         log_message(f"⚠️ Error cleaning up old backups: {e}")
 
+def poll_change_feed():
+    """Wait for the next change on the backend's backup feed
+
+    Returns True when a backup is due, False after an idle poll and None when
+    the backend does not offer the change feed. The first poll and a poll
+    after a backend restart (new epoch) count as due, since changes may have
+    been missed in between.
+    """
+    params = {"timeout": LONG_POLL_TIMEOUT}
+    if feed_state["seq"] is not None:
+        params["since"] = feed_state["seq"]
+    response = client.get("/backup/changes", params=params, timeout=LONG_POLL_TIMEOUT + 15)
+    if response.status_code in [404, 405]:
+        return None
+    response.raise_for_status()
+    feed = response.json()
+    
+    missed = feed["epoch"] != feed_state["epoch"] or feed.get("truncated")
+    feed_state["epoch"] = feed["epoch"]
+    feed_state["seq"] = feed["seq"]
+    if feed["changes"]:
+        log_message(f"🔔 {len(feed['changes'])} changes on the backend (seq {feed['seq']})")
+    return bool(missed or feed["changes"])
+
+def backup_on_changes():
+    """Run one change feed poll and back up if anything changed
+
+    Falls back to a backup every BACKUP_INTERVAL seconds when the feed is
+    unavailable, so a backend without it is still protected. The feed
+    position moves past a change as soon as it is seen, so a change whose
+    backup failed stays pending and is retried before polling again.
+    """
+    if feed_state["pending"]:
+        time.sleep(BACKUP_RETRY_DELAY)
+        log_message("🔁 Retrying backup of earlier changes...")
+        return backup_pending_changes()
+    
+    if time.time() < feed_state["retry_at"]:
+        time.sleep(min(1, feed_state["retry_at"] - time.time()))
+        return True
+    
+    try:
+        due = poll_change_feed()
+    except Exception as e:
+        log_message(f"⚠️ Change feed unavailable ({e}), using {BACKUP_INTERVAL}s interval backups")
+        due = None
+    
+    if due is None:
+        feed_state["retry_at"] = time.time() + BACKUP_INTERVAL
+        # Re-subscribe from scratch once the feed is back
+        feed_state["epoch"] = None
+        feed_state["seq"] = None
+        return create_backup()
+    if not due:
+        return True
+    
+    # Let a burst of edits settle so it ends up in one snapshot
+    feed_state["pending"] = True
+    time.sleep(BACKUP_DEBOUNCE)
+    return backup_pending_changes()
+
+def backup_pending_changes():
+    """Back up the changes seen on the feed; they stay pending if the backup fails"""
+    backed_up = create_backup()
+    feed_state["pending"] = not backed_up
+    return backed_up
+
 def main():
     """Main backup service loop"""
     log_message("🚀 BABS10 Super Aggressive Auto-Backup Service Starting...")
@@ -160,29 +427,13 @@ def main():
     # Create backup directory
     create_backup_directory()
     
-    # Create initial backup
-    log_message("🔄 Creating initial super backup...")
-    if create_backup():
-        log_message("✅ Initial backup completed successfully")
-    else:
-        log_message("❌ Initial backup failed")
-    
-    backup_count = 0
+    # The first feed poll always backs up, so there is an initial backup
+    log_message("🔔 Subscribing to backend change feed...")
     
     # Main backup loop
     while True:
         try:
-            time.sleep(BACKUP_INTERVAL)
-            backup_count += 1
-            
-            log_message(f"🔄 Super backup #{backup_count}...")
-            
-            if create_backup():
-                log_message(f"✅ Super backup #{backup_count} completed successfully")
-            else:
-                log_message(f"❌ Super backup #{backup_count} failed")
-            
-            log_message(f"⏳ Waiting {BACKUP_INTERVAL} seconds until next backup...")
+            backup_on_changes()
             
         except KeyboardInterrupt:
             log_message("🛑 Manual stop requested")
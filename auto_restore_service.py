@@ -5,7 +5,6 @@ This service automatically restores data when the backend wakes up from sleep
 """
 
 import json
-import requests
 import time
 import datetime
 import os
@@ -13,11 +12,18 @@ import signal
 import sys
 from pathlib import Path
 
+from atomic_file import verify_checksum
+from backup_codec import iter_backup, ndjson_lines, read_backup, summarize_backup
+from http_client import BackendClient
+
 # Configuration
 BACKEND_URL = "https://babs10.onrender.com/api"
 BACKUP_FILE = "data_backup.json"
 CHECK_INTERVAL = 60  # Check every minute
 LOG_FILE = "auto_restore.log"
+DEFAULT_PIN = "2222"  # Backups carry no PINs, so restored users get this one
+
+client = BackendClient(BACKEND_URL)  # Pooled keep-alive connections, retries and bounded concurrency
 
 def log_message(message):
     """Log message to file and print to console"""
@@ -32,23 +38,51 @@ def log_message(message):
     except Exception as e:
         print(f"Error writing to log: {e}")
 
+def count_exported_data():
+    """Count users and customers from one streamed /export request
+
+    Returns a ``(users, customers)`` count tuple, or None when the backend does
+    not offer /export.
+    """
+    try:
+        response = client.get("/export", stream=True)
+        if response.status_code != 200:
+            return None
+        
+        counts = {"user": 0, "customer": 0}
+        for line in response.iter_lines():
+            if not line:
+                continue
+            record_type = json.loads(line)["type"]
+            if record_type in counts:
+                counts[record_type] += 1
+        return counts["user"], counts["customer"]
+    except Exception as e:
+        log_message(f"⚠️ Error exporting backend data: {e}")
+        return None
+
 def check_backend_data():
     """Check if backend has data"""
     try:
+        exported = count_exported_data()
+        if exported is not None:
+            user_count, total_customers = exported
+            if user_count > 0:
+                log_message(f"✅ Backend has data: {user_count} users, {total_customers} customers")
+                return True, user_count, total_customers
+            log_message("⚠️  Backend has no users")
+            return False, 0, 0
+        
         # Check users endpoint
-        response = requests.get(f"{BACKEND_URL}/users", timeout=10)
+        response = client.get("/users", timeout=10)
         if response.status_code == 200:
             users = response.json()
             if len(users) > 0:
-                # Check if users have customers
+                # Check if users have customers, fetching them concurrently
                 total_customers = 0
-                for user in users:
-                    user_id = user.get('id')
-                    if user_id:
-                        customer_response = requests.get(f"{BACKEND_URL}/customers?user_id={user_id}", timeout=10)
-                        if customer_response.status_code == 200:
-                            customers = customer_response.json()
-                            total_customers += len(customers)
+                for user, customers in client.fetch_customers(users):
+                    if not isinstance(customers, Exception):
+                        total_customers += len(customers)
                 
                 log_message(f"✅ Backend has data: {len(users)} users, {total_customers} customers")
                 return True, len(users), total_customers
@@ -62,6 +96,60 @@ def check_backend_data():
         log_message(f"❌ Error checking backend data: {e}")
         return False, 0, 0
 
+def import_records(backup_file):
+    """Lazily turn backup records into /import records
+
+    The metadata record is dropped, users get the default PIN and customers
+    saved without a ``user_id`` are given to the first user, as the
+    record-by-record restore does.
+    """
+    fallback_user_id = None
+    for record_type, data in iter_backup(backup_file):
+        if record_type == "user":
+            fallback_user_id = fallback_user_id or data['id']
+            yield "user", {"id": data['id'], "email": data['email'], "pin": DEFAULT_PIN}
+        elif record_type == "customer":
+            yield "customer", {
+                "user_id": data.get('user_id') or fallback_user_id,
+                "name": data['name'],
+                "money_given": data.get('money_given', 0.0),
+                "total_spent": data.get('total_spent', 0.0),
+                "orders": data.get('orders', [])
+            }
+
+def import_backup(backup_file, customer_count):
+    """Restore users and customers with one bulk /import request
+
+    The backup is streamed to the backend as chunked NDJSON, so it is never
+    loaded into memory here. Returns None when the backend does not offer
+    /import so the caller can fall back to creating records one by one.
+    """
+    # A streamed body cannot be replayed, so this request is sent once without retries
+    response = client.session.post(
+        f"{BACKEND_URL}/import",
+        data=ndjson_lines(import_records(backup_file)),
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=300
+    )
+    if response.status_code in [404, 405]:
+        log_message("⚠️ Import endpoint unavailable, restoring record by record")
+        return None
+    if response.status_code != 200:
+        log_message(f"❌ Bulk import failed: {response.status_code}")
+        return False
+    
+    summary = response.json().get('summary', {})
+    for record_type in ("user", "customer"):
+        counts = summary.get(record_type, {})
+        log_message(
+            f"📊 {record_type.capitalize()}s: {counts.get('created', 0)} created, "
+            f"{counts.get('exists', 0)} already present, {counts.get('failed', 0)} failed"
+        )
+    customer_counts = summary.get("customer", {})
+    restored_customers = customer_counts.get('created', 0) + customer_counts.get('exists', 0)
+    log_message(f"🎉 Data restoration completed! Restored {restored_customers}/{customer_count} customers")
+    return True
+
 def restore_data():
     """Restore data from backup"""
     try:
@@ -69,27 +157,38 @@ def restore_data():
             log_message(f"❌ Backup file not found: {BACKUP_FILE}")
             return False
         
+        # Never restore from a torn or corrupted snapshot
+        checksum_ok = verify_checksum(BACKUP_FILE)
+        if checksum_ok is False:
+            log_message(f"❌ Backup file {BACKUP_FILE} failed its checksum, refusing to restore")
+            return False
+        if checksum_ok is None:
+            log_message(f"⚠️ No checksum for {BACKUP_FILE}, restoring from an unverified backup")
+        
         log_message("🔄 Starting automatic data restoration...")
         
-        # Load backup data
-        with open(BACKUP_FILE, 'r') as f:
-            backup_data = json.load(f)
+        summary = summarize_backup(BACKUP_FILE)
+        log_message(f"📊 Backup contains: {summary['users']} users, {summary['customers']} customers")
+        
+        imported = import_backup(BACKUP_FILE, summary['customers'])
+        if imported is not None:
+            return imported
         
+        # Load backup data for the record-by-record fallback
+        backup_data = read_backup(BACKUP_FILE)
         users = backup_data.get('users', [])
         customers = backup_data.get('customers', [])
         
-        log_message(f"📊 Backup contains: {len(users)} users, {len(customers)} customers")
-        
         # Create users
         user_map = {}  # Map old user IDs to new ones
         for user in users:
             try:
                 user_data = {
                     "email": user['email'],
-                    "pin": "2222"  # Default PIN
+                    "pin": DEFAULT_PIN
                 }
                 
-                response = requests.post(f"{BACKEND_URL}/users", json=user_data, timeout=30)
+                response = client.request("POST", "/users", json=user_data)
                 if response.status_code in [200, 201]:
                     new_user = response.json()
                     user_map[user['id']] = new_user['id']
@@ -123,11 +222,11 @@ def restore_data():
                     "orders": customer.get('orders', [])
                 }
                 
-                response = requests.post(
-                    f"{BACKEND_URL}/customers", 
+                response = client.request(
+                    "POST",
+                    "/customers",
                     json=customer_data,
-                    params={"user_id": user_id},
-                    timeout=30
+                    params={"user_id": user_id}
                 )
                 
                 if response.status_code in [200, 201]:
@@ -146,6 +245,21 @@ def restore_data():
         log_message(f"❌ Error in restore_data: {e}")
         return False
 
+def check_and_restore():
+    """Run one data check and restore from the backup when the backend is empty"""
+    has_data, user_count, customer_count = check_backend_data()
+    
+    if has_data and user_count > 0 and customer_count > 0:
+        log_message(f"✅ Backend data intact: {user_count} users, {customer_count} customers")
+        return True
+    
+    log_message("⚠️  Backend missing data, triggering restoration...")
+    if restore_data():
+        log_message("✅ Data restoration successful!")
+        return True
+    log_message("❌ Data restoration failed")
+    return False
+
 def main():
     """Main service loop"""
     log_message("🚀 BABS10 Auto-Restore Service Starting...")
@@ -165,17 +279,7 @@ def main():
             check_count += 1
             log_message(f"🔍 Data check #{check_count}...")
             
-            # Check if backend has data
-            has_data, user_count, customer_count = check_backend_data()
-            
-            if has_data and user_count > 0 and customer_count > 0:
-                log_message(f"✅ Backend data intact: {user_count} users, {customer_count} customers")
-            else:
-                log_message("⚠️  Backend missing data, triggering restoration...")
-                if restore_data():
-                    log_message("✅ Data restoration successful!")
-                else:
-                    log_message("❌ Data restoration failed")
+            check_and_restore()
             
             log_message(f"⏳ Waiting {CHECK_INTERVAL} seconds until next check...")
             time.sleep(CHECK_INTERVAL)
@@ -1,20 +1,25 @@
 #!/usr/bin/env python3
 """
 BABS10 True System Daemon
-This runs completely independently of any user session, IDE, or terminal
+This runs completely independently of any user session, IDE, or terminal.
+Keep-alive, backup and restore run as scheduled jobs inside this one process
+(see job_scheduler.py), sharing one HTTP connection pool per backend.
 """
 
-import os
+import asyncio
 import sys
-import time
 import signal
-import subprocess
 import logging
-import atexit
 from pathlib import Path
 import daemon
 import daemon.pidfile
 
+import auto_backup_super_aggressive as auto_backup
+import auto_restore_service as auto_restore
+import keep_alive_ultra_aggressive as keep_alive
+from http_client import shared_client
+from job_scheduler import JobScheduler
+
 # Setup logging
 log_file = "babs10_system_daemon.log"
 logging.basicConfig(
@@ -26,12 +31,16 @@ logging.basicConfig(
     ]
 )
 
+STATUS_INTERVAL = 300  # Log job statistics every 5 minutes
+JOB_JITTER = 0.1  # Spread each job's interval by up to 10%
+FEED_POLL_INTERVAL = 1  # Seconds between the end of one change feed poll and the next
+
 class BABS10SystemDaemon:
     def __init__(self):
         self.running = True
-        self.processes = {}
         self.script_dir = Path(__file__).parent
         self.pid_file = self.script_dir / "babs10_daemon.pid"
+        self.scheduler = JobScheduler()
         
         # Setup signal handlers
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -43,111 +52,56 @@ class BABS10SystemDaemon:
         """Handle shutdown signals"""
         logging.info(f"📡 Received signal {signum}, shutting down gracefully...")
         self.running = False
-        self.stop_all_services()
-        
-    def start_service(self, name, script_path):
-        """Start a service with complete isolation"""
-        try:
-            if name in self.processes and self.processes[name].poll() is None:
-                logging.info(f"✅ {name} already running")
-                return True
-                
-            logging.info(f"🔄 Starting {name}...")
-            
-            # Start the service with complete isolation
-            process = subprocess.Popen(
-                [sys.executable, str(script_path)],
-                stdout=subprocess.Popen.DEVNULL,
-                stderr=subprocess.Popen.DEVNULL,
-                cwd=self.script_dir,
-                start_new_session=True,  # New session
-                preexec_fn=os.setsid,    # New process group
-                close_fds=True           # Close all file descriptors
-            )
-            
-            self.processes[name] = process
-            logging.info(f"✅ {name} started with PID {process.pid}")
-            return True
-            
-        except Exception as e:
-            logging.error(f"❌ Failed to start {name}: {e}")
-            return False
+        self.scheduler.stop()
     
-    def stop_service(self, name):
-        """Stop a specific service"""
-        if name in self.processes:
-            process = self.processes[name]
-            if process.poll() is None:  # Still running
-                logging.info(f"🛑 Stopping {name}...")
-                try:
-                    # Try graceful shutdown
-                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    process.wait(timeout=10)
-                    logging.info(f"✅ {name} stopped gracefully")
-                except (subprocess.TimeoutExpired, ProcessLookupError):
-                    logging.warning(f"⚠️ {name} didn't stop gracefully, force killing...")
-                    try:
-                        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                    except ProcessLookupError:
-                        pass
-            del self.processes[name]
+    def share_http_clients(self):
+        """Point every service module at one pooled client per backend"""
+        auto_backup.client = shared_client(auto_backup.BACKEND_URL)
+        auto_restore.client = shared_client(auto_restore.BACKEND_URL)
     
-    def stop_all_services(self):
-        """Stop all running services"""
-        logging.info("🛑 Stopping all services...")
-        for name in list(self.processes.keys()):
-            self.stop_service(name)
+    def keep_alive_ping(self):
+        """Ping the health endpoint over the shared pool; the client handles retries"""
+        base_url, path = keep_alive.BACKEND_URL.rsplit("/", 1)
+        response = shared_client(base_url).get(f"/{path}", timeout=5)
+        if response.status_code != 200:
+            logging.warning(f"❌ Backend responded with status: {response.status_code}")
+            return False
+        return True
     
-    def check_services(self):
-        """Check if all services are still running and restart if needed"""
-        for name, process in list(self.processes.items()):
-            if process.poll() is not None:  # Process died
-                logging.warning(f"⚠️ {name} died unexpectedly, restarting...")
-                del self.processes[name]
-                self.start_service(name, self.get_script_path(name))
+    def log_status(self):
+        """Log run statistics of every job"""
+        for name, status in self.scheduler.status().items():
+            if name == "status":
+                continue
+            logging.info(
+                f"📊 {name}: {status['runs']} runs, {status['failures']} failed, "
+                f"{status['skipped']} skipped, last took {status['last_duration'] or 0:.1f}s"
+            )
     
-    def get_script_path(self, service_name):
-        """Get the script path for a service"""
-        script_map = {
-            "keep_alive": "keep_alive_ultra_aggressive.py",
-            "auto_backup": "auto_backup_super_aggressive.py",
-            "auto_restore": "auto_restore_service.py"
-        }
-        return self.script_dir / script_map.get(service_name, f"{service_name}.py")
+    def schedule_services(self):
+        """Register the keep-alive, backup and restore jobs"""
+        self.share_http_clients()
+        auto_backup.create_backup_directory()
+        
+        self.scheduler.add_job("keep_alive", self.keep_alive_ping, keep_alive.PING_INTERVAL, JOB_JITTER)
+        # Each backup run long-polls the change feed, so the next one starts once it returns
+        self.scheduler.add_job(
+            "auto_backup", auto_backup.backup_on_changes, FEED_POLL_INTERVAL, JOB_JITTER, after_completion=True
+        )
+        self.scheduler.add_job("auto_restore", auto_restore.check_and_restore, auto_restore.CHECK_INTERVAL, JOB_JITTER)
+        self.scheduler.add_job("status", self.log_status, STATUS_INTERVAL, initial_delay=STATUS_INTERVAL)
     
     def run_daemon(self):
         """Run as a true system daemon"""
         logging.info("🎯 Entering daemon mode...")
         
-        # Start all services
-        services = [
-            ("keep_alive", "keep_alive_ultra_aggressive.py"),
-            ("auto_backup", "auto_backup_super_aggressive.py"),
-            ("auto_restore", "auto_restore_service.py")
-        ]
-        
-        for name, script in services:
-            self.start_service(name, self.script_dir / script)
-        
-        # Main monitoring loop
-        while self.running:
-            try:
-                # Check service health every 30 seconds
-                self.check_services()
-                
-                # Log status every 5 minutes
-                if int(time.time()) % 300 == 0:
-                    active_services = len([p for p in self.processes.values() if p.poll() is None])
-                    logging.info(f"📊 Status: {active_services}/{len(services)} services active")
-                
-                time.sleep(30)  # Check every 30 seconds
-                
-            except Exception as e:
-                logging.error(f"❌ Error in main loop: {e}")
-                time.sleep(10)
+        # All services run as jobs in this one process
+        self.schedule_services()
+        asyncio.run(self.scheduler.run())
         
         logging.info("🔄 Daemon shutting down...")
-        self.stop_all_services()
+        shared_client(auto_backup.BACKEND_URL).close()
+        shared_client(auto_restore.BACKEND_URL).close()
         logging.info("✅ Daemon shutdown complete")
     
     def run(self):
@@ -1,55 +1,522 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status
-from dotenv import load_dotenv
-from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import time
+
+# Startup profiling: STARTUP_PROFILE=1 logs these milestones (ms since this
+# module started importing) once the first request has been served
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE') == '1'
+startup_clock = time.perf_counter()
+startup_timings = {}
+
+def mark_startup(stage: str):
+    startup_timings[stage] = round((time.perf_counter() - startup_clock) * 1000, 1)
+
+import json
+import sys
+import asyncio
+import importlib
+import hashlib
+import hmac
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Optional
 import uuid
-from datetime import datetime
-from passlib.context import CryptContext
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
 import re
+mark_startup("import_stdlib")
+
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.middleware.cors import CORSMiddleware
+mark_startup("import_fastapi")
+
+from pydantic import BaseModel, Field, root_validator, validator
 from pydantic import EmailStr
+from dotenv import load_dotenv
+mark_startup("import_pydantic")
 
+# motor/pymongo/bson and passlib are imported on first use, so a cold start
+# in in-memory mode never pays for them and Mongo mode pays once at startup
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing, created on the first hash or verification
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 # MongoDB connection with fallback
 mongo_url = os.environ.get('MONGO_URL')
 db_name = os.environ.get('DB_NAME')
 
+class InMemoryCustomerStore:
+    """In-memory customer repository used when MongoDB is not available.
+
+    Customers are indexed by id (primary), by user_id (secondary) and by the
+    ``{user_id}_{name}`` uniqueness key, so lookups, updates and deletes are
+    O(1) and listing a user's customers only touches that user's records.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_user = {}
+        self._by_key = {}
+
+    @staticmethod
+    def customer_key(user_id: str, name: str) -> str:
+        return f"{user_id}_{name}"
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, customer_key: str) -> bool:
+        return customer_key in self._by_key
+
+    def values(self):
+        return self._by_id.values()
+
+    def add(self, customer: dict) -> dict:
+        customer_key = self.customer_key(customer["user_id"], customer["name"])
+        self._by_id[customer["id"]] = customer
+        self._by_user.setdefault(customer["user_id"], {})[customer["id"]] = customer
+        self._by_key[customer_key] = customer["id"]
+        return customer
+
+    def get(self, customer_id: str, user_id: str) -> Optional[dict]:
+        customer = self._by_id.get(customer_id)
+        if customer is None or customer["user_id"] != user_id:
+            return None
+        return customer
+
+    def list_for_user(self, user_id: str, after: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        user_customers = self._by_user.get(user_id, {})
+        if after is None and limit is None:
+            return list(user_customers.values())
+        # Pages are ordered by customer id so cursors stay stable across writes
+        customer_ids = sorted(customer_id for customer_id in user_customers if after is None or customer_id > after)
+        if limit is not None:
+            customer_ids = customer_ids[:limit]
+        return [user_customers[customer_id] for customer_id in customer_ids]
+
+    def put(self, customer: dict) -> dict:
+        """Insert ``customer`` or replace the stored customer with the same id"""
+        existing = self._by_id.get(customer["id"])
+        if existing is not None:
+            self.delete(existing["id"], existing["user_id"])
+        return self.add(customer)
+
+    def delete(self, customer_id: str, user_id: str) -> Optional[dict]:
+        customer = self.get(customer_id, user_id)
+        if customer is None:
+            return None
+        del self._by_id[customer_id]
+        user_customers = self._by_user[user_id]
+        del user_customers[customer_id]
+        if not user_customers:
+            del self._by_user[user_id]
+        del self._by_key[self.customer_key(user_id, customer["name"])]
+        return customer
+
+
 # In-memory storage for when MongoDB is not available
 in_memory_users = {}
+in_memory_customers = InMemoryCustomerStore()
 in_memory_status_checks = []
 
-# Initialize MongoDB variables
+MAX_STATUS_CHECKS = 1000
+DATETIME_FIELDS = ("created_at", "updated_at", "timestamp")
+
+def restore_datetimes(record: dict) -> dict:
+    """Turn ISO timestamps read back from JSON into datetimes, in place"""
+    for field in DATETIME_FIELDS:
+        if isinstance(record.get(field), str):
+            record[field] = datetime.fromisoformat(record[field])
+    return record
+
+class LocalPersistence:
+    """Write-ahead log and snapshots that make the in-memory storage durable
+
+    Every in-memory write is appended to ``wal.ndjson`` as one JSON line before
+    the request returns. The fsync runs in a worker thread and is shared by
+    every write that arrived while the previous one was in progress, so the
+    event loop never waits on the disk. Every ``snapshot_every`` writes a copy
+    of the state is written atomically to ``snapshot.json`` in a worker
+    thread, then the log entries it covers are dropped. At startup the
+    snapshot is loaded and the log replayed on top of it. Log operations are
+    idempotent puts and deletes by id, so replaying entries that a snapshot
+    already contains (a crash between the two steps) is harmless, and a torn
+    last line from a crash mid-append is dropped.
+    """
+
+    def __init__(self, directory: Path, snapshot_every: int, fsync: bool):
+        self.directory = Path(directory)
+        self.snapshot_path = self.directory / "snapshot.json"
+        self.wal_path = self.directory / "wal.ndjson"
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.wal_records = 0
+        self.snapshots = 0
+        self.recovery = {}
+        self._wal = None
+        self._written = 0
+        self._synced = 0
+        self._sync_task = None
+        self._snapshot_task = None
+
+    @staticmethod
+    def apply(op: str, data: dict):
+        if op == "put_user":
+            in_memory_users[data["email"]] = data
+        elif op == "put_customer":
+            # Entries written before the typed order schema are converted as they replay
+            migrate_customer_orders(data)
+            if "aggregates" not in data:
+                refresh_aggregates(data)
+            in_memory_customers.put(data)
+        elif op == "delete_customer":
+            in_memory_customers.delete(data["id"], data["user_id"])
+        elif op in ("put_order", "delete_order"):
+            customer = in_memory_customers.get(data["customer_id"], data["user_id"])
+            if customer is not None:
+                if op == "put_order":
+                    put_order(customer, data["order"])
+                else:
+                    remove_order(customer, data["order_id"])
+                customer["updated_at"] = data["updated_at"]
+        elif op == "put_status_check":
+            if any(check["id"] == data["id"] for check in in_memory_status_checks):
+                return
+            in_memory_status_checks.append(data)
+            del in_memory_status_checks[:-MAX_STATUS_CHECKS]
+        else:
+            raise ValueError(f"Unknown log operation: {op}")
+
+    def load(self):
+        """Rebuild the in-memory stores from the snapshot and the log"""
+        started = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            for user in snapshot.get("users", []):
+                self.apply("put_user", restore_datetimes(user))
+            for customer in snapshot.get("customers", []):
+                self.apply("put_customer", restore_datetimes(customer))
+            for status_check in snapshot.get("status_checks", []):
+                self.apply("put_status_check", restore_datetimes(status_check))
+        
+        replayed = 0
+        valid_bytes = 0
+        if self.wal_path.exists():
+            with open(self.wal_path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Dropping torn write-ahead log entry at byte {valid_bytes}")
+                        break
+                    self.apply(record["op"], restore_datetimes(record["data"]))
+                    valid_bytes += len(line)
+                    replayed += 1
+            # Cut a torn tail so new entries are not appended after garbage
+            os.truncate(self.wal_path, valid_bytes)
+        
+        self.wal_records = replayed
+        self._wal = open(self.wal_path, "ab")
+        self.recovery = {
+            "users": len(in_memory_users),
+            "customers": len(in_memory_customers),
+            "replayed_log_entries": replayed,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+        logger.info(f"Recovered local data: {self.recovery}")
+
+    async def log(self, op: str, data: dict):
+        """Durably append one write; snapshot once the log has grown enough"""
+        line = json.dumps({"op": op, "data": data}, default=json_default, separators=(",", ":"))
+        self._wal.write(line.encode("utf-8") + b"\n")
+        self._wal.flush()
+        self._written += 1
+        self.wal_records += 1
+        if self.wal_records >= self.snapshot_every and (self._snapshot_task is None or self._snapshot_task.done()):
+            self._snapshot_task = asyncio.create_task(self.snapshot_in_background())
+        if self.fsync:
+            await self._sync()
+
+    async def _sync(self):
+        """Wait until everything written so far is on disk, sharing fsyncs between writers"""
+        target = self._written
+        while self._synced < target:
+            if self._sync_task is None or self._sync_task.done():
+                self._sync_task = asyncio.create_task(self._fsync_batch())
+            await asyncio.shield(self._sync_task)
+
+    async def _fsync_batch(self):
+        covered = self._written
+        await asyncio.to_thread(os.fsync, self._wal.fileno())
+        self._synced = max(self._synced, covered)
+
+    @staticmethod
+    def capture_state() -> dict:
+        """Copy the stores so a snapshot can be serialized while requests keep writing
+
+        Writes replace records and their top-level fields, except for a
+        customer's orders list and aggregates, which order writes edit in
+        place; only those are copied below the record.
+        """
+        customers = []
+        for customer in in_memory_customers.values():
+            copied = dict(customer)
+            if isinstance(customer.get("orders"), list):
+                copied["orders"] = list(customer["orders"])
+            if isinstance(customer.get("aggregates"), dict):
+                copied["aggregates"] = dict(customer["aggregates"])
+            customers.append(copied)
+        return {
+            "users": [dict(user) for user in in_memory_users.values()],
+            "customers": customers,
+            "status_checks": list(in_memory_status_checks),
+        }
+
+    def _write_snapshot(self, state: dict):
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, default=json_default, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self.snapshots += 1
+
+    def _drop_logged(self, offset: int):
+        """Start a new log holding only the entries written after byte ``offset``"""
+        with open(self.wal_path, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+        tmp_path = self.wal_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.wal_path)
+        
+        old_wal = self._wal
+        self._wal = open(self.wal_path, "ab")
+        self.wal_records = tail.count(b"\n")
+        # An fsync in flight still uses the old file, so it is closed once that is done
+        if self._sync_task is not None and not self._sync_task.done():
+            self._sync_task.add_done_callback(lambda _: old_wal.close())
+        else:
+            old_wal.close()
+
+    async def snapshot_in_background(self):
+        """Snapshot without blocking the event loop on serialization or the disk"""
+        try:
+            state = self.capture_state()
+            offset = self._wal.tell()
+            await asyncio.to_thread(self._write_snapshot, state)
+            self._drop_logged(offset)
+        except Exception as e:
+            # The log still holds every write, so a failed snapshot loses nothing
+            logger.error(f"Error writing local snapshot: {str(e)}")
+
+    def snapshot(self):
+        """Write the full state and start an empty log, blocking; for startup and shutdown"""
+        self._write_snapshot(self.capture_state())
+        self._drop_logged(self._wal.tell())
+
+    async def close(self):
+        if self._wal is not None:
+            if self._snapshot_task is not None:
+                await self._snapshot_task
+            if self._sync_task is not None:
+                await self._sync_task
+            if self.wal_records:
+                self.snapshot()
+            self._wal.close()
+            self._wal = None
+
+    def metrics(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "log_entries": self.wal_records,
+            "snapshot_every": self.snapshot_every,
+            "snapshots": self.snapshots,
+            "recovery": self.recovery,
+        }
+
+# Storage is chosen by init_storage() at startup, before requests are served
 client = None
 db = None
 mongo_available = False
+mongo_status = {"state": "not_configured"}
+local_store = None
 
-# Only try to connect to MongoDB if explicitly configured
-if mongo_url and db_name:
+def connect_mongo() -> bool:
+    """Create the Mongo client; motor only opens connections on first use"""
+    global client, db
     try:
+        from motor.motor_asyncio import AsyncIOMotorClient
         client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
-        # Test the connection
-        client.admin.command('ping')
         db = client[db_name]
-        mongo_available = True
-        logging.info(f"Connected to MongoDB at {mongo_url}")
+        mongo_status["state"] = "connecting"
+        return True
     except Exception as e:
         logging.warning(f"Could not connect to MongoDB: {e}")
-        mongo_available = False
         client = None
         db = None
-        logging.info("Using in-memory storage for development")
-else:
-    logging.info("MongoDB not configured, using in-memory storage for development")
+        return False
+
+async def ping_mongo():
+    """Check the Mongo connection in the background so startup never waits on it"""
+    started = time.monotonic()
+    try:
+        await client.admin.command('ping')
+        mongo_status.update(state="connected", seconds=round(time.monotonic() - started, 3))
+        logging.info(f"Connected to MongoDB at {mongo_url}")
+    except Exception as e:
+        mongo_status.update(state="unreachable", error=str(e))
+        logging.warning(f"Could not reach MongoDB: {e}")
+
+def init_storage():
+    """Use Mongo when configured, otherwise the in-memory stores
+
+    The in-memory stores are made durable by LocalPersistence unless
+    LOCAL_PERSISTENCE=off.
+    """
+    global mongo_available, local_store
+    if mongo_url and db_name:
+        mongo_available = connect_mongo()
+    if mongo_available:
+        return
+    
+    logging.info("MongoDB not configured or unusable, using in-memory storage")
+    if os.environ.get('LOCAL_PERSISTENCE', 'on') != 'off':
+        local_store = LocalPersistence(
+            directory=Path(os.environ.get('LOCAL_DATA_DIR', ROOT_DIR / 'data')),
+            snapshot_every=int(os.environ.get('LOCAL_SNAPSHOT_EVERY', 1000)),
+            fsync=os.environ.get('LOCAL_WAL_FSYNC', 'on') != 'off',
+        )
+
+# Warm start: PRELOAD_SNAPSHOT names a backup file (data_backup.json format,
+# any backup_codec codec) loaded into empty stores before requests are served
+PRELOAD_SNAPSHOT = os.environ.get('PRELOAD_SNAPSHOT')
+PRELOAD_DEFAULT_PIN = os.environ.get('PRELOAD_DEFAULT_PIN', '2222')  # Backups carry no PIN hashes
+PRELOAD_BATCH_SIZE = 1000
+preload_status = {"state": "disabled"}
+
+def import_script_module(name: str):
+    """Import a helper module shared with the repo's top-level backup scripts"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        sys.path.append(str(ROOT_DIR.parent))
+        return importlib.import_module(name)
+
+def preloaded_doc(record: dict) -> dict:
+    """A preloaded record as a Mongo document, its backup ``id`` moved to ``_id``"""
+    record_id = record.pop("id")
+    return {**record, "_id": mongo_id(record_id)}
+
+async def store_preloaded(users: List[dict], customers: List[dict]) -> int:
+    """Bulk insert one batch of preloaded records; return how many were stored"""
+    if mongo_available:
+        user_docs = [preloaded_doc(user) for user in users]
+        customer_docs = [preloaded_doc(customer) for customer in customers]
+        user_errors = await insert_many_unordered(db.users, user_docs)
+        customer_errors = await insert_many_unordered(db.customers, customer_docs)
+        return len(user_docs) + len(customer_docs) - len(user_errors) - len(customer_errors)
+    
+    stored = 0
+    for user in users:
+        if user["email"] not in in_memory_users:
+            in_memory_users[user["email"]] = user
+            stored += 1
+    for customer in customers:
+        if InMemoryCustomerStore.customer_key(customer["user_id"], customer["name"]) not in in_memory_customers:
+            in_memory_customers.add(customer)
+            stored += 1
+    return stored
+
+async def preload_snapshot():
+    """Fill empty stores from PRELOAD_SNAPSHOT so a cold start serves data immediately
+
+    Skipped when the stores already hold users. Records are bulk inserted in
+    batches; with Mongo this runs before the index build, so the inserts skip
+    per-document index maintenance. In-memory data is snapshotted to local
+    persistence afterwards.
+    """
+    started = time.monotonic()
+    path = Path(PRELOAD_SNAPSHOT)
+    try:
+        if not path.exists():
+            preload_status.update(state="missing", source=str(path))
+            return
+        if mongo_available:
+            has_data = await db.users.estimated_document_count() > 0
+        else:
+            has_data = bool(in_memory_users)
+        if has_data:
+            preload_status.update(state="skipped", source=str(path), reason="stores are not empty")
+            return
+        
+        if import_script_module("atomic_file").verify_checksum(path) is False:
+            preload_status.update(state="failed", source=str(path), error="checksum mismatch")
+            logger.error(f"Refusing to preload {path}: checksum mismatch")
+            return
+        backup_codec = import_script_module("backup_codec")
+        default_pin = await pin_pool.hash(PRELOAD_DEFAULT_PIN)
+        
+        counts = {"users": 0, "customers": 0}
+        stored = 0
+        users, customers = [], []
+        fallback_user_id = None
+        for record_type, data in backup_codec.iter_backup(path):
+            if record_type == "user":
+                user = restore_datetimes(dict(data))
+                user.setdefault("id", str(uuid.uuid4()))
+                user["pin"] = default_pin
+                fallback_user_id = fallback_user_id or user["id"]
+                users.append(user)
+                counts["users"] += 1
+            elif record_type == "customer":
+                customer = restore_datetimes({**CUSTOMER_DEFAULTS, "orders": [], **data})
+                customer.setdefault("id", str(uuid.uuid4()))
+                # Legacy backups without user_id belonged to the first user
+                customer["user_id"] = str(customer.get("user_id") or fallback_user_id)
+                migrate_customer_orders(customer)
+                customers.append(refresh_aggregates(customer))
+                counts["customers"] += 1
+            if len(users) + len(customers) >= PRELOAD_BATCH_SIZE:
+                stored += await store_preloaded(users, customers)
+                users, customers = [], []
+        stored += await store_preloaded(users, customers)
+        
+        if local_store is not None and stored:
+            local_store.snapshot()
+        preload_status.update(
+            state="loaded",
+            source=str(path),
+            stored=stored,
+            seconds=round(time.monotonic() - started, 3),
+            **counts
+        )
+        logger.info(f"Preloaded snapshot: {preload_status}")
+    except Exception as e:
+        logger.error(f"Error preloading snapshot {path}: {str(e)}")
+        preload_status.update(state="failed", source=str(path), error=str(e))
+
+async def persist_local(op: str, data: dict):
+    """Log an in-memory write when local persistence is enabled"""
+    if local_store is not None:
+        await local_store.log(op, data)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -67,13 +534,72 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class OrderItem(BaseModel):
+    """One line of an order; ``price`` is the line total, not a unit price
+
+    The frontend takes qty and price as free text. Text that is not a clean
+    number is kept verbatim in ``raw_qty``/``raw_price`` and the number is
+    set to 0, so typing never loses what was entered and a guess such as
+    ``"12,50"`` -> 1250 never reaches the aggregates.
+    """
+    desc: str = ""
+    qty: int = 1
+    color: str = ""
+    size: str = ""
+    price: Decimal = Decimal(0)
+
+    class Config:
+        extra = "allow"
+        # Stored and sent as a JSON number rather than pydantic's default string
+        json_encoders = {Decimal: float}
+
+    @root_validator(pre=True)
+    def keep_raw_text(cls, values):
+        values = dict(values)
+        for field, parse, parse_strict in (
+            ("qty", parse_quantity, strict_quantity),
+            ("price", parse_amount, strict_amount),
+        ):
+            value = values.get(field)
+            raw = values.get(f"raw_{field}")
+            if value is not None and parse_strict(value) is None:
+                values[f"raw_{field}"] = value
+                values[field] = 0
+            elif raw is not None and value is not None:
+                if parse_strict(value) in (0, parse(raw)):
+                    # Unedited; older documents stored the lenient parse of the text
+                    values[field] = 0
+                else:
+                    # The number was edited since, so the old text no longer describes it
+                    del values[f"raw_{field}"]
+        return values
+
+    @validator('qty', pre=True)
+    def validate_qty(cls, v):
+        return parse_quantity(v)
+
+    @validator('price', pre=True)
+    def validate_price(cls, v):
+        return parse_amount(v)
+
+class Order(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    orderRef: str = ""
+    orderDate: str = ""
+    items: List[OrderItem] = []
+    comments: str = ""
+    savedAt: str = ""
+
+    class Config:
+        extra = "allow"
+
 class Customer(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     user_id: str
     money_given: float = 0.0
     total_spent: float = 0.0
-    orders: List[dict] = []
+    orders: List[Order] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -81,22 +607,77 @@ class CustomerCreate(BaseModel):
     name: str
     money_given: Optional[float] = 0.0
     total_spent: Optional[float] = 0.0
-    orders: Optional[List[dict]] = []
+    orders: Optional[List[Order]] = []
 
 class CustomerUpdate(BaseModel):
     money_given: Optional[float] = None
     total_spent: Optional[float] = None
-    orders: Optional[List[dict]] = None
+    orders: Optional[List[Order]] = None
+
+class OrderUpdate(BaseModel):
+    orderRef: Optional[str] = None
+    orderDate: Optional[str] = None
+    items: Optional[List[OrderItem]] = None
+    comments: Optional[str] = None
+    savedAt: Optional[str] = None
+
+class CustomerAggregates(BaseModel):
+    """Figures derived from a customer's orders, maintained on every write"""
+    order_count: int = 0
+    item_count: int = 0
+    spend_total: float = 0.0
+    balance: float = 0.0
+    last_order_date: Optional[date] = None
+    # Items whose qty or price is not a clean number; they count as 0 above
+    unparsed_items: int = 0
+
+    @validator('spend_total', 'balance')
+    def round_money(cls, v):
+        # Mongo moves these with $inc on floats, which can leave binary noise
+        return round(v, 2)
 
 class CustomerResponse(BaseModel):
     id: str
     name: str
     money_given: float
     total_spent: float
-    orders: List[dict]
+    orders: List[Order]
+    aggregates: Optional[CustomerAggregates] = None
     created_at: datetime
     updated_at: datetime
 
+class OrderResponse(BaseModel):
+    customer_id: str
+    order: Order
+    aggregates: Optional[CustomerAggregates] = None
+    updated_at: datetime
+
+class CustomerSummary(BaseModel):
+    id: str
+    name: str
+    money_given: float
+    total_spent: float
+    aggregates: CustomerAggregates
+    updated_at: datetime
+
+class CustomerActivity(BaseModel):
+    id: str
+    name: str
+    updated_at: datetime
+    last_order_date: Optional[date] = None
+
+class UserSummary(BaseModel):
+    user_id: str
+    customer_count: int
+    order_count: int
+    total_money_given: float
+    total_spent: float
+    balance: float
+    outstanding_balance: float
+    last_order_date: Optional[date] = None
+    recent_activity: List[CustomerActivity]
+    computed_at: datetime
+
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     email: EmailStr
@@ -136,30 +717,976 @@ class UserResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+# Listing utilities
+MAX_PAGE_SIZE = 1000
+
+USER_FIELDS = ("id", "email", "created_at", "updated_at")
+CUSTOMER_FIELDS = ("id", "name", "money_given", "total_spent", "orders", "aggregates", "created_at", "updated_at")
+# Aggregates are derived data, so exports and backups leave them out
+EXPORT_CUSTOMER_FIELDS = tuple(field for field in CUSTOMER_FIELDS if field != "aggregates") + ("user_id",)
+CUSTOMER_DEFAULTS = {"money_given": 0.0, "total_spent": 0.0, "orders": [], "aggregates": None}
+SUMMARY_CUSTOMER_FIELDS = ("id", "name", "money_given", "total_spent", "aggregates", "updated_at")
+
+# Order aggregates
+def parse_amount(value) -> Decimal:
+    """Parse a price such as ``"150.00"`` or ``"$1,200"``; unparseable prices count as 0"""
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    try:
+        return Decimal(str(value or "0").replace("$", "").replace(",", "").strip() or "0")
+    except InvalidOperation:
+        return Decimal(0)
+
+def parse_quantity(value) -> int:
+    """Parse an item quantity; a missing or unparseable one counts as 1"""
+    try:
+        return max(int(float(value)), 0)
+    except (TypeError, ValueError):
+        return 1
+
+AMOUNT_PATTERN = re.compile(r"^\$?\s*-?(\d{1,3}(,\d{3})+|\d+)(\.\d+)?$")
+QUANTITY_PATTERN = re.compile(r"^\d+$")
+
+def strict_amount(value) -> Optional[Decimal]:
+    """Parse a price only when it is unambiguous, e.g. ``"150.00"`` or ``"$1,200"``; None otherwise"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        amount = Decimal(str(value))
+        return amount if amount.is_finite() else None
+    text = str(value).strip()
+    if not AMOUNT_PATTERN.match(text):
+        return None
+    return Decimal(text.replace("$", "").replace(",", "").replace(" ", ""))
+
+def strict_quantity(value) -> Optional[int]:
+    """Parse a quantity only when it is a whole number; None otherwise"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value >= 0 else None
+    if isinstance(value, (float, Decimal)):
+        return int(value) if value == int(value) and value >= 0 else None
+    text = str(value).strip()
+    return int(text) if QUANTITY_PATTERN.match(text) else None
+
+def order_date(order: dict) -> Optional[str]:
+    value = order.get("orderDate") or order.get("date")
+    try:
+        return date.fromisoformat(str(value)[:10]).isoformat() if value else None
+    except ValueError:
+        return None
+
+# Order schema
+def order_documents(orders: list) -> List[dict]:
+    """Validate orders against ``Order`` and dump them as stored, with numeric qty and price"""
+    return [Order.parse_obj(order).model_dump(mode="json") for order in orders]
+
+def customer_document(customer: BaseModel, **kwargs) -> dict:
+    """A customer payload as stored, with its orders in their typed form"""
+    data = customer.dict(**kwargs)
+    if data.get("orders") is not None:
+        data["orders"] = order_documents(customer.orders)
+    return data
+
+def orders_need_migration(orders: Optional[list]) -> bool:
+    """True for orders saved before the typed schema: string quantities or prices, or no id
+
+    Also true for items whose raw text still carries the lenient parse of it
+    instead of 0, as the typed schema first stored them.
+    """
+    for order in orders or []:
+        if not isinstance(order, dict) or "id" not in order:
+            return True
+        for item in order.get("items") or []:
+            if not isinstance(item, dict) or isinstance(item.get("qty"), str) or isinstance(item.get("price"), str):
+                return True
+            if ("raw_qty" in item and item.get("qty")) or ("raw_price" in item and item.get("price")):
+                return True
+    return False
+
+def migrate_customer_orders(customer: dict) -> bool:
+    """Convert a stored customer's orders to the typed schema in place; True if they changed"""
+    if not orders_need_migration(customer.get("orders")):
+        return False
+    try:
+        customer["orders"] = order_documents(customer["orders"])
+    except ValueError as e:
+        logger.warning(f"Leaving orders of customer {doc_id(customer)} untyped: {str(e)}")
+        return False
+    return True
+
+def item_totals(item: dict) -> tuple:
+    """``(qty, price, unparsed)`` of one order item as the aggregates count it
+
+    A quantity or price that is not a clean number counts as 0 and marks the
+    item as unparsed, rather than being guessed at.
+    """
+    qty = None if "raw_qty" in item else strict_quantity(item.get("qty", 1))
+    price = None if "raw_price" in item else strict_amount(item.get("price", 0))
+    return qty or 0, price or Decimal(0), qty is None or price is None
+
+def order_totals(order: Optional[dict]) -> tuple:
+    """``(item_count, spend, unparsed_items)`` that one order contributes to its customer's aggregates"""
+    item_count, spend, unparsed_items = 0, Decimal(0), 0
+    for item in (order or {}).get("items") or []:
+        qty, price, unparsed = item_totals(item)
+        item_count += qty
+        spend += price
+        unparsed_items += unparsed
+    return item_count, spend, unparsed_items
+
+def aggregates_delta(old_order: Optional[dict], new_order: Optional[dict]) -> dict:
+    """How replacing ``old_order`` with ``new_order`` moves the aggregate counts and totals
+
+    Either side may be None for an added or removed order.
+    """
+    old_items, old_spend, old_unparsed = order_totals(old_order)
+    new_items, new_spend, new_unparsed = order_totals(new_order)
+    return {
+        "order_count": (new_order is not None) - (old_order is not None),
+        "item_count": new_items - old_items,
+        "spend_total": new_spend - old_spend,
+        "balance": old_spend - new_spend,
+        "unparsed_items": new_unparsed - old_unparsed,
+    }
+
+def latest_date_removed(aggregates: dict, old_order: Optional[dict], new_order: Optional[dict]) -> bool:
+    """True when the change takes away the order that set ``last_order_date``"""
+    old_date = order_date(old_order) if old_order else None
+    new_date = order_date(new_order) if new_order else None
+    return (
+        old_date is not None
+        and old_date == aggregates.get("last_order_date")
+        and (new_date is None or new_date < old_date)
+    )
+
+def shift_aggregates(customer: dict, old_order: Optional[dict], new_order: Optional[dict]):
+    """Update an in-memory customer's aggregates for one order change, after the orders list changed"""
+    aggregates = customer.get("aggregates")
+    if not aggregates:
+        refresh_aggregates(customer)
+        return
+    delta = aggregates_delta(old_order, new_order)
+    aggregates["order_count"] += delta["order_count"]
+    aggregates["item_count"] += delta["item_count"]
+    aggregates["unparsed_items"] = aggregates.get("unparsed_items", 0) + delta["unparsed_items"]
+    for field in ("spend_total", "balance"):
+        aggregates[field] = float(round(parse_amount(aggregates[field]) + delta[field], 2))
+    new_date = order_date(new_order) if new_order else None
+    if latest_date_removed(aggregates, old_order, new_order):
+        # Only this case needs a pass over the other orders
+        aggregates["last_order_date"] = max(filter(None, map(order_date, customer["orders"])), default=None)
+    elif new_date and (aggregates["last_order_date"] is None or new_date > aggregates["last_order_date"]):
+        aggregates["last_order_date"] = new_date
+
+def order_index(customer: dict, order_id: str) -> Optional[int]:
+    for index, order in enumerate(customer.get("orders") or []):
+        if order.get("id") == order_id:
+            return index
+    return None
+
+def put_order(customer: dict, order: dict) -> Optional[dict]:
+    """Add or replace one order of an in-memory customer in place; return the order it replaced"""
+    if customer.get("orders") is None:
+        customer["orders"] = []
+    index = order_index(customer, order["id"])
+    old_order = None
+    if index is None:
+        customer["orders"].append(order)
+    else:
+        old_order = customer["orders"][index]
+        customer["orders"][index] = order
+    shift_aggregates(customer, old_order, order)
+    return old_order
+
+def remove_order(customer: dict, order_id: str) -> Optional[dict]:
+    """Remove one order of an in-memory customer in place; return it, or None if it was not there"""
+    index = order_index(customer, order_id)
+    if index is None:
+        return None
+    old_order = customer["orders"].pop(index)
+    shift_aggregates(customer, old_order, None)
+    return old_order
+
+def customer_aggregates(customer: dict) -> dict:
+    """Compute a customer's aggregates from its orders
+
+    An item's ``price`` is the line total, matching the frontend, and the
+    balance is money given minus the computed spend. Dates are stored as ISO
+    strings so the same document works in Mongo and in memory.
+    """
+    spend_total = Decimal(0)
+    item_count = 0
+    unparsed_items = 0
+    last_order_date = None
+    orders = customer.get("orders") or []
+    for order in orders:
+        order_items, order_spend, order_unparsed = order_totals(order)
+        item_count += order_items
+        spend_total += order_spend
+        unparsed_items += order_unparsed
+        placed = order_date(order)
+        if placed and (last_order_date is None or placed > last_order_date):
+            last_order_date = placed
+    money_given = parse_amount(customer.get("money_given"))
+    return {
+        "order_count": len(orders),
+        "item_count": item_count,
+        "spend_total": float(round(spend_total, 2)),
+        "balance": float(round(money_given - spend_total, 2)),
+        "last_order_date": last_order_date,
+        "unparsed_items": unparsed_items,
+    }
+
+def refresh_aggregates(customer: dict) -> dict:
+    customer["aggregates"] = customer_aggregates(customer)
+    return customer
+
+def customer_response(customer: dict) -> CustomerResponse:
+    return CustomerResponse(
+        id=doc_id(customer),
+        name=customer["name"],
+        money_given=customer.get("money_given", 0.0),
+        total_spent=customer.get("total_spent", 0.0),
+        orders=customer.get("orders", []),
+        aggregates=customer.get("aggregates") or customer_aggregates(customer),
+        created_at=customer["created_at"],
+        updated_at=customer["updated_at"]
+    )
+
+def parse_fields(fields: Optional[str], allowed: tuple) -> tuple:
+    """Parse a comma separated ``fields=`` projection, always keeping ``id``"""
+    if not fields:
+        return allowed
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(field for field in allowed if field == "id" or field in requested)
+
+def mongo_projection(selected: tuple, allowed: tuple) -> Optional[dict]:
+    if selected == allowed:
+        return None
+    projection = {field: 1 for field in selected}
+    projection["_id"] = 1
+    return projection
+
+def mongo_id(value: str):
+    """Convert an id or cursor from the API back to the stored ``_id`` type"""
+    from bson import ObjectId
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+def doc_id(doc: dict) -> str:
+    return str(doc.get("_id", doc.get("id")))
+
+def project_row(doc: dict, selected: tuple, defaults: Optional[dict] = None) -> dict:
+    defaults = defaults or {}
+    row = {}
+    for field in selected:
+        row[field] = doc_id(doc) if field == "id" else doc.get(field, defaults.get(field))
+    return row
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+async def iterate_docs(docs):
+    if isinstance(docs, list):
+        for doc in docs:
+            yield doc
+    else:
+        async for doc in docs:
+            yield doc
+
+async def stream_json_array(docs, to_row):
+    """Serialize rows one at a time instead of building a response list"""
+    yield "["
+    first = True
+    async for doc in iterate_docs(docs):
+        yield ("" if first else ",") + json.dumps(to_row(doc), default=json_default, separators=(",", ":"))
+        first = False
+    yield "]"
+
+async def stream_ndjson(sections):
+    """Serialize ``(type, docs, to_row)`` sections as one NDJSON record per line"""
+    for record_type, docs, to_row in sections:
+        async for doc in iterate_docs(docs):
+            record = {"type": record_type, "data": to_row(doc)}
+            yield json.dumps(record, default=json_default, separators=(",", ":")) + "\n"
+
+async def paged_json_response(docs, to_row, limit: Optional[int], etag: Optional[str] = None) -> StreamingResponse:
+    """Stream a JSON array, advertising the next page cursor in ``X-Next-Cursor``
+
+    ``docs`` holds up to ``limit + 1`` documents when paginating; the extra one
+    only signals that another page exists.
+    """
+    headers = {"ETag": etag} if etag else {}
+    if limit is not None:
+        if not isinstance(docs, list):
+            docs = await docs.to_list(limit + 1)
+        if len(docs) > limit:
+            docs = docs[:limit]
+            headers["X-Next-Cursor"] = doc_id(docs[-1])
+    return StreamingResponse(stream_json_array(docs, to_row), media_type="application/json", headers=headers)
+
+# Import utilities
+MAX_IMPORT_RECORDS = 50000
+DUPLICATE_KEY_ERROR = 11000
+
+def parse_import_body(body: bytes) -> List[tuple]:
+    """Parse an import payload into ``(type, data)`` records
+
+    Accepts a JSON array of ``{"type", "data"}`` records, NDJSON in the same
+    shape as ``/api/export``, or a backup document with ``users`` and
+    ``customers`` lists.
+    """
+    text = body.decode("utf-8").strip()
+    try:
+        payload = json.loads(text) if text else []
+    except ValueError:
+        try:
+            payload = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Import body must be JSON or NDJSON")
+    
+    if isinstance(payload, dict) and "type" in payload:
+        # A single NDJSON line parses as one JSON object
+        payload = [payload]
+    
+    if isinstance(payload, dict):
+        records = [("user", user) for user in payload.get("users", [])]
+        records += [("customer", customer) for customer in payload.get("customers", [])]
+    elif isinstance(payload, list):
+        records = []
+        for record in payload:
+            if not isinstance(record, dict):
+                raise HTTPException(status_code=400, detail="Import records must be objects")
+            records.append((record.get("type"), record.get("data")))
+    else:
+        raise HTTPException(status_code=400, detail="Import body must be an array or a backup object")
+    
+    if len(records) > MAX_IMPORT_RECORDS:
+        raise HTTPException(status_code=413, detail=f"Import is limited to {MAX_IMPORT_RECORDS} records")
+    return records
+
+def import_result(index: int, record_type: str, status: str, record_id: Optional[str] = None, detail: Optional[str] = None) -> dict:
+    result = {"index": index, "type": record_type, "status": status}
+    if record_id is not None:
+        result["id"] = record_id
+    if detail is not None:
+        result["detail"] = detail
+    return result
+
+def import_summary(results: List[dict]) -> dict:
+    summary = {}
+    for result in results:
+        counts = summary.setdefault(result["type"], {"created": 0, "exists": 0, "failed": 0})
+        counts[result["status"] if result["status"] in counts else "failed"] += 1
+    return summary
+
+async def insert_many_unordered(collection, docs: List[dict]) -> dict:
+    """Insert ``docs`` with ordered=False, returning write errors by doc index"""
+    from pymongo.errors import BulkWriteError
+    if not docs:
+        return {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return {error["index"]: error for error in e.details.get("writeErrors", [])}
+    return {}
+
 # Password utilities
 def hash_pin(pin: str) -> str:
-    return pwd_context.hash(pin)
+    return get_pwd_context().hash(pin)
 
 def verify_pin(plain_pin: str, hashed_pin: str) -> bool:
-    return pwd_context.verify(plain_pin, hashed_pin)
+    return get_pwd_context().verify(plain_pin, hashed_pin)
+
+class PinWorkerPool:
+    """Runs bcrypt hashing and verification off the event loop
+
+    At most ``max_workers`` PIN operations run at once; further calls wait in
+    a queue of at most ``max_queue`` entries and are rejected with 503 beyond
+    that, so sign-in bursts cannot starve health checks and customer reads.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, use_processes: bool = False):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._executor = None
+        self._slots = asyncio.Semaphore(max_workers)
+        self._active = 0
+        self._queued = 0
+        self._completed = 0
+        self._rejected = 0
+        self._max_queued_seen = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, func, *args):
+        if self._queued >= self.max_queue:
+            self._rejected += 1
+            raise HTTPException(status_code=503, detail="Too many sign-in requests, please retry")
+        self._queued += 1
+        self._max_queued_seen = max(self._max_queued_seen, self._queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self._active += 1
+        try:
+            # bcrypt releases the GIL, so threads give real parallelism
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._active -= 1
+            self._completed += 1
+            self._slots.release()
+
+    async def hash(self, pin: str) -> str:
+        return await self.run(hash_pin, pin)
+
+    async def verify(self, plain_pin: str, hashed_pin: str) -> bool:
+        return await self.run(verify_pin, plain_pin, hashed_pin)
+
+    def metrics(self) -> dict:
+        return {
+            "executor": "process" if self.use_processes else "thread",
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._active,
+            "queued": self._queued,
+            "max_queued": self._max_queued_seen,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+class VerifiedCredentialCache:
+    """Short-lived, size-bounded cache of successful PIN verifications
+
+    Entries are keyed by an HMAC of email and PIN under a per-process secret,
+    so plaintext PINs are never held, and remember the stored hash they were
+    verified against: a changed PIN hash never matches a stale entry. Only
+    successes are cached, so wrong PINs always pay the full bcrypt cost.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, secret: Optional[bytes] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._secret = secret or os.urandom(32)
+        self._entries = OrderedDict()
+        self._keys_by_email = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, email: str, pin: str) -> str:
+        message = f"{email.lower()}\0{pin}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def _remove(self, key: str):
+        email, _, _ = self._entries.pop(key)
+        keys = self._keys_by_email.get(email)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_email[email]
+
+    def check(self, email: str, pin: str, hashed_pin: str) -> bool:
+        if self.max_entries <= 0:
+            return False
+        key = self._key(email, pin)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False
+        _, cached_hash, expires_at = entry
+        if expires_at < time.monotonic() or not hmac.compare_digest(cached_hash, hashed_pin):
+            self._remove(key)
+            self.misses += 1
+            return False
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def add(self, email: str, pin: str, hashed_pin: str):
+        if self.max_entries <= 0:
+            return
+        key = self._key(email, pin)
+        if key in self._entries:
+            self._remove(key)
+        email = email.lower()
+        self._entries[key] = (email, hashed_pin, time.monotonic() + self.ttl_seconds)
+        self._keys_by_email.setdefault(email, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, email: str):
+        """Drop every cached verification for ``email`` (PIN change or deletion)"""
+        for key in list(self._keys_by_email.get(email.lower(), ())):
+            self._remove(key)
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+pin_pool = PinWorkerPool(
+    max_workers=int(os.environ.get('PIN_HASH_WORKERS', min(4, os.cpu_count() or 1))),
+    max_queue=int(os.environ.get('PIN_HASH_MAX_QUEUE', 256)),
+    use_processes=os.environ.get('PIN_HASH_EXECUTOR', 'thread') == 'process',
+)
+
+signin_cache = VerifiedCredentialCache(
+    ttl_seconds=float(os.environ.get('SIGNIN_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('SIGNIN_CACHE_SIZE', 1024)),
+)
+
+class BackupChangeFeed:
+    """Sequence-numbered feed of data changes that backup clients long-poll
+
+    Every write publishes an event with the next sequence number into a
+    bounded ring. Clients ask for events after the last sequence they saw and
+    wait until one arrives or the poll times out, so backups run shortly after
+    a write and not at all while the data is idle. The ``epoch`` changes on
+    every restart, telling clients that sequence numbers started over.
+    """
+
+    def __init__(self, max_events: int):
+        self.epoch = str(uuid.uuid4())
+        self.seq = 0
+        self.events = deque(maxlen=max_events)
+        self._changed = asyncio.Event()
+
+    def publish(self, action: str, **details) -> dict:
+        self.seq += 1
+        event = {"seq": self.seq, "action": action, "timestamp": datetime.utcnow().isoformat(), **details}
+        self.events.append(event)
+        # Wake every waiting poll, then start a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+        return event
+
+    def since(self, seq: int) -> dict:
+        oldest = self.events[0]["seq"] if self.events else self.seq + 1
+        return {
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "changes": [event for event in self.events if event["seq"] > seq],
+            # Events between ``seq`` and the oldest kept one were dropped from the ring
+            "truncated": seq + 1 < oldest and seq < self.seq,
+        }
+
+    async def wait(self, seq: int, timeout: float) -> dict:
+        """Events after ``seq``, waiting up to ``timeout`` seconds when there are none yet"""
+        if seq == self.seq:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.since(seq)
+
+    def metrics(self) -> dict:
+        return {"epoch": self.epoch, "seq": self.seq, "buffered": len(self.events)}
+
+backup_feed = BackupChangeFeed(max_events=int(os.environ.get('BACKUP_FEED_SIZE', 1000)))
+
+MAX_LONG_POLL_SECONDS = 60
+
+class ChangeLog:
+    """Ordered log of every user and customer write, read back by sequence number
+
+    Without Mongo, recent entries stay in a bounded in-memory ring, and readers
+    that fall behind it are told the log was ``truncated`` and must re-read
+    everything. With Mongo every entry is stored in the ``changes`` collection,
+    numbered by an atomic counter so sequence numbers survive restarts, and
+    reads are always served from there, since other workers and instances
+    append to the same collection.
+
+    Sequence numbers only compare within one ``epoch``. In memory the
+    numbering restarts with the process, so the epoch does too; with Mongo it
+    is stored next to the counter. A reader whose epoch changed must re-read
+    everything, as with the backup change feed.
+
+    Appends take no lock. Sequence numbers are allocated atomically, entries
+    may land out of order, and readers only see entries below the lowest
+    sequence number still being written, so nobody pages past a gap that is
+    about to be filled.
+    """
+
+    def __init__(self, max_entries: int):
+        self.seq = 0
+        self.entries = deque(maxlen=max_entries)
+        # Resolved on first read, once storage is known
+        self.epoch = None
+        self._allocated = 0
+        self._pending = set()
+        # Highest sequence number that fell out of the ring
+        self._evicted = 0
+
+    async def _next_seq(self, count: int) -> int:
+        if mongo_available:
+            from pymongo import ReturnDocument
+            counter = await db.counters.find_one_and_update(
+                {"_id": "changes"},
+                {"$inc": {"seq": count}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return counter["seq"] - count + 1
+        self._allocated += count
+        return self._allocated - count + 1
+
+    async def current_epoch(self) -> str:
+        if self.epoch is None:
+            if mongo_available:
+                from pymongo import ReturnDocument
+                # Keeps an existing epoch, and gives counters from before epochs existed one
+                counter = await db.counters.find_one_and_update(
+                    {"_id": "changes"},
+                    [{"$set": {"epoch": {"$ifNull": ["$epoch", str(uuid.uuid4())]}}}],
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                self.epoch = counter["epoch"]
+            else:
+                self.epoch = str(uuid.uuid4())
+        return self.epoch
+
+    def _insert(self, entry: dict):
+        if len(self.entries) == self.entries.maxlen:
+            self._evicted = max(self._evicted, self.entries[0]["seq"])
+        # Entries nearly always arrive in order; the rest are slotted in place
+        if not self.entries or entry["seq"] > self.entries[-1]["seq"]:
+            self.entries.append(entry)
+            return
+        if len(self.entries) == self.entries.maxlen:
+            self.entries.popleft()
+        index = len(self.entries)
+        while index > 0 and self.entries[index - 1]["seq"] > entry["seq"]:
+            index -= 1
+        self.entries.insert(index, entry)
+
+    async def append(self, changes: List[dict]) -> List[dict]:
+        """Number and store ``changes``; return the stored entries"""
+        if not changes:
+            return []
+        first_seq = await self._next_seq(len(changes))
+        self._pending.add(first_seq)
+        try:
+            timestamp = datetime.utcnow()
+            entries = [
+                {"seq": first_seq + offset, "timestamp": timestamp, **change}
+                for offset, change in enumerate(changes)
+            ]
+            if mongo_available:
+                # insert_many adds an _id to each document, so give it copies
+                await db.changes.insert_many([dict(entry) for entry in entries])
+            else:
+                for entry in entries:
+                    self._insert(entry)
+            self.seq = max(self.seq, entries[-1]["seq"])
+        finally:
+            self._pending.discard(first_seq)
+        return entries
+
+    def _visible_limit(self) -> Optional[int]:
+        """Highest sequence number readers may see, or None when nothing is in flight"""
+        return min(self._pending) - 1 if self._pending else None
+
+    async def _mongo_truncated(self, since: int) -> bool:
+        """True when entries after ``since`` expired from the ``changes`` collection"""
+        oldest = await db.changes.find_one({}, {"seq": 1}, sort=[("seq", 1)])
+        if oldest is not None:
+            return oldest["seq"] > since + 1
+        counter = await db.counters.find_one({"_id": "changes"})
+        return since < (counter or {}).get("seq", 0)
+
+    async def read(self, since: int, limit: int) -> dict:
+        """Up to ``limit`` entries after ``since``, oldest first, and the newest visible sequence number"""
+        epoch = await self.current_epoch()
+        visible = self._visible_limit()
+        truncated = False
+        if mongo_available:
+            query = {"seq": {"$gt": since}}
+            if visible is not None:
+                query["seq"]["$lte"] = visible
+            changes = await db.changes.find(query, {"_id": 0}).sort("seq", 1).to_list(limit + 1)
+            truncated = await self._mongo_truncated(since)
+            counter = await db.counters.find_one({"_id": "changes"})
+            head = (counter or {}).get("seq", 0)
+        else:
+            head = self.seq
+            # Entries after ``since`` fell out of the ring, or ``since`` is from another epoch
+            truncated = since < self._evicted or since > self._allocated
+            changes = [
+                entry for entry in self.entries
+                if (truncated or entry["seq"] > since) and (visible is None or entry["seq"] <= visible)
+            ][:limit + 1]
+        
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return {
+            "epoch": epoch,
+            "changes": changes,
+            "next": changes[-1]["seq"] if changes else since,
+            "has_more": has_more,
+            "truncated": truncated,
+            "head": head if visible is None else min(head, visible),
+        }
+
+    def metrics(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "buffered": len(self.entries),
+            "max_entries": self.entries.maxlen,
+            "in_flight": len(self._pending),
+        }
+
+change_log = ChangeLog(max_entries=int(os.environ.get('CHANGE_LOG_SIZE', 10000)))
+
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))
+MAX_CHANGES_PAGE = 1000
+
+def change_entry(op: str, collection: str, record_id: str, user_id: str, doc: Optional[dict] = None) -> dict:
+    """Describe one write; ``doc`` holds the record after a create or update
+
+    Order writes use the ``orders`` collection, and their ``doc`` carries the
+    ``customer_id`` the order belongs to, deletes included.
+    """
+    change = {"op": op, "collection": collection, "id": record_id, "user_id": user_id}
+    if doc is not None:
+        change["doc"] = doc
+    return change
+
+async def record_changes(changes: List[dict]):
+    """Append writes to the change log, drop stale rollups and wake backup subscribers
+
+    The write itself already succeeded, so a failure here is logged rather
+    than turned into an error response.
+    """
+    for user_id in {change["user_id"] for change in changes if change["collection"] in ("customers", "orders")}:
+        user_summary_cache.invalidate(user_id)
+        data_versions.bump(f"customers:{user_id}")
+    for change in changes:
+        if change["collection"] == "users":
+            data_versions.bump("users")
+            data_versions.bump(f"user:{change.get('doc', {}).get('email')}")
+    try:
+        entries = await change_log.append(changes)
+    except Exception as e:
+        logger.error(f"Error recording changes: {str(e)}")
+        return
+    if entries:
+        backup_feed.publish("data_changed", changes=len(entries), change_seq=entries[-1]["seq"])
+
+class UserSummaryCache:
+    """Size-bounded cache of per-user rollups, dropped on every customer write
+
+    Each user has a version that customer writes bump. A summary computed
+    while a write landed carries the older version and is not stored, so
+    the cache never serves a rollup older than the latest write in this
+    process; the TTL bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, user_id: str, summary: dict, version: int):
+        if self.max_entries <= 0 or version != self.version(user_id):
+            return
+        self._entries[user_id] = (summary, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._versions[user_id] = self.version(user_id) + 1
+        self._entries.pop(user_id, None)
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+user_summary_cache = UserSummaryCache(
+    ttl_seconds=float(os.environ.get('USER_SUMMARY_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('USER_SUMMARY_CACHE_SIZE', 1024)),
+)
+
+class DataVersions:
+    """Version counters behind the strong ETags of the user and customer read routes
+
+    ``record_changes`` bumps the users list and the written user's counters.
+    The epoch is new for every process, so an ETag issued before a restart
+    never matches. The counters only see writes made through this process,
+    which holds all of the in-memory data but not all of Mongo's: other
+    workers, instances and restores write there too. So ETags are only issued
+    in memory mode, and Mongo-backed reads always send the full body.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._versions = {}
+        self.not_modified = 0
+
+    def bump(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def etag(self, key: str) -> Optional[str]:
+        if mongo_available:
+            return None
+        return f'"{self.epoch}-{self._versions.get(key, 0)}"'
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": not mongo_available,
+            "epoch": self.epoch,
+            "keys": len(self._versions),
+            "not_modified": self.not_modified,
+        }
+
+data_versions = DataVersions()
+
+def not_modified_response(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """A 304 when the request's ``If-None-Match`` names ``etag``, else None"""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return None
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if "*" in tags or etag in tags:
+        data_versions.not_modified += 1
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+RECENT_ACTIVITY_LIMIT = 5
+
+async def compute_user_summary(user_id: str) -> Optional[dict]:
+    """Roll up a user's customer aggregates; None when the user does not exist"""
+    if mongo_available:
+        if await db.users.find_one({"_id": mongo_id(user_id)}, {"_id": 1}) is None:
+            return None
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {
+                "_id": None,
+                "customer_count": {"$sum": 1},
+                "order_count": {"$sum": "$aggregates.order_count"},
+                "total_money_given": {"$sum": "$money_given"},
+                "total_spent": {"$sum": "$aggregates.spend_total"},
+                "balance": {"$sum": "$aggregates.balance"},
+                "outstanding_balance": {"$sum": {"$max": [0, {"$multiply": [-1, "$aggregates.balance"]}]}},
+                "last_order_date": {"$max": "$aggregates.last_order_date"},
+            }},
+        ]
+        totals = (await db.customers.aggregate(pipeline).to_list(1) or [{}])[0]
+        totals.pop("_id", None)
+        recent = await db.customers.find(
+            {"user_id": user_id},
+            {"name": 1, "updated_at": 1, "aggregates.last_order_date": 1}
+        ).sort("updated_at", -1).limit(RECENT_ACTIVITY_LIMIT).to_list(RECENT_ACTIVITY_LIMIT)
+    else:
+        if not any(user["id"] == user_id for user in in_memory_users.values()):
+            return None
+        customers = in_memory_customers.list_for_user(user_id)
+        aggregates = [customer.get("aggregates") or customer_aggregates(customer) for customer in customers]
+        order_dates = [aggregate["last_order_date"] for aggregate in aggregates if aggregate["last_order_date"]]
+        totals = {
+            "customer_count": len(customers),
+            "order_count": sum(aggregate["order_count"] for aggregate in aggregates),
+            "total_money_given": sum(customer.get("money_given", 0.0) for customer in customers),
+            "total_spent": sum(aggregate["spend_total"] for aggregate in aggregates),
+            "balance": sum(aggregate["balance"] for aggregate in aggregates),
+            "outstanding_balance": sum(-aggregate["balance"] for aggregate in aggregates if aggregate["balance"] < 0),
+            "last_order_date": max(order_dates) if order_dates else None,
+        }
+        recent = sorted(customers, key=lambda customer: customer["updated_at"], reverse=True)[:RECENT_ACTIVITY_LIMIT]
+    
+    summary = {
+        "user_id": user_id,
+        "customer_count": totals.get("customer_count", 0),
+        "order_count": totals.get("order_count", 0),
+        "last_order_date": totals.get("last_order_date"),
+        "recent_activity": [
+            {
+                "id": doc_id(customer),
+                "name": customer["name"],
+                "updated_at": customer["updated_at"],
+                "last_order_date": (customer.get("aggregates") or {}).get("last_order_date"),
+            }
+            for customer in recent
+        ],
+        "computed_at": datetime.utcnow(),
+    }
+    for field in ("total_money_given", "total_spent", "balance", "outstanding_balance"):
+        summary[field] = round(totals.get(field) or 0.0, 2)
+    return summary
+
+async def verify_signin_pin(email: str, plain_pin: str, hashed_pin: str) -> bool:
+    """Verify a sign-in PIN, skipping bcrypt for a recently verified pair"""
+    if signin_cache.check(email, plain_pin, hashed_pin):
+        return True
+    if not await pin_pool.verify(plain_pin, hashed_pin):
+        return False
+    signin_cache.add(email, plain_pin, hashed_pin)
+    return True
 
 # User routes
 @api_router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(user_data: UserCreate):
     try:
         if mongo_available:
-            # Check if user already exists
-            existing_user = await db.users.find_one({"email": user_data.email})
-            if existing_user:
-                raise HTTPException(status_code=400, detail="User with this email already exists")
-            
-            # Create new user
+            from pymongo.errors import DuplicateKeyError
+            # The unique email index rejects duplicates atomically once it is built
+            if not unique_index_ready("users.email_unique"):
+                if await db.users.find_one({"email": user_data.email}, {"_id": 1}):
+                    raise HTTPException(status_code=400, detail="User with this email already exists")
             user_dict = user_data.dict()
-            user_dict["pin"] = hash_pin(user_data.pin)  # Hash the PIN
+            user_dict["pin"] = await pin_pool.hash(user_data.pin)  # Hash the PIN
             user_dict["created_at"] = datetime.utcnow()
             user_dict["updated_at"] = datetime.utcnow()
             
-            result = await db.users.insert_one(user_dict)
+            try:
+                result = await db.users.insert_one(user_dict)
+            except DuplicateKeyError:
+                raise HTTPException(status_code=400, detail="User with this email already exists")
             user_dict["id"] = str(result.inserted_id)
         else:
             # Use in-memory storage
@@ -167,13 +1694,20 @@ async def create_user(user_data: UserCreate):
                 raise HTTPException(status_code=400, detail="User with this email already exists")
             
             user_dict = user_data.dict()
-            user_dict["pin"] = hash_pin(user_data.pin)  # Hash the PIN
+            user_dict["pin"] = await pin_pool.hash(user_data.pin)  # Hash the PIN
             user_dict["created_at"] = datetime.utcnow()
             user_dict["updated_at"] = datetime.utcnow()
             user_dict["id"] = str(uuid.uuid4())
             
             # Store in memory
             in_memory_users[user_data.email] = user_dict
+            await persist_local("put_user", user_dict)
+        
+        # A recreated account must never match verifications of an older one
+        signin_cache.invalidate(user_dict["email"])
+        await record_changes([
+            change_entry("create", "users", user_dict["id"], user_dict["id"], project_row(user_dict, USER_FIELDS))
+        ])
         
         # Return user without PIN
         return UserResponse(
@@ -182,6 +1716,8 @@ async def create_user(user_data: UserCreate):
             created_at=user_dict["created_at"],
             updated_at=user_dict["updated_at"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -196,7 +1732,7 @@ async def signin_user(user_data: UserSignIn):
                 raise HTTPException(status_code=401, detail="Invalid email or PIN")
             
             # Verify PIN
-            if not verify_pin(user_data.pin, user["pin"]):
+            if not await verify_signin_pin(user_data.email, user_data.pin, user["pin"]):
                 raise HTTPException(status_code=401, detail="Invalid email or PIN")
         else:
             # Use in-memory storage
@@ -206,7 +1742,7 @@ async def signin_user(user_data: UserSignIn):
             user = in_memory_users[user_data.email]
             
             # Verify PIN
-            if not verify_pin(user_data.pin, user["pin"]):
+            if not await verify_signin_pin(user_data.email, user_data.pin, user["pin"]):
                 raise HTTPException(status_code=401, detail="Invalid email or PIN")
         
         # Return user without PIN
@@ -223,8 +1759,14 @@ async def signin_user(user_data: UserSignIn):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @api_router.get("/users/{email}", response_model=UserResponse)
-async def get_user_by_email(email: str):
+async def get_user_by_email(email: str, request: Request, response: Response):
     try:
+        # The version is read before the data, so a racing write can only make the ETag older
+        etag = data_versions.etag(f"user:{email}")
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
         if mongo_available:
             user = await db.users.find_one({"email": email})
             if not user:
@@ -236,6 +1778,8 @@ async def get_user_by_email(email: str):
             user = in_memory_users[email]
         
         # Return user without PIN
+        if etag:
+            response.headers["ETag"] = etag
         return UserResponse(
             id=str(user.get("_id", user.get("id"))),
             email=user["email"],
@@ -248,28 +1792,285 @@ async def get_user_by_email(email: str):
         logger.error(f"Error getting user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@api_router.get("/users/{user_id}/summary", response_model=UserSummary)
+async def get_user_summary(user_id: str):
+    """Dashboard totals for one user's customers, served from cached rollups"""
+    try:
+        summary = user_summary_cache.get(user_id)
+        if summary is None:
+            version = user_summary_cache.version(user_id)
+            summary = await compute_user_summary(user_id)
+            if summary is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            user_summary_cache.put(user_id, summary, version)
+        return summary
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting user summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_all_users():
+async def get_all_users(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     try:
+        selected = parse_fields(fields, USER_FIELDS)
+        etag = data_versions.etag("users")
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
         if mongo_available:
-            users = await db.users.find().to_list(1000)
+            query = {"_id": {"$gt": mongo_id(cursor)}} if cursor else {}
+            users = db.users.find(query, mongo_projection(selected, USER_FIELDS)).sort("_id", 1)
+            if limit is not None:
+                users = users.limit(limit + 1)
         else:
             # Use in-memory storage
             users = list(in_memory_users.values())
+            if cursor is not None or limit is not None:
+                users = sorted(
+                    (user for user in users if cursor is None or user["id"] > cursor),
+                    key=lambda user: user["id"]
+                )
+                if limit is not None:
+                    users = users[:limit + 1]
         
-        return [
-            UserResponse(
-                id=str(user.get("_id", user.get("id"))),
-                email=user["email"],
-                created_at=user["created_at"],
-                updated_at=user["updated_at"]
-            ) for user in users
-        ]
+        return await paged_json_response(users, lambda user: project_row(user, selected), limit, etag)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting all users: {str(e)}")
         return []
 
+# Import routes
+@api_router.post("/import")
+async def import_data(request: Request):
+    """Bulk create users and customers from a JSON or NDJSON payload
+
+    Records are validated up front, existing users and customers are detected
+    with one query per collection and new ones are written with a single
+    unordered ``insert_many``. Customers may reference the source ``id`` of an
+    imported user, which is remapped to the stored id. The response reports a
+    result for every record.
+    """
+    try:
+        records = parse_import_body(await request.body())
+        results = [None] * len(records)
+        users = []
+        customers = []
+        
+        # Validate everything before touching storage
+        for index, (record_type, data) in enumerate(records):
+            try:
+                if record_type == "user":
+                    # The PIN is only needed for users that do not exist yet
+                    user = UserCreate(**{**data, "pin": data.get("pin") or ""})
+                    users.append((index, data.get("id"), user))
+                elif record_type == "customer":
+                    user_id = data.get("user_id")
+                    if not user_id:
+                        raise ValueError("user_id is required")
+                    customers.append((index, str(user_id), CustomerCreate(**data)))
+                else:
+                    raise ValueError(f"Unknown record type: {record_type}")
+            except Exception as e:
+                results[index] = import_result(index, record_type or "unknown", "failed", detail=str(e))
+        
+        now = datetime.utcnow()
+        user_id_map = {}
+        
+        if mongo_available:
+            emails = [user.email for _, _, user in users]
+            existing_users = {
+                user["email"]: str(user["_id"])
+                async for user in db.users.find({"email": {"$in": emails}}, {"email": 1})
+            }
+        else:
+            existing_users = {email: user["id"] for email, user in in_memory_users.items()}
+        
+        new_users = []
+        new_emails = set()
+        failed_user_ids = set()
+        changes = []
+        for index, source_id, user in users:
+            if user.email in existing_users:
+                stored_id = existing_users[user.email]
+                results[index] = import_result(index, "user", "exists", stored_id)
+                if source_id:
+                    user_id_map[str(source_id)] = stored_id
+            elif user.email in new_emails:
+                results[index] = import_result(index, "user", "exists", detail="Duplicate email in import")
+            elif not user.pin:
+                results[index] = import_result(index, "user", "failed", detail="pin is required for new users")
+                if source_id:
+                    failed_user_ids.add(str(source_id))
+            else:
+                user_dict = user.dict()
+                user_dict["created_at"] = now
+                user_dict["updated_at"] = now
+                if not mongo_available:
+                    user_dict["id"] = str(uuid.uuid4())
+                new_emails.add(user.email)
+                new_users.append((index, source_id, user_dict))
+        
+        # Hash PINs in worker-sized batches so a large import never overflows the queue
+        for start in range(0, len(new_users), pin_pool.max_workers):
+            batch = new_users[start:start + pin_pool.max_workers]
+            hashed_pins = await asyncio.gather(*(pin_pool.hash(user_dict["pin"]) for _, _, user_dict in batch))
+            for (_, _, user_dict), hashed_pin in zip(batch, hashed_pins):
+                user_dict["pin"] = hashed_pin
+        
+        if mongo_available:
+            errors = await insert_many_unordered(db.users, [user_dict for _, _, user_dict in new_users])
+        else:
+            errors = {}
+            for _, _, user_dict in new_users:
+                in_memory_users[user_dict["email"]] = user_dict
+            # Gathered so one group fsync covers the whole batch
+            await asyncio.gather(*(persist_local("put_user", user_dict) for _, _, user_dict in new_users))
+        
+        for position, (index, source_id, user_dict) in enumerate(new_users):
+            error = errors.get(position)
+            if error is not None:
+                status_name = "exists" if error.get("code") == DUPLICATE_KEY_ERROR else "failed"
+                results[index] = import_result(index, "user", status_name, detail=error.get("errmsg"))
+                if source_id:
+                    failed_user_ids.add(str(source_id))
+                continue
+            stored_id = doc_id(user_dict)
+            results[index] = import_result(index, "user", "created", stored_id)
+            changes.append(change_entry("create", "users", stored_id, stored_id, project_row(user_dict, USER_FIELDS)))
+            if source_id:
+                user_id_map[str(source_id)] = stored_id
+        
+        # Resolve customers against the imported users and skip existing names
+        resolved = [
+            (index, user_id_map.get(user_id, user_id), customer)
+            for index, user_id, customer in customers
+        ]
+        if mongo_available:
+            existing_customers = set()
+            if resolved:
+                query = {
+                    "user_id": {"$in": list({user_id for _, user_id, _ in resolved})},
+                    "name": {"$in": list({customer.name for _, _, customer in resolved})},
+                }
+                async for customer in db.customers.find(query, {"user_id": 1, "name": 1}):
+                    existing_customers.add(InMemoryCustomerStore.customer_key(customer["user_id"], customer["name"]))
+        else:
+            existing_customers = in_memory_customers
+        
+        new_customers = []
+        seen_keys = set()
+        for index, user_id, customer in resolved:
+            if user_id in failed_user_ids:
+                results[index] = import_result(index, "customer", "failed", detail="User was not imported")
+                continue
+            customer_key = InMemoryCustomerStore.customer_key(user_id, customer.name)
+            if customer_key in existing_customers or customer_key in seen_keys:
+                results[index] = import_result(
+                    index, "customer", "exists",
+                    detail="Customer with this name already exists for this user"
+                )
+                continue
+            seen_keys.add(customer_key)
+            customer_dict = refresh_aggregates(customer_document(customer))
+            customer_dict["user_id"] = user_id
+            customer_dict["created_at"] = now
+            customer_dict["updated_at"] = now
+            if not mongo_available:
+                customer_dict["id"] = str(uuid.uuid4())
+            new_customers.append((index, customer_dict))
+        
+        if mongo_available:
+            errors = await insert_many_unordered(db.customers, [customer_dict for _, customer_dict in new_customers])
+        else:
+            errors = {}
+            for _, customer_dict in new_customers:
+                in_memory_customers.add(customer_dict)
+            await asyncio.gather(*(persist_local("put_customer", customer_dict) for _, customer_dict in new_customers))
+        
+        for position, (index, customer_dict) in enumerate(new_customers):
+            error = errors.get(position)
+            if error is not None:
+                status_name = "exists" if error.get("code") == DUPLICATE_KEY_ERROR else "failed"
+                results[index] = import_result(index, "customer", status_name, detail=error.get("errmsg"))
+            else:
+                results[index] = import_result(index, "customer", "created", doc_id(customer_dict))
+                changes.append(change_entry(
+                    "create", "customers", doc_id(customer_dict), customer_dict["user_id"],
+                    project_row(customer_dict, EXPORT_CUSTOMER_FIELDS)
+                ))
+        
+        await record_changes(changes)
+        
+        return {
+            "status": "success",
+            "summary": import_summary(results),
+            "user_id_map": user_id_map,
+            "results": results,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+# Export routes
+@api_router.get("/export")
+async def export_data():
+    """Stream every user and customer as NDJSON in a single pass
+
+    Users come first, followed by customers tagged with their ``user_id``, so a
+    full backup is one round trip instead of one request per user.
+    """
+    try:
+        if mongo_available:
+            users = db.users.find({}, mongo_projection(USER_FIELDS, ())).sort("_id", 1)
+            customers = db.customers.find({}, mongo_projection(EXPORT_CUSTOMER_FIELDS, ())).sort("_id", 1)
+        else:
+            # Use in-memory storage
+            users = list(in_memory_users.values())
+            customers = list(in_memory_customers.values())
+        
+        sections = (
+            ("user", users, lambda user: project_row(user, USER_FIELDS)),
+            ("customer", customers, lambda customer: project_row(customer, EXPORT_CUSTOMER_FIELDS, CUSTOMER_DEFAULTS)),
+        )
+        return StreamingResponse(stream_ndjson(sections), media_type="application/x-ndjson")
+    except Exception as e:
+        logger.error(f"Error exporting data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 # Add your routes to the router instead of directly to app
+# Change log routes
+@api_router.get("/changes")
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(MAX_CHANGES_PAGE, ge=1, le=MAX_CHANGES_PAGE),
+):
+    """Ordered user and customer writes after sequence number ``since``
+
+    Page through with ``since=<next>`` while ``has_more`` is set. A
+    ``truncated`` response, or an ``epoch`` other than the one ``since`` came
+    from, means entries after ``since`` are gone from the log, so the caller
+    has to fall back to a full read such as /export. ``head`` is the newest
+    sequence number; fetching it before a full read gives the position to
+    follow the log from afterwards.
+    """
+    try:
+        return await change_log.read(since, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @api_router.get("/")
 async def root():
     return {"message": "Hello World from BABS10 API"}
@@ -279,23 +2080,34 @@ async def health_check():
     return {
         "status": "healthy",
         "mongo_available": mongo_available,
+        "mongo": mongo_status,
+        "startup_ms": startup_timings,
+        "preload": preload_status,
+        "pin_hashing": pin_pool.metrics(),
+        "signin_cache": signin_cache.metrics(),
+        "user_summary_cache": user_summary_cache.metrics(),
+        "etags": data_versions.metrics(),
+        "change_log": change_log.metrics(),
+        "local_persistence": local_store.metrics() if local_store is not None else None,
+        "indexes": index_status,
         "timestamp": datetime.utcnow().isoformat()
     }
 
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
-    if not mongo_available:
-        return {"error": "Database not available"}
-    
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    if mongo_available:
+        _ = await db.status_checks.insert_one(status_obj.dict())
+    else:
+        LocalPersistence.apply("put_status_check", status_obj.dict())
+        await persist_local("put_status_check", status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     if not mongo_available:
-        return []
+        return [StatusCheck(**status_check) for status_check in in_memory_status_checks]
     
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
@@ -308,47 +2120,46 @@ async def create_customer(customer_data: CustomerCreate, user_id: str = None):
             raise HTTPException(status_code=400, detail="User ID is required")
         
         if mongo_available:
-            # Check if customer already exists for this user
-            existing_customer = await db.customers.find_one({
-                "name": customer_data.name,
-                "user_id": user_id
-            })
-            if existing_customer:
-                raise HTTPException(status_code=400, detail="Customer with this name already exists for this user")
-            
-            # Create new customer
-            customer_dict = customer_data.dict()
+            from pymongo.errors import DuplicateKeyError
+            # The unique (user_id, name) index rejects duplicates atomically once it is built
+            if not unique_index_ready("customers.user_id_name_unique"):
+                if await db.customers.find_one({"user_id": user_id, "name": customer_data.name}, {"_id": 1}):
+                    raise HTTPException(status_code=400, detail="Customer with this name already exists for this user")
+            customer_dict = refresh_aggregates(customer_document(customer_data))
             customer_dict["user_id"] = user_id
             customer_dict["created_at"] = datetime.utcnow()
             customer_dict["updated_at"] = datetime.utcnow()
             
-            result = await db.customers.insert_one(customer_dict)
+            try:
+                result = await db.customers.insert_one(customer_dict)
+            except DuplicateKeyError:
+                raise HTTPException(status_code=400, detail="Customer with this name already exists for this user")
             customer_dict["id"] = str(result.inserted_id)
         else:
             # Use in-memory storage
-            customer_key = f"{user_id}_{customer_data.name}"
+            customer_key = InMemoryCustomerStore.customer_key(user_id, customer_data.name)
             if customer_key in in_memory_customers:
                 raise HTTPException(status_code=400, detail="Customer with this name already exists for this user")
             
-            customer_dict = customer_data.dict()
+            customer_dict = refresh_aggregates(customer_document(customer_data))
             customer_dict["user_id"] = user_id
             customer_dict["created_at"] = datetime.utcnow()
             customer_dict["updated_at"] = datetime.utcnow()
             customer_dict["id"] = str(uuid.uuid4())
             
             # Store in memory
-            in_memory_customers[customer_key] = customer_dict
+            in_memory_customers.add(customer_dict)
+            await persist_local("put_customer", customer_dict)
+        
+        await record_changes([
+            change_entry(
+                "create", "customers", customer_dict["id"], user_id,
+                project_row(customer_dict, EXPORT_CUSTOMER_FIELDS)
+            )
+        ])
         
         # Return customer
-        return CustomerResponse(
-            id=customer_dict["id"],
-            name=customer_dict["name"],
-            money_given=customer_dict["money_given"],
-            total_spent=customer_dict["total_spent"],
-            orders=customer_dict["orders"],
-            created_at=customer_dict["created_at"],
-            updated_at=customer_dict["updated_at"]
-        )
+        return customer_response(customer_dict)
     except HTTPException:
         raise
     except Exception as e:
@@ -356,32 +2167,72 @@ async def create_customer(customer_data: CustomerCreate, user_id: str = None):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @api_router.get("/customers", response_model=List[CustomerResponse])
-async def get_customers_by_user(user_id: str):
+async def get_customers_by_user(
+    request: Request,
+    user_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     try:
+        selected = parse_fields(fields, CUSTOMER_FIELDS)
+        etag = data_versions.etag(f"customers:{user_id}")
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
         if mongo_available:
-            customers = await db.customers.find({"user_id": user_id}).to_list(1000)
+            query = {"user_id": user_id}
+            if cursor:
+                query["_id"] = {"$gt": mongo_id(cursor)}
+            customers = db.customers.find(query, mongo_projection(selected, CUSTOMER_FIELDS)).sort("_id", 1)
+            if limit is not None:
+                customers = customers.limit(limit + 1)
         else:
             # Use in-memory storage
-            customers = [
-                customer for customer in in_memory_customers.values() 
-                if customer["user_id"] == user_id
-            ]
+            customers = in_memory_customers.list_for_user(
+                user_id,
+                after=cursor,
+                limit=limit + 1 if limit is not None else None
+            )
         
-        return [
-            CustomerResponse(
-                id=customer["id"],
-                name=customer["name"],
-                money_given=customer["money_given"],
-                total_spent=customer["total_spent"],
-                orders=customer["orders"],
-                created_at=customer["created_at"],
-                updated_at=customer["updated_at"]
-            ) for customer in customers
-        ]
+        return await paged_json_response(
+            customers,
+            lambda customer: project_row(customer, selected, CUSTOMER_DEFAULTS),
+            limit,
+            etag
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting customers: {str(e)}")
         return []
 
+@api_router.get("/customers/{customer_id}/summary", response_model=CustomerSummary)
+async def get_customer_summary(customer_id: str, user_id: str = None):
+    """A customer's totals and aggregates without its order list"""
+    try:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="User ID is required")
+        
+        if mongo_available:
+            query = {"_id": mongo_id(customer_id), "user_id": user_id}
+            customer = await db.customers.find_one(query, mongo_projection(SUMMARY_CUSTOMER_FIELDS, ()))
+            if customer is not None and customer.get("aggregates") is None:
+                # Written before aggregates existed and not backfilled yet
+                customer = refresh_aggregates(await db.customers.find_one(query))
+        else:
+            customer = in_memory_customers.get(customer_id, user_id)
+        
+        if customer is None:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return CustomerSummary(**project_row(customer, SUMMARY_CUSTOMER_FIELDS, CUSTOMER_DEFAULTS))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting customer summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @api_router.delete("/customers/{customer_id}")
 async def delete_customer(customer_id: str, user_id: str = None):
     try:
@@ -390,23 +2241,18 @@ async def delete_customer(customer_id: str, user_id: str = None):
         
         if mongo_available:
             result = await db.customers.delete_one({
-                "_id": customer_id,
+                "_id": mongo_id(customer_id),
                 "user_id": user_id
             })
             if result.deleted_count == 0:
                 raise HTTPException(status_code=404, detail="Customer not found")
         else:
             # Use in-memory storage
-            customer_key = None
-            for key, customer in in_memory_customers.items():
-                if customer["id"] == customer_id and customer["user_id"] == user_id:
-                    customer_key = key
-                    break
-            
-            if customer_key:
-                del in_memory_customers[customer_key]
-            else:
+            if in_memory_customers.delete(customer_id, user_id) is None:
                 raise HTTPException(status_code=404, detail="Customer not found")
+            await persist_local("delete_customer", {"id": customer_id, "user_id": user_id})
+        
+        await record_changes([change_entry("delete", "customers", customer_id, user_id)])
         
         return {"message": "Customer deleted successfully"}
     except HTTPException:
@@ -422,67 +2268,236 @@ async def update_customer(customer_id: str, customer_update: CustomerUpdate, use
             raise HTTPException(status_code=400, detail="User ID is required")
         
         if mongo_available:
+            from pymongo import ReturnDocument
             # Find and update customer
-            update_data = customer_update.dict(exclude_unset=True)
+            update_data = customer_document(customer_update, exclude_unset=True)
             update_data["updated_at"] = datetime.utcnow()
             
-            result = await db.customers.update_one(
-                {"_id": customer_id, "user_id": user_id},
-                {"$set": update_data}
+            updated_customer = await db.customers.find_one_and_update(
+                {"_id": mongo_id(customer_id), "user_id": user_id},
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER
             )
             
-            if result.modified_count == 0:
+            if updated_customer is None:
                 raise HTTPException(status_code=404, detail="Customer not found")
-            
-            # Get updated customer
-            updated_customer = await db.customers.find_one({"_id": customer_id})
+            if "orders" in update_data or "money_given" in update_data or "aggregates" not in updated_customer:
+                refresh_aggregates(updated_customer)
+                # Guarded by updated_at so a slower request never overwrites newer aggregates
+                await db.customers.update_one(
+                    {"_id": updated_customer["_id"], "updated_at": updated_customer["updated_at"]},
+                    {"$set": {"aggregates": updated_customer["aggregates"]}}
+                )
         else:
             # Use in-memory storage
-            customer_key = None
-            for key, customer in in_memory_customers.items():
-                if customer["id"] == customer_id and customer["user_id"] == user_id:
-                    customer_key = key
-                    break
-            
-            if not customer_key:
+            customer = in_memory_customers.get(customer_id, user_id)
+            if customer is None:
                 raise HTTPException(status_code=404, detail="Customer not found")
             
             # Update customer in memory
-            customer = in_memory_customers[customer_key]
-            update_data = customer_update.dict(exclude_unset=True)
+            update_data = customer_document(customer_update, exclude_unset=True)
             customer.update(update_data)
             customer["updated_at"] = datetime.utcnow()
+            refresh_aggregates(customer)
+            await persist_local("put_customer", customer)
             
             updated_customer = customer
         
+        await record_changes([
+            change_entry(
+                "update", "customers", doc_id(updated_customer), user_id,
+                project_row(updated_customer, EXPORT_CUSTOMER_FIELDS, CUSTOMER_DEFAULTS)
+            )
+        ])
+        
         # Return updated customer
-        return CustomerResponse(
-            id=updated_customer["id"],
-            name=updated_customer["name"],
-            money_given=updated_customer.get("money_given", 0.0),
-            total_spent=updated_customer.get("total_spent", 0.0),
-            orders=updated_customer.get("orders", []),
-            created_at=updated_customer["created_at"],
-            updated_at=updated_customer["updated_at"]
-        )
+        return customer_response(updated_customer)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error updating customer: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Order routes change one order in place instead of rewriting the customer's
+# whole orders list, so the write and its change log entry stay small
+LATEST_ORDER_DATE = {
+    "$let": {
+        "vars": {"latest": {"$max": "$orders.orderDate"}},
+        "in": {"$cond": [{"$gt": ["$$latest", ""]}, {"$substrCP": ["$$latest", 0, 10]}, None]},
+    }
+}
+
+async def shift_mongo_aggregates(before: dict, old_order: Optional[dict], new_order: Optional[dict]) -> dict:
+    """Move a Mongo customer's aggregates by one order change that was already written
+
+    ``before`` is the customer's ``aggregates`` as of just before that write.
+    ``$inc`` commutes, so concurrent order writes to one customer still add up.
+    """
+    from pymongo import ReturnDocument
+    aggregates = before.get("aggregates")
+    if not aggregates:
+        # Not backfilled yet, so there is nothing to move; compute them in full
+        customer = refresh_aggregates(await db.customers.find_one({"_id": before["_id"]}))
+        await db.customers.update_one(
+            {"_id": customer["_id"], "updated_at": customer["updated_at"]},
+            {"$set": {"aggregates": customer["aggregates"]}}
+        )
+        return customer["aggregates"]
+    
+    delta = aggregates_delta(old_order, new_order)
+    update = {"$inc": {f"aggregates.{field}": float(value) for field, value in delta.items()}}
+    new_date = order_date(new_order) if new_order else None
+    if new_date:
+        update["$max"] = {"aggregates.last_order_date": new_date}
+    after = await db.customers.find_one_and_update(
+        {"_id": before["_id"]}, update,
+        projection={"aggregates": 1}, return_document=ReturnDocument.AFTER
+    )
+    if after is not None and latest_date_removed(aggregates, old_order, new_order):
+        after = await db.customers.find_one_and_update(
+            {"_id": before["_id"]}, [{"$set": {"aggregates.last_order_date": LATEST_ORDER_DATE}}],
+            projection={"aggregates": 1}, return_document=ReturnDocument.AFTER
+        )
+    return after["aggregates"] if after is not None else None
+
+def order_change(op: str, customer_id: str, order_id: str, user_id: str, order: Optional[dict] = None) -> dict:
+    return change_entry(op, "orders", order_id, user_id, {"customer_id": customer_id, **(order or {})})
+
+@api_router.post("/customers/{customer_id}/orders", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def create_order(customer_id: str, order: Order, user_id: str = None):
+    try:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="User ID is required")
+        
+        order_doc = order_documents([order])[0]
+        now = datetime.utcnow()
+        if mongo_available:
+            from pymongo import ReturnDocument
+            before = await db.customers.find_one_and_update(
+                {"_id": mongo_id(customer_id), "user_id": user_id, "orders.id": {"$ne": order_doc["id"]}},
+                {"$push": {"orders": order_doc}, "$set": {"updated_at": now}},
+                projection={"aggregates": 1}, return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                if await db.customers.count_documents({"_id": mongo_id(customer_id), "user_id": user_id}, limit=1):
+                    raise HTTPException(status_code=400, detail="Order with this id already exists")
+                raise HTTPException(status_code=404, detail="Customer not found")
+            aggregates = await shift_mongo_aggregates(before, None, order_doc)
+        else:
+            # Use in-memory storage
+            customer = in_memory_customers.get(customer_id, user_id)
+            if customer is None:
+                raise HTTPException(status_code=404, detail="Customer not found")
+            if order_index(customer, order_doc["id"]) is not None:
+                raise HTTPException(status_code=400, detail="Order with this id already exists")
+            
+            entry = {"customer_id": customer_id, "user_id": user_id, "order": order_doc, "updated_at": now}
+            LocalPersistence.apply("put_order", entry)
+            await persist_local("put_order", entry)
+            aggregates = customer["aggregates"]
+        
+        await record_changes([order_change("create", customer_id, order_doc["id"], user_id, order_doc)])
+        
+        return OrderResponse(customer_id=customer_id, order=order_doc, aggregates=aggregates, updated_at=now)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating order: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@api_router.patch("/customers/{customer_id}/orders/{order_id}", response_model=OrderResponse)
+async def update_order(customer_id: str, order_id: str, order_update: OrderUpdate, user_id: str = None):
+    try:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="User ID is required")
+        
+        changes = order_update.model_dump(mode="json", exclude_unset=True, exclude_none=True)
+        if not changes:
+            raise HTTPException(status_code=400, detail="No order fields to update")
+        now = datetime.utcnow()
+        if mongo_available:
+            from pymongo import ReturnDocument
+            # The positional $ sets fields of the matched order only
+            update_fields = {f"orders.$.{field}": value for field, value in changes.items()}
+            update_fields["updated_at"] = now
+            before = await db.customers.find_one_and_update(
+                {"_id": mongo_id(customer_id), "user_id": user_id, "orders.id": order_id},
+                {"$set": update_fields},
+                projection={"aggregates": 1, "orders.$": 1}, return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            old_order = before["orders"][0]
+            order_doc = {**old_order, **changes}
+            aggregates = await shift_mongo_aggregates(before, old_order, order_doc)
+        else:
+            # Use in-memory storage
+            customer = in_memory_customers.get(customer_id, user_id)
+            index = order_index(customer, order_id) if customer is not None else None
+            if index is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            
+            order_doc = {**customer["orders"][index], **changes}
+            entry = {"customer_id": customer_id, "user_id": user_id, "order": order_doc, "updated_at": now}
+            LocalPersistence.apply("put_order", entry)
+            await persist_local("put_order", entry)
+            aggregates = customer["aggregates"]
+        
+        await record_changes([order_change("update", customer_id, order_id, user_id, order_doc)])
+        
+        return OrderResponse(customer_id=customer_id, order=order_doc, aggregates=aggregates, updated_at=now)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating order: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@api_router.delete("/customers/{customer_id}/orders/{order_id}")
+async def delete_order(customer_id: str, order_id: str, user_id: str = None):
+    try:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="User ID is required")
+        
+        now = datetime.utcnow()
+        if mongo_available:
+            from pymongo import ReturnDocument
+            before = await db.customers.find_one_and_update(
+                {"_id": mongo_id(customer_id), "user_id": user_id, "orders.id": order_id},
+                {"$pull": {"orders": {"id": order_id}}, "$set": {"updated_at": now}},
+                projection={"aggregates": 1, "orders.$": 1}, return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            await shift_mongo_aggregates(before, before["orders"][0], None)
+        else:
+            # Use in-memory storage
+            customer = in_memory_customers.get(customer_id, user_id)
+            if customer is None or order_index(customer, order_id) is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            
+            entry = {"customer_id": customer_id, "user_id": user_id, "order_id": order_id, "updated_at": now}
+            LocalPersistence.apply("delete_order", entry)
+            await persist_local("delete_order", entry)
+        
+        await record_changes([order_change("delete", customer_id, order_id, user_id)])
+        
+        return {"message": "Order deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting order: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 # Include the router in the main app
 app.include_router(api_router)
 
-# Initialize in-memory storage for customers
-in_memory_customers = {}
-
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -492,61 +2507,201 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def mongo_indexes() -> dict:
+    """Indexes backing every Mongo query path, keyed by collection"""
+    from pymongo import ASCENDING, IndexModel
+    return {
+        "users": [
+            IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        ],
+        "customers": [
+            # Serves the user_id filter and the _id ordering of paginated listings
+            IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+            IndexModel([("user_id", ASCENDING), ("name", ASCENDING)], name="user_id_name_unique", unique=True),
+            # Serves the recent activity list of user summaries
+            IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_id_updated_at"),
+        ],
+        "changes": [
+            IndexModel([("seq", ASCENDING)], name="seq_unique", unique=True),
+            IndexModel(
+                [("timestamp", ASCENDING)],
+                name="timestamp_ttl",
+                expireAfterSeconds=CHANGE_LOG_RETENTION_DAYS * 24 * 3600
+            ),
+        ],
+    }
+
+index_status = {}
+
+def unique_index_ready(key: str) -> bool:
+    """True once the unique index ``key`` (``<collection>.<name>``) is built
+
+    Until then, and for good if the build failed on existing duplicates,
+    inserts cannot rely on it to reject duplicates.
+    """
+    return index_status.get(key, {}).get("state") == "ready"
+
+async def ensure_indexes():
+    """Create any missing Mongo indexes, recording progress in ``index_status``"""
+    indexes_by_collection = mongo_indexes()
+    for collection_name, indexes in indexes_by_collection.items():
+        for index in indexes:
+            index_status[f"{collection_name}.{index.document['name']}"] = {"state": "pending"}
+    
+    for collection_name, indexes in indexes_by_collection.items():
+        for index in indexes:
+            key = f"{collection_name}.{index.document['name']}"
+            index_status[key] = {"state": "building"}
+            started = time.monotonic()
+            try:
+                await db[collection_name].create_indexes([index])
+                index_status[key] = {"state": "ready", "seconds": round(time.monotonic() - started, 3)}
+            except Exception as e:
+                logger.error(f"Error creating index {key}: {str(e)}")
+                index_status[key] = {"state": "failed", "error": str(e)}
+
+async def backfill_aggregates():
+    """Compute aggregates for Mongo customers written before they existed"""
+    updated = 0
+    try:
+        async for customer in db.customers.find({"aggregates": {"$exists": False}}):
+            await db.customers.update_one(
+                {"_id": customer["_id"], "aggregates": {"$exists": False}},
+                {"$set": {"aggregates": customer_aggregates(customer)}}
+            )
+            updated += 1
+        if updated:
+            logger.info(f"Backfilled aggregates for {updated} customers")
+    except Exception as e:
+        logger.error(f"Error backfilling aggregates: {str(e)}")
+
+async def migrate_order_schema():
+    """Rewrite Mongo customers whose orders predate the typed order schema"""
+    migrated = 0
+    query = {"$or": [
+        {"orders.items.qty": {"$type": "string"}},
+        {"orders.items.price": {"$type": "string"}},
+        {"orders": {"$elemMatch": {"id": {"$exists": False}}}},
+        {"orders.items": {"$elemMatch": {"raw_qty": {"$exists": True}, "qty": {"$ne": 0}}}},
+        {"orders.items": {"$elemMatch": {"raw_price": {"$exists": True}, "price": {"$ne": 0}}}},
+    ]}
+    try:
+        async for customer in db.customers.find(query):
+            if not migrate_customer_orders(customer):
+                continue
+            refresh_aggregates(customer)
+            # Guarded by updated_at so an edit made meanwhile is not overwritten
+            result = await db.customers.update_one(
+                {"_id": customer["_id"], "updated_at": customer.get("updated_at")},
+                {"$set": {"orders": customer["orders"], "aggregates": customer["aggregates"]}}
+            )
+            migrated += result.modified_count
+        if migrated:
+            logger.info(f"Migrated orders of {migrated} customers to the typed schema")
+    except Exception as e:
+        logger.error(f"Error migrating order schema: {str(e)}")
+
+@app.on_event("startup")
+async def start_storage():
+    # Runs before the server accepts requests, so nobody sees a half-recovered store
+    init_storage()
+    if local_store is not None:
+        local_store.load()
+    if PRELOAD_SNAPSHOT:
+        await preload_snapshot()
+    if mongo_available:
+        # Ping and build indexes in the background so the first requests are not held up
+        app.state.mongo_ping = asyncio.create_task(ping_mongo())
+        app.state.index_build = asyncio.create_task(ensure_indexes())
+        app.state.aggregate_backfill = asyncio.create_task(backfill_aggregates())
+        app.state.order_migration = asyncio.create_task(migrate_order_schema())
+    mark_startup("startup_complete")
+
+if STARTUP_PROFILE:
+    @app.middleware("http")
+    async def profile_first_request(request: Request, call_next):
+        response = await call_next(request)
+        if "first_request" not in startup_timings:
+            mark_startup("first_request")
+            logger.info(f"Startup profile (ms since import began): {startup_timings}")
+        return response
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     if client:
         client.close()
+    if local_store is not None:
+        await local_store.close()
+    pin_pool.shutdown()
 
 # Add backup endpoint
 @app.post("/api/backup/trigger")
 async def trigger_backup(backup_request: dict):
-    """Trigger a backup when data is updated"""
+    """Trigger a backup when data is updated
+
+    The trigger is published to the backup change feed, waking any backup
+    service long-polling ``/api/backup/changes``.
+    """
     try:
         logger.info(f"Backup triggered by user: {backup_request.get('user')}")
         
-        # Create a backup entry
-        backup_data = {
-            "id": str(uuid.uuid4()),
-            "user": backup_request.get('user'),
-            "action": backup_request.get('action'),
-            "timestamp": backup_request.get('timestamp'),
-            "created_at": datetime.now().isoformat()
-        }
-        
-        # Store backup trigger in memory (you could also save to file here)
-        if not hasattr(app.state, 'backup_triggers'):
-            app.state.backup_triggers = []
-        
-        app.state.backup_triggers.append(backup_data)
-        
-        # Keep only last 100 backup triggers
-        if len(app.state.backup_triggers) > 100:
-            app.state.backup_triggers = app.state.backup_triggers[-100:]
+        backup_id = str(uuid.uuid4())
+        event = backup_feed.publish(
+            "backup_trigger",
+            backup_id=backup_id,
+            user=backup_request.get('user'),
+            trigger_action=backup_request.get('action'),
+            client_timestamp=backup_request.get('timestamp'),
+        )
         
-        return {"status": "success", "message": "Backup triggered", "backup_id": backup_data["id"]}
+        return {"status": "success", "message": "Backup triggered", "backup_id": backup_id, "seq": event["seq"]}
         
     except Exception as e:
         logger.error(f"Error triggering backup: {e}")
         raise HTTPException(status_code=500, detail=f"Backup trigger failed: {str(e)}")
 
+@app.get("/api/backup/changes")
+async def get_backup_changes(
+    since: Optional[int] = Query(None, ge=0),
+    timeout: float = Query(25, ge=0, le=MAX_LONG_POLL_SECONDS),
+):
+    """Long-poll the backup change feed
+
+    Returns the changes after ``since`` as soon as there are any, or an empty
+    list after ``timeout`` seconds. Without ``since`` the current position is
+    returned immediately so a new subscriber can start from it. A different
+    ``epoch`` than last time means the server restarted and sequence numbers
+    started over; ``truncated`` means older changes were dropped from the feed.
+    """
+    try:
+        if since is None:
+            return {**backup_feed.since(backup_feed.seq), "changes": []}
+        return await backup_feed.wait(since, timeout)
+    except Exception as e:
+        logger.error(f"Error reading backup changes: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to read backup changes: {str(e)}")
+
 # Add backup status endpoint
 @app.get("/api/backup/status")
 async def get_backup_status():
     """Get backup status and recent triggers"""
     try:
-        backup_triggers = getattr(app.state, 'backup_triggers', [])
+        backup_triggers = [event for event in backup_feed.events if event["action"] == "backup_trigger"]
         
         return {
             "status": "healthy",
             "backup_triggers_count": len(backup_triggers),
-            "recent_triggers": backup_triggers[-10:] if backup_triggers else [],
-            "last_backup": backup_triggers[-1] if backup_triggers else None
+            "recent_triggers": backup_triggers[-10:],
+            "last_backup": backup_triggers[-1] if backup_triggers else None,
+            "change_feed": backup_feed.metrics(),
         }
         
     except Exception as e:
         logger.error(f"Error getting backup status: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get backup status: {str(e)}")
 
+mark_startup("module_loaded")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
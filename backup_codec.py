@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Backup Codecs for BABS10
+Pluggable serialization for backup snapshots. New files start with a small
+header (magic, format version, codec id) followed by the encoded payload;
+files without the header are read as the legacy indented JSON, so every
+existing backup keeps working.
+
+Record-oriented codecs stream in both directions: BackupWriter appends
+records as they arrive and iter_backup yields them lazily, so memory stays
+constant however many customers and orders a backup holds.
+
+The codec a file is written with follows its name (``codec_for_path``), so
+``.json`` backups such as data_backup.json stay plain JSON that any tool can
+open; other names use BACKUP_CODEC (default ``ndjson.gz``).
+
+Codecs:
+    json        legacy pretty-printed JSON (no header, read/write)
+    ndjson      one {"type", "data"} record per line, same shape as /api/export
+    ndjson.gz   gzip-compressed NDJSON
+    ndjson.zst  zstd-compressed NDJSON (needs the ``zstandard`` package)
+    msgpack     binary MessagePack records (needs the ``msgpack`` package)
+"""
+
+import gzip
+import io
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b"BABSBK"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 2
+RECORD_KINDS = (("user", "users"), ("customer", "customers"))
+
+CODEC_IDS = {
+    "ndjson": 1,
+    "ndjson.gz": 2,
+    "ndjson.zst": 3,
+    "msgpack": 4,
+}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+DEFAULT_CODEC = os.environ.get("BACKUP_CODEC", "ndjson.gz")
+# Longest extensions first, so ``.ndjson.gz`` is not taken for ``.gz``
+CODEC_EXTENSIONS = (
+    (".ndjson.gz", "ndjson.gz"),
+    (".ndjson.zst", "ndjson.zst"),
+    (".ndjson", "ndjson"),
+    (".msgpack", "msgpack"),
+    (".json", "json"),
+)
+
+class BackupFormatError(ValueError):
+    """Raised for unknown codecs, unsupported versions or corrupt headers"""
+
+def codec_for_path(path):
+    """The codec a backup file name calls for; DEFAULT_CODEC for other names"""
+    name = os.fspath(path)
+    for extension, codec in CODEC_EXTENSIONS:
+        if name.endswith(extension):
+            return codec
+    return DEFAULT_CODEC
+
+def available_codecs():
+    """Codec names usable with the packages installed here"""
+    codecs = ["json", "ndjson", "ndjson.gz"]
+    if zstandard is not None:
+        codecs.append("ndjson.zst")
+    if msgpack is not None:
+        codecs.append("msgpack")
+    return codecs
+
+def backup_records(all_data):
+    """Flatten a backup dict into ``(type, data)`` records, metadata first"""
+    metadata = {key: value for key, value in all_data.items() if key not in ("users", "customers")}
+    yield "meta", metadata
+    for record_type, kind in RECORD_KINDS:
+        for record in all_data.get(kind, []):
+            yield record_type, record
+
+def collect_records(records):
+    """Rebuild a backup dict from ``(type, data)`` records"""
+    all_data = {"users": [], "customers": []}
+    kinds = dict(RECORD_KINDS)
+    for record_type, data in records:
+        if record_type == "meta":
+            all_data.update(data)
+        elif record_type in kinds:
+            all_data[kinds[record_type]].append(data)
+    return all_data
+
+def _header(codec):
+    return MAGIC + bytes([FORMAT_VERSION, CODEC_IDS[codec]])
+
+def _open_payload_writer(raw, codec):
+    """Wrap a raw binary file in the codec's compression layer"""
+    if codec == "ndjson.gz":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5)
+    if codec == "ndjson.zst":
+        if zstandard is None:
+            raise BackupFormatError("The ndjson.zst codec needs the zstandard package")
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return raw
+
+def _open_payload_reader(raw, codec):
+    if codec == "ndjson.gz":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if codec == "ndjson.zst":
+        if zstandard is None:
+            raise BackupFormatError("Reading ndjson.zst backups needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+    return raw
+
+def write_records(f, records, codec=DEFAULT_CODEC):
+    """Encode ``(type, data)`` records to a binary file object"""
+    if codec == "json":
+        text = json.dumps(collect_records(records), indent=2, default=str)
+        f.write(text.encode("utf-8"))
+        return
+    if codec not in CODEC_IDS:
+        raise BackupFormatError(f"Unknown backup codec: {codec}")
+    if codec == "msgpack" and msgpack is None:
+        raise BackupFormatError("The msgpack codec needs the msgpack package")
+
+    f.write(_header(codec))
+    if codec == "msgpack":
+        packer = msgpack.Packer(default=str)
+        for record_type, data in records:
+            f.write(packer.pack([record_type, data]))
+        return
+
+    payload = _open_payload_writer(f, codec)
+    try:
+        for line in ndjson_lines(records):
+            payload.write(line)
+    finally:
+        if payload is not f:
+            payload.close()
+
+def ndjson_lines(records):
+    """Encode ``(type, data)`` records as NDJSON lines, e.g. for a chunked upload"""
+    for record_type, data in records:
+        line = json.dumps({"type": record_type, "data": data}, separators=(",", ":"), default=str)
+        yield line.encode("utf-8") + b"\n"
+
+class BackupWriter:
+    """Append backup records to a file one at a time
+
+    The metadata record is written on open, then each ``write`` call encodes a
+    single user or customer. The legacy ``json`` codec cannot be appended to,
+    so it buffers records and writes them on close. Without a ``codec`` the
+    file name picks one; pass it explicitly when writing to a temp file.
+    """
+
+    def __init__(self, path, metadata, codec=None):
+        codec = codec or codec_for_path(path)
+        if codec not in CODEC_IDS and codec != "json":
+            raise BackupFormatError(f"Unknown backup codec: {codec}")
+        if codec == "msgpack" and msgpack is None:
+            raise BackupFormatError("The msgpack codec needs the msgpack package")
+        self.path = path
+        self.codec = codec
+        self.counts = {kind: 0 for _, kind in RECORD_KINDS}
+        self._kinds = dict(RECORD_KINDS)
+        self._file = open(path, "wb")
+        self._buffered = None
+        self._payload = None
+        self._packer = None
+        if codec == "json":
+            self._buffered = [("meta", metadata)]
+            return
+        self._file.write(_header(codec))
+        if codec == "msgpack":
+            self._packer = msgpack.Packer(default=str)
+        else:
+            self._payload = _open_payload_writer(self._file, codec)
+        self._write_record("meta", metadata)
+
+    def _write_record(self, record_type, data):
+        if self._buffered is not None:
+            self._buffered.append((record_type, data))
+        elif self._packer is not None:
+            self._file.write(self._packer.pack([record_type, data]))
+        else:
+            for line in ndjson_lines([(record_type, data)]):
+                self._payload.write(line)
+
+    def write(self, record_type, data):
+        """Append one ``user`` or ``customer`` record"""
+        self._write_record(record_type, data)
+        self.counts[self._kinds[record_type]] += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self._buffered is not None:
+                write_records(self._file, self._buffered, "json")
+            elif self._payload is not None and self._payload is not self._file:
+                self._payload.close()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def detect_codec(f):
+    """Identify the codec of a binary file object positioned at its start"""
+    header = f.read(HEADER_SIZE)
+    f.seek(0)
+    if not header.startswith(MAGIC):
+        return "json"
+    if len(header) < HEADER_SIZE:
+        raise BackupFormatError("Truncated backup header")
+    version, codec_id = header[len(MAGIC)], header[len(MAGIC) + 1]
+    if version > FORMAT_VERSION:
+        raise BackupFormatError(f"Backup format version {version} is newer than supported ({FORMAT_VERSION})")
+    if codec_id not in CODEC_NAMES:
+        raise BackupFormatError(f"Unknown backup codec id: {codec_id}")
+    return CODEC_NAMES[codec_id]
+
+def read_records(f):
+    """Decode ``(type, data)`` records from a binary file object, auto-detecting the codec"""
+    codec = detect_codec(f)
+    if codec == "json":
+        yield from backup_records(json.load(io.TextIOWrapper(f, encoding="utf-8")))
+        return
+
+    f.seek(HEADER_SIZE)
+    if codec == "msgpack":
+        if msgpack is None:
+            raise BackupFormatError("Reading msgpack backups needs the msgpack package")
+        for record_type, data in msgpack.Unpacker(f, raw=False):
+            yield record_type, data
+        return
+
+    payload = _open_payload_reader(f, codec)
+    if codec == "ndjson.zst":
+        # zstd stream readers do not support line iteration themselves
+        payload = io.BufferedReader(payload)
+    for line in payload:
+        if line.strip():
+            record = json.loads(line)
+            yield record["type"], record["data"]
+
+def iter_backup(path):
+    """Lazily yield ``(type, data)`` records from ``path``, metadata first
+
+    Legacy JSON backups have no record framing and are loaded whole.
+    """
+    with open(path, "rb") as f:
+        yield from read_records(f)
+
+def summarize_backup(path):
+    """Return a backup's metadata with ``users``/``customers`` counts, in one streaming pass"""
+    summary = {"users": 0, "customers": 0}
+    kinds = dict(RECORD_KINDS)
+    for record_type, data in iter_backup(path):
+        if record_type == "meta":
+            summary = {**data, **summary}
+        elif record_type in kinds:
+            summary[kinds[record_type]] += 1
+    return summary
+
+def write_backup(path, all_data, codec=None):
+    """Write a backup dict to ``path`` with the given codec, or the one its name calls for"""
+    codec = codec or codec_for_path(path)
+    with open(path, "wb") as f:
+        write_records(f, backup_records(all_data), codec)
+
+def read_backup(path):
+    """Read a backup dict from ``path``, whatever codec wrote it"""
+    with open(path, "rb") as f:
+        return collect_records(read_records(f))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Backup Codec Benchmark for BABS10
+Compares write time, read time and file size of every available backup codec
+against today's indented JSON, using a real backup file or synthetic data.
+
+Usage:
+    python backup_codec_benchmark.py                 # synthetic 5000 customers
+    python backup_codec_benchmark.py data_backup.json
+    python backup_codec_benchmark.py --customers 20000
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+import uuid
+
+from backup_codec import available_codecs, read_backup, write_backup
+
+def synthetic_backup(user_count, customer_count, orders_per_customer):
+    """Build a backup dict shaped like the real data, with string order fields"""
+    now = datetime.datetime.now().isoformat()
+    users = [
+        {"id": str(uuid.uuid4()), "email": f"user{i}@example.com", "created_at": now, "updated_at": now}
+        for i in range(user_count)
+    ]
+    customers = []
+    for i in range(customer_count):
+        orders = [
+            {
+                "id": str(uuid.uuid4()),
+                "date": now,
+                "items": [
+                    {"desc": "Kente dress", "qty": "2", "color": "gold", "size": "M", "price": "150.00"},
+                    {"desc": "Headwrap", "qty": "1", "color": "blue", "size": "", "price": "35.50"},
+                ],
+            }
+            for _ in range(orders_per_customer)
+        ]
+        customers.append({
+            "id": str(uuid.uuid4()),
+            "user_id": users[i % user_count]["id"],
+            "name": f"Customer {i}",
+            "money_given": 500.0,
+            "total_spent": 335.5 * orders_per_customer,
+            "orders": orders,
+            "created_at": now,
+            "updated_at": now,
+        })
+    return {
+        "backup_created": now,
+        "backup_type": "benchmark",
+        "users": users,
+        "customers": customers,
+    }
+
+def time_call(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_benchmark(all_data, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec in available_codecs():
+            path = os.path.join(tmp_dir, f"backup.{codec}")
+            write_seconds = time_call(lambda: write_backup(path, all_data, codec), repeat)
+            read_seconds = time_call(lambda: read_backup(path), repeat)
+            if read_backup(path)["customers"] != all_data["customers"]:
+                raise AssertionError(f"{codec} did not round-trip the backup")
+            results.append((codec, os.path.getsize(path), write_seconds, read_seconds))
+    return results
+
+def print_results(results):
+    baseline = next(result for result in results if result[0] == "json")
+    print(f"{'codec':<12} {'size':>12} {'ratio':>7} {'write ms':>10} {'read ms':>10}")
+    print("-" * 55)
+    for codec, size, write_seconds, read_seconds in results:
+        print(
+            f"{codec:<12} {size:>12,} {size / baseline[1]:>6.1%} "
+            f"{write_seconds * 1000:>10.1f} {read_seconds * 1000:>10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BABS10 backup codecs")
+    parser.add_argument("backup_file", nargs="?", help="existing backup to benchmark (any codec)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=5, help="orders per synthetic customer")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is reported")
+    args = parser.parse_args()
+
+    if args.backup_file:
+        all_data = read_backup(args.backup_file)
+        print(f"📁 {args.backup_file}: {len(all_data['users'])} users, {len(all_data['customers'])} customers")
+    else:
+        all_data = synthetic_backup(args.users, args.customers, args.orders)
+        print(f"🧪 Synthetic backup: {args.users} users, {args.customers} customers, {args.orders} orders each")
+
+    print_results(run_benchmark(all_data, args.repeat))
+
+if __name__ == "__main__":
+    main()
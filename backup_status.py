@@ -10,6 +10,8 @@ import datetime
 import os
 from pathlib import Path
 
+from backup_store import ContentAddressedStore
+
 # Configuration
 BACKEND_URL = "https://babs10.onrender.com/api"
 
@@ -102,43 +104,48 @@ def check_keep_alive_service():
         print(f"❌ Keep-alive service: ERROR ({e})")
         return False
 
+def check_snapshot_store(label, store_dir):
+    """Report the snapshots of one content-addressed store; False when it has none"""
+    if not os.path.isdir(store_dir):
+        return False
+    store = ContentAddressedStore(store_dir)
+    snapshots = store.list_snapshots()
+    if not snapshots:
+        return False
+    latest = store.load_manifest(snapshots[-1])
+    print(f"✅ {label}: {len(snapshots)} snapshots ({store.disk_usage()} bytes)")
+    print(f"   📄 Latest: {snapshots[-1]} - {len(latest.get('users', []))} users, {len(latest.get('customers', []))} customers")
+    print(f"   ⏰ Created: {latest.get('backup_created', 'unknown')}")
+    print(f"   💡 Restore with: python3 backup_store.py {store_dir} --snapshot {snapshots[-1]}")
+    return True
+
 def check_backup_files():
     """Check existing backup files"""
     print("\n📁 Checking backup files...")
     
-    # Check auto backups
-    auto_backup_dir = "auto_backups"
-    if os.path.exists(auto_backup_dir):
-        auto_backups = list(Path(auto_backup_dir).glob("auto_backup_*.json"))
-        if auto_backups:
-            latest_auto = max(auto_backups, key=os.path.getctime)
-            size = os.path.getsize(latest_auto)
-            modified = datetime.datetime.fromtimestamp(latest_auto.stat().st_mtime)
-            print(f"✅ Auto-backups: {len(auto_backups)} files")
-            print(f"   📄 Latest: {latest_auto.name}")
-            print(f"   📊 Size: {size} bytes")
-            print(f"   ⏰ Modified: {modified.strftime('%Y-%m-%d %H:%M:%S')}")
-        else:
-            print("❌ Auto-backups: No files found")
-    else:
-        print("❌ Auto-backups: Directory not found")
-    
-    # Check manual backups
-    manual_backup_dir = "manual_backups"
-    if os.path.exists(manual_backup_dir):
-        manual_backups = list(Path(manual_backup_dir).glob("manual_backup_*.json"))
-        if manual_backups:
-            latest_manual = max(manual_backups, key=os.path.getctime)
-            size = os.path.getsize(latest_manual)
-            modified = datetime.datetime.fromtimestamp(latest_manual.stat().st_mtime)
-            print(f"✅ Manual backups: {len(manual_backups)} files")
-            print(f"   📄 Latest: {latest_manual.name}")
+    backup_sets = (
+        ("Auto-backups", "auto_backups", "auto_backup_*.json"),
+        ("Manual backups", "manual_backups", "manual_backup_*.json"),
+        ("Super backups", "auto_backups_super", "super_backup_*.json"),
+    )
+    for label, backup_dir, pattern in backup_sets:
+        if not os.path.exists(backup_dir):
+            print(f"❌ {label}: Directory not found")
+            continue
+        
+        # Snapshots in the store, plus files written before the store existed
+        has_snapshots = check_snapshot_store(f"{label} (snapshot store)", f"{backup_dir}/store")
+        backup_files = list(Path(backup_dir).glob(pattern))
+        if backup_files:
+            latest = max(backup_files, key=os.path.getctime)
+            size = os.path.getsize(latest)
+            modified = datetime.datetime.fromtimestamp(latest.stat().st_mtime)
+            print(f"✅ {label}: {len(backup_files)} files")
+            print(f"   📄 Latest: {latest.name}")
             print(f"   📊 Size: {size} bytes")
             print(f"   ⏰ Modified: {modified.strftime('%Y-%m-%d %H:%M:%S')}")
-        else:
-            print("❌ Manual backups: No files found")
-    else:
-        print("❌ Manual backups: Directory not found")
+        elif not has_snapshots:
+            print(f"❌ {label}: No snapshots or files found")
     
     # Check original backup
     original_backup = "data_backup.json"
@@ -151,6 +158,19 @@ def check_backup_files():
     else:
         print("❌ Original backup: Not found")
 
+def count_customers(user_id):
+    """Count a user's customers from the small /summary response
+
+    Falls back to downloading the customer list from backends without it.
+    """
+    response = requests.get(f"{BACKEND_URL}/users/{user_id}/summary", timeout=10)
+    if response.status_code == 200:
+        return response.json()["customer_count"]
+    response = requests.get(f"{BACKEND_URL}/customers?user_id={user_id}", timeout=10)
+    if response.status_code == 200:
+        return len(response.json())
+    return None
+
 def check_data_integrity():
     """Check if data is accessible and complete"""
     print("\n🔍 Checking data integrity...")
@@ -168,11 +188,10 @@ def check_data_integrity():
                 user_id = user.get('id')
                 user_email = user.get('email', 'unknown')
                 if user_id:
-                    customer_response = requests.get(f"{BACKEND_URL}/customers?user_id={user_id}", timeout=10)
-                    if customer_response.status_code == 200:
-                        customers = customer_response.json()
-                        total_customers += len(customers)
-                        print(f"   👤 {user_email}: {len(customers)} customers")
+                    customer_count = count_customers(user_id)
+                    if customer_count is not None:
+                        total_customers += customer_count
+                        print(f"   👤 {user_email}: {customer_count} customers")
             
             print(f"✅ Total customers: {total_customers}")
             return True
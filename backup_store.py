@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Backup Store for BABS10
+Stores every user and customer record once, keyed by the SHA-256 of its
+content, and describes each snapshot with a small manifest of record hashes.
+Unchanged records are shared by every snapshot that contains them, so keeping
+hundreds of restore points costs roughly one full copy plus the changes.
+
+Layout:
+    <root>/objects/<hash[:2]>/<hash>.json   one record per object
+    <root>/manifests/<snapshot_id>.json     snapshot metadata + record hashes
+
+A snapshot is restored by exporting it to a regular backup file, which the
+restore scripts read:
+    python backup_store.py manual_backups/store --list
+    python backup_store.py manual_backups/store                  # newest -> data_backup.json
+    python backup_store.py auto_backups/store --snapshot 20250824_130946_380902 --output restore.json
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+RECORD_KINDS = ("users", "customers")
+
+def record_hash(record):
+    """Content hash of a record, covering updated_at and every other field"""
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ContentAddressedStore:
+    """Deduplicated snapshot store rooted at a backup directory"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / f"{digest}.json"
+
+    def put_record(self, record):
+        """Store a record if its content is new; return its hash and whether it was written"""
+        digest = record_hash(record)
+        path = self._object_path(digest)
+        if path.exists():
+            return digest, False
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+        return digest, True
+
+    def get_record(self, digest):
+        with open(self._object_path(digest), 'r') as f:
+            return json.load(f)
+
+    def snapshot_writer(self, metadata, snapshot_id=None):
+        """Start a snapshot that records are added to one at a time"""
+        return SnapshotWriter(self, metadata, snapshot_id)
+
+    def put_snapshot(self, all_data, snapshot_id=None):
+        """Store a full backup dict; return ``(snapshot_id, new_objects)``
+
+        Every key other than the record lists is kept in the manifest as
+        snapshot metadata.
+        """
+        metadata = {key: value for key, value in all_data.items() if key not in RECORD_KINDS}
+        writer = self.snapshot_writer(metadata, snapshot_id)
+        for kind in RECORD_KINDS:
+            for record in all_data.get(kind, []):
+                writer.add(kind, record)
+        return writer.commit(), writer.new_objects
+
+    def list_snapshots(self):
+        """Snapshot ids, oldest first"""
+        return sorted(path.stem for path in self.manifests_dir.glob("*.json"))
+
+    def load_manifest(self, snapshot_id):
+        with open(self.manifests_dir / f"{snapshot_id}.json", 'r') as f:
+            return json.load(f)
+
+    def iter_snapshot(self, snapshot_id, kinds=RECORD_KINDS):
+        """Lazily yield ``(kind, record)`` pairs of a snapshot, limited to ``kinds``"""
+        manifest = self.load_manifest(snapshot_id)
+        for kind in kinds:
+            for digest in manifest.get(kind, []):
+                yield kind, self.get_record(digest)
+
+    def snapshot_metadata(self, snapshot_id):
+        """A snapshot's manifest without the record hash lists"""
+        manifest = self.load_manifest(snapshot_id)
+        return {key: value for key, value in manifest.items() if key not in RECORD_KINDS}
+
+    def load_snapshot(self, snapshot_id=None):
+        """Rebuild a full backup dict; the newest snapshot when no id is given"""
+        if snapshot_id is None:
+            snapshots = self.list_snapshots()
+            if not snapshots:
+                return None
+            snapshot_id = snapshots[-1]
+        snapshot = self.load_manifest(snapshot_id)
+        for kind in RECORD_KINDS:
+            snapshot[kind] = [self.get_record(digest) for digest in snapshot.get(kind, [])]
+        return snapshot
+
+    def prune(self, keep):
+        """Keep the newest ``keep`` snapshots and delete objects nothing references
+
+        Returns ``(deleted_snapshots, deleted_objects)``.
+        """
+        snapshots = self.list_snapshots()
+        expired = snapshots[:-keep] if keep > 0 else snapshots
+        for snapshot_id in expired:
+            (self.manifests_dir / f"{snapshot_id}.json").unlink()
+
+        deleted_objects = 0
+        if expired:
+            referenced = set()
+            for snapshot_id in self.list_snapshots():
+                manifest = self.load_manifest(snapshot_id)
+                for kind in RECORD_KINDS:
+                    referenced.update(manifest.get(kind, []))
+            for path in self.objects_dir.glob("*/*.json"):
+                if path.stem not in referenced:
+                    path.unlink()
+                    deleted_objects += 1
+        return len(expired), deleted_objects
+
+    def disk_usage(self):
+        """Total bytes used by objects and manifests"""
+        return sum(path.stat().st_size for path in self.root.rglob("*.json"))
+
+class SnapshotWriter:
+    """Builds one snapshot incrementally; only record hashes stay in memory
+
+    Nothing is visible in the store until ``commit`` writes the manifest.
+    """
+
+    def __init__(self, store, metadata, snapshot_id=None):
+        self.store = store
+        self.snapshot_id = snapshot_id or datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.manifest = dict(metadata)
+        self.manifest["snapshot_id"] = self.snapshot_id
+        for kind in RECORD_KINDS:
+            self.manifest[kind] = []
+        self.new_objects = 0
+
+    def add(self, kind, record):
+        """Store one record under ``kind`` and return its content hash"""
+        digest, written = self.store.put_record(record)
+        self.manifest[kind].append(digest)
+        self.new_objects += written
+        return digest
+
+    def commit(self):
+        """Write the manifest, making the snapshot visible; return its id"""
+        # The manifest goes last, so a snapshot never references missing objects
+        manifest_path = self.store.manifests_dir / f"{self.snapshot_id}.json"
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, separators=(",", ":"))
+        os.replace(tmp_path, manifest_path)
+        return self.snapshot_id
+
+def export_snapshot(store, path, snapshot_id=None, codec=None):
+    """Write a snapshot to a backup file that the restore scripts can read
+
+    Records are streamed from the store, and the file is replaced atomically
+    with a checksum sidecar like every other backup file. Exports the newest
+    snapshot when no id is given; returns the id exported, or None when the
+    store is empty.
+    """
+    from atomic_file import AtomicFile
+    from backup_codec import BackupWriter, codec_for_path
+
+    if snapshot_id is None:
+        snapshots = store.list_snapshots()
+        if not snapshots:
+            return None
+        snapshot_id = snapshots[-1]
+    kinds = {"users": "user", "customers": "customer"}
+    with AtomicFile(path) as backup_file:
+        metadata = store.snapshot_metadata(snapshot_id)
+        with BackupWriter(backup_file.tmp_path, metadata, codec or codec_for_path(path)) as writer:
+            for kind, record in store.iter_snapshot(snapshot_id):
+                writer.write(kinds[kind], record)
+    return snapshot_id
+
+def main():
+    from backup_codec import available_codecs
+
+    parser = argparse.ArgumentParser(description="List or export snapshots of a BABS10 backup store")
+    parser.add_argument("store", help="store directory, e.g. manual_backups/store")
+    parser.add_argument("--list", action="store_true", help="list the stored snapshots and exit")
+    parser.add_argument("--snapshot", help="snapshot id to export (default: the newest)")
+    parser.add_argument("--output", default="data_backup.json", help="backup file to write (default: data_backup.json)")
+    parser.add_argument("--codec", choices=available_codecs(), help="backup file codec (default: from the output name)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.store):
+        print(f"❌ No backup store at {args.store}")
+        sys.exit(1)
+    store = ContentAddressedStore(args.store)
+
+    if args.list:
+        for snapshot_id in store.list_snapshots():
+            manifest = store.load_manifest(snapshot_id)
+            print(f"📄 {snapshot_id} - {len(manifest.get('users', []))} users, {len(manifest.get('customers', []))} customers")
+        return
+
+    try:
+        snapshot_id = export_snapshot(store, args.output, args.snapshot, args.codec)
+    except FileNotFoundError:
+        print(f"❌ Snapshot {args.snapshot} not found in {args.store}")
+        sys.exit(1)
+    if snapshot_id is None:
+        print(f"❌ No snapshots in {args.store}")
+        sys.exit(1)
+    print(f"✅ Exported snapshot {snapshot_id} to {args.output}")
+
+if __name__ == "__main__":
+    main()
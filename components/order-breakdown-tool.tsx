@@ -41,6 +41,19 @@ interface Customer {
   lastUpdated: string
 }
 
+// The backend stores qty and price as numbers and keeps any text it could not
+// parse as a number in raw_qty / raw_price
+interface BackendItem extends Omit<Item, "qty" | "price"> {
+  qty: number | string
+  price: number | string
+  raw_qty?: number | string
+  raw_price?: number | string
+}
+
+interface BackendOrder extends Omit<Order, "items"> {
+  items: BackendItem[]
+}
+
 interface BackendCustomer {
   id: string
   name: string
@@ -48,9 +61,18 @@ interface BackendCustomer {
   updated_at: string
   money_given: number
   total_spent: number
-  orders: Order[]
+  orders: BackendOrder[]
 }
 
+const toFrontendOrder = (order: BackendOrder): Order => ({
+  ...order,
+  items: order.items.map(({ raw_qty, raw_price, ...item }) => ({
+    ...item,
+    qty: String(raw_qty ?? item.qty),
+    price: String(raw_price ?? item.price),
+  })),
+})
+
 interface OrderBreakdownToolProps {
   currentUser?: string
 }
@@ -118,7 +140,7 @@ export default function OrderBreakdownTool({ currentUser }: OrderBreakdownToolPr
             name: backendCustomer.name,
             moneyGiven: backendCustomer.money_given || 0,
             totalSpent: backendCustomer.total_spent || 0,
-            orders: backendCustomer.orders || [],
+            orders: (backendCustomer.orders || []).map(toFrontendOrder),
             lastUpdated: new Date(backendCustomer.updated_at).toLocaleString()
           }
         })
@@ -5,7 +5,6 @@ This service ensures data integrity between local backups and remote backend
 """
 
 import json
-import requests
 import time
 import datetime
 import signal
@@ -13,6 +12,10 @@ import sys
 import os
 from pathlib import Path
 
+from atomic_file import AtomicFile, verify_checksum
+from backup_codec import codec_for_path, read_backup, write_backup
+from http_client import BackendClient
+
 # Configuration
 REMOTE_API = "https://babs10-backend.vercel.app/api"
 SYNC_INTERVAL = 300  # 5 minutes
@@ -20,6 +23,8 @@ LOG_FILE = "data_sync_service.log"
 BACKUP_DIR = "auto_backups_super"
 MAIN_BACKUP_FILE = "data_backup.json"
 
+client = BackendClient(REMOTE_API)  # Pooled keep-alive connections, retries and bounded concurrency
+
 def log_message(message):
     """Log message to file and print to console"""
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -33,11 +38,42 @@ def log_message(message):
     except Exception as e:
         print(f"Error writing to log: {e}")
 
+def export_remote_data():
+    """Get all data from the remote /export endpoint in one streamed request
+
+    Returns None when the backend does not offer /export.
+    """
+    try:
+        response = client.get("/export", timeout=60, stream=True)
+        if response.status_code != 200:
+            log_message(f"⚠️ Export endpoint unavailable: {response.status_code}")
+            return None
+        
+        data = {"users": [], "customers": []}
+        for line in response.iter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if record["type"] == "user":
+                data["users"].append(record["data"])
+            elif record["type"] == "customer":
+                data["customers"].append(record["data"])
+        
+        log_message(f"👥 Exported {len(data['users'])} users, {len(data['customers'])} customers from remote backend")
+        return data
+    except Exception as e:
+        log_message(f"⚠️ Error exporting remote data: {e}")
+        return None
+
 def get_remote_data():
     """Get all data from remote backend"""
     try:
+        exported = export_remote_data()
+        if exported is not None:
+            return exported
+        
         # Get users
-        users_response = requests.get(f"{REMOTE_API}/users", timeout=30)
+        users_response = client.get("/users")
         if users_response.status_code != 200:
             log_message(f"❌ Failed to get users from remote: {users_response.status_code}")
             return None
@@ -45,18 +81,14 @@ def get_remote_data():
         users = users_response.json()
         log_message(f"👥 Found {len(users)} users in remote backend")
         
-        # Get customers for each user
+        # Get customers for all users concurrently
         all_customers = []
-        for user in users:
-            user_id = user.get('id')
-            if user_id:
-                customers_response = requests.get(f"{REMOTE_API}/customers?user_id={user_id}", timeout=30)
-                if customers_response.status_code == 200:
-                    customers = customers_response.json()
-                    all_customers.extend(customers)
-                    log_message(f"📊 User {user['email']}: {len(customers)} customers")
-                else:
-                    log_message(f"⚠️ Failed to get customers for user {user['email']}: {customers_response.status_code}")
+        for user, customers in client.fetch_customers(users):
+            if isinstance(customers, Exception):
+                log_message(f"⚠️ Failed to get customers for user {user['email']}: {customers}")
+                continue
+            all_customers.extend(customers)
+            log_message(f"📊 User {user['email']}: {len(customers)} customers")
         
         return {
             "users": users,
@@ -70,21 +102,24 @@ def get_remote_data():
 def get_local_backup_data():
     """Get data from local backup files"""
     try:
-        # Try to get from main backup file first
-        if os.path.exists(MAIN_BACKUP_FILE):
-            with open(MAIN_BACKUP_FILE, 'r') as f:
-                data = json.load(f)
-                log_message(f"📁 Loaded local backup: {len(data.get('users', []))} users, {len(data.get('customers', []))} customers")
-                return data
+        # Try to get from main backup file first, unless it fails its checksum
+        if os.path.exists(MAIN_BACKUP_FILE) and verify_checksum(MAIN_BACKUP_FILE) is False:
+            log_message(f"⚠️ {MAIN_BACKUP_FILE} failed its checksum, ignoring it")
+        elif os.path.exists(MAIN_BACKUP_FILE):
+            data = read_backup(MAIN_BACKUP_FILE)
+            log_message(f"📁 Loaded local backup: {len(data.get('users', []))} users, {len(data.get('customers', []))} customers")
+            return data
         
         # Fallback to latest backup file
-        backup_files = list(Path(BACKUP_DIR).glob("super_backup_*.json"))
+        backup_files = [
+            path for path in Path(BACKUP_DIR).glob("super_backup_*.json")
+            if verify_checksum(path) is not False
+        ]
         if backup_files:
             latest_backup = max(backup_files, key=os.path.getctime)
-            with open(latest_backup, 'r') as f:
-                data = json.load(f)
-                log_message(f"📁 Loaded latest backup: {len(data.get('users', []))} users, {len(data.get('customers', []))} customers")
-                return data
+            data = read_backup(latest_backup)
+            log_message(f"📁 Loaded latest backup: {len(data.get('users', []))} users, {len(data.get('customers', []))} customers")
+            return data
         
         log_message("⚠️ No local backup files found")
         return None
@@ -140,12 +175,12 @@ def sync_data():
         }
         
         # Save to backup file
-        with open(backup_filename, 'w') as f:
-            json.dump(backup_data, f, indent=2)
+        with AtomicFile(backup_filename) as backup_file:
+            write_backup(backup_file.tmp_path, backup_data, codec_for_path(backup_filename))
         
-        # Update main backup file
-        with open(MAIN_BACKUP_FILE, 'w') as f:
-            json.dump(backup_data, f, indent=2)
+        # Update main backup file; the lock keeps the backup service from interleaving
+        with AtomicFile(MAIN_BACKUP_FILE) as main_backup:
+            write_backup(main_backup.tmp_path, backup_data, codec_for_path(MAIN_BACKUP_FILE))
         
         log_message(f"✅ Data sync completed, backup saved: {backup_filename}")
         log_message(f"✅ Main backup file updated: {MAIN_BACKUP_FILE}")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Shared Backend HTTP Client for BABS10
+One pooled, keep-alive ``requests`` session per backend with bounded
+concurrency and retries with jittered exponential backoff. The backup, sync
+and restore scripts use it so that crawling N users costs about
+N / concurrency round trips over reused connections instead of N sequential
+requests that each open a fresh connection.
+
+GETs remember the ETag of every response that carries one and revalidate
+with ``If-None-Match``; when the backend answers 304 Not Modified the
+earlier response is handed back, so polling unchanged users and customers
+costs a header exchange instead of a full body. Only the most recently used
+responses are kept, so crawling many users does not hold every body forever.
+
+Usage:
+    client = BackendClient("https://babs10.onrender.com/api")
+    users = client.get_json("/users")
+    for user, customers in client.fetch_customers(users):
+        ...
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying: rate limiting and a sleeping/redeploying free-tier host
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods that are safe to repeat when a response never arrived
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Responses kept for ETag revalidation; each holds a whole body in memory
+ETAG_CACHE_SIZE = 256
+
+_shared_clients = {}
+
+class BackendClient:
+    """Pooled HTTP/1.1 keep-alive client with retries and bounded concurrency"""
+
+    def __init__(self, base_url, concurrency=8, retries=3, backoff=0.5, max_backoff=10.0, timeout=30,
+                 etag_cache_size=ETAG_CACHE_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.not_modified = 0
+        self.etag_cache_size = etag_cache_size
+        self._etag_responses = OrderedDict()
+        # run_concurrently calls get from several threads
+        self._etag_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter keeps several scripts from retrying in lockstep
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    def request(self, method, path, retry=None, **kwargs):
+        """Send a request, retrying connection errors and retryable statuses
+
+        Only idempotent methods are retried unless ``retry=True``: a POST that
+        timed out or got a 5xx may still have been applied, and repeating it
+        would create the record twice. Connect timeouts are always retried,
+        since the request never left. The last response is returned even when
+        its status is an error, so callers keep their own status handling; the
+        last connection error is raised once retries are exhausted.
+        """
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectTimeout:
+                if attempt == self.retries:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                if not retry or attempt == self.retries:
+                    raise
+            else:
+                if not retry or response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                response.close()
+            self._sleep_before_retry(attempt)
+
+    def get(self, path, **kwargs):
+        """GET ``path``, revalidating a previously fetched body by its ETag
+
+        A 304 returns the stored 200 response, so callers handle both alike.
+        Streamed responses are never stored, and past ``etag_cache_size``
+        the least recently used one is dropped.
+        """
+        if kwargs.get("stream"):
+            return self.request("GET", path, **kwargs)
+        key = (path, tuple(sorted((kwargs.get("params") or {}).items())))
+        with self._etag_lock:
+            cached = self._etag_responses.get(key)
+        if cached is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": cached.headers["ETag"]}
+        response = self.request("GET", path, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            with self._etag_lock:
+                self.not_modified += 1
+                if key in self._etag_responses:
+                    self._etag_responses.move_to_end(key)
+            return cached
+        if response.status_code == 200 and "ETag" in response.headers and self.etag_cache_size > 0:
+            response.content  # Read the body now so the response can be handed out again
+            with self._etag_lock:
+                self._etag_responses[key] = response
+                self._etag_responses.move_to_end(key)
+                while len(self._etag_responses) > self.etag_cache_size:
+                    self._etag_responses.popitem(last=False)
+        else:
+            with self._etag_lock:
+                self._etag_responses.pop(key, None)
+        return response
+
+    def get_json(self, path, **kwargs):
+        """GET ``path`` and decode JSON, raising for error statuses"""
+        response = self.get(path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def _gather(self, calls):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(func, *args):
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(func, *args)
+                except Exception as e:
+                    return e
+
+        return await asyncio.gather(*(run(func, *args) for func, *args in calls))
+
+    def run_concurrently(self, calls):
+        """Run ``(func, *args)`` calls at most ``concurrency`` at a time
+
+        Results come back in call order; a call that raised yields its
+        exception instead of a result.
+        """
+        return asyncio.run(self._gather(calls))
+
+    def fetch_customers(self, users):
+        """Fetch every user's customers concurrently
+
+        Returns ``(user, customers)`` pairs in user order, where ``customers``
+        is the exception raised for that user if the fetch failed.
+        """
+        users = [user for user in users if user.get("id")]
+        calls = [(self.get_customers, user["id"]) for user in users]
+        return list(zip(users, self.run_concurrently(calls)))
+
+    def get_customers(self, user_id):
+        return self.get_json("/customers", params={"user_id": user_id})
+
+    def close(self):
+        self.session.close()
+
+def shared_client(base_url, **kwargs):
+    """Return the process-wide client for ``base_url``, creating it on first use
+
+    Jobs that run in one process (see babs10_system_daemon.py) share a
+    connection pool per backend instead of each opening its own.
+    """
+    key = base_url.rstrip("/")
+    if key not in _shared_clients:
+        _shared_clients[key] = BackendClient(key, **kwargs)
+    return _shared_clients[key]
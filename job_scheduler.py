@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Asyncio Job Scheduler for BABS10
+Runs the keep-alive, backup and restore jobs as tasks in one process instead
+of one Python interpreter per service. Each job has its own interval with
+random jitter, so jobs hitting the same backend do not fire in lockstep, and
+a job whose previous run is still in progress skips its tick rather than
+piling up overlapping runs. Jobs added with ``after_completion=True`` (such
+as a long-poll subscriber) instead wait ``interval`` after each run ends, so
+they run back to back and never overlap or skip.
+
+Blocking job functions (the existing ``requests``-based ones) run in worker
+threads; coroutine functions are awaited directly on the loop.
+
+Usage:
+    scheduler = JobScheduler()
+    scheduler.add_job("auto_backup", create_backup, interval=120, jitter=0.1)
+    scheduler.add_job("feed", poll_feed, interval=1, after_completion=True)
+    asyncio.run(scheduler.run())   # until scheduler.stop()
+"""
+
+import asyncio
+import inspect
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A periodic job and its run statistics"""
+
+    def __init__(self, name, func, interval, jitter=0.1, initial_delay=0.0, after_completion=False):
+        if interval <= 0:
+            raise ValueError(f"Job {name} needs a positive interval")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_delay = initial_delay
+        self.after_completion = after_completion
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_duration = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def next_delay(self):
+        """Seconds until the next tick, spread by up to ``jitter`` of the interval"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def status(self):
+        return {
+            "interval": self.interval,
+            "after_completion": self.after_completion,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": self.last_started,
+            "last_duration": self.last_duration,
+        }
+
+class JobScheduler:
+    """Single-process scheduler with per-job intervals, jitter and overlap protection"""
+
+    def __init__(self, shutdown_timeout=30):
+        self.jobs = {}
+        self.shutdown_timeout = shutdown_timeout
+        self._loop = None
+        self._stopping = None
+
+    def add_job(self, name, func, interval, jitter=0.1, initial_delay=0.0, after_completion=False):
+        if name in self.jobs:
+            raise ValueError(f"Job {name} is already scheduled")
+        job = Job(name, func, interval, jitter, initial_delay, after_completion)
+        self.jobs[name] = job
+        return job
+
+    async def _run_once(self, job):
+        job.runs += 1
+        job.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                result = await job.func()
+            else:
+                result = await asyncio.to_thread(job.func)
+            # The service functions report failure by returning False
+            if result is False:
+                job.failures += 1
+                logger.warning(f"⚠️ {job.name} run #{job.runs} reported failure")
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"❌ {job.name} run #{job.runs} failed: {e}")
+        finally:
+            job.last_duration = time.perf_counter() - started
+
+    async def _schedule(self, job):
+        next_run = self._loop.time() + job.initial_delay
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), max(0.0, next_run - self._loop.time()))
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            if job.running:
+                job.skipped += 1
+                logger.warning(f"⏭️ {job.name} still running from its previous tick, skipping")
+            else:
+                job.task = asyncio.create_task(self._run_once(job))
+
+            if job.after_completion:
+                # Wait for the run (or shutdown), then count the interval from its end
+                stopping = asyncio.create_task(self._stopping.wait())
+                await asyncio.wait({job.task, stopping}, return_when=asyncio.FIRST_COMPLETED)
+                stopping.cancel()
+                next_run = self._loop.time() + job.next_delay()
+            else:
+                # Ticks missed while the loop was busy are dropped, not replayed
+                next_run = max(next_run + job.next_delay(), self._loop.time())
+
+    async def run(self):
+        """Run every job until ``stop`` is called, then wait for in-flight runs"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        logger.info(f"🚀 Scheduler running {len(self.jobs)} jobs: {', '.join(self.jobs)}")
+        schedulers = [asyncio.create_task(self._schedule(job)) for job in self.jobs.values()]
+        try:
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            await asyncio.gather(*schedulers, return_exceptions=True)
+            in_flight = [job.task for job in self.jobs.values() if job.running]
+            if in_flight:
+                logger.info(f"⏳ Waiting for {len(in_flight)} running jobs to finish...")
+                # Worker threads cannot be interrupted, so stragglers are left to exit with the process
+                await asyncio.wait(in_flight, timeout=self.shutdown_timeout)
+            logger.info("✅ Scheduler stopped")
+
+    def stop(self):
+        """Ask the scheduler to stop; safe to call from signal handlers and other threads"""
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def status(self):
+        return {name: job.status() for name, job in self.jobs.items()}
@@ -5,25 +5,58 @@ Run this script anytime to create a manual backup of your current data
 """
 
 import json
-import requests
 import datetime
 import os
 from pathlib import Path
 
+from backup_store import ContentAddressedStore
+from http_client import BackendClient
+
 # Configuration
 BACKEND_URL = "https://babs10.onrender.com/api"
 BACKUP_DIR = "manual_backups"
+STORE_DIR = f"{BACKUP_DIR}/store"  # Content-addressed snapshot store
+
+client = BackendClient(BACKEND_URL)  # Pooled keep-alive connections, retries and bounded concurrency
 
 def create_backup_directory():
     """Create backup directory if it doesn't exist"""
     Path(BACKUP_DIR).mkdir(exist_ok=True)
     print(f"📁 Backup directory: {BACKUP_DIR}")
 
+def export_all_data():
+    """Fetch all users and customers in one streamed /export request
+
+    Returns a ``(users, customers)`` tuple, or None when the backend does not
+    offer /export.
+    """
+    try:
+        print("🔍 Exporting users and customers...")
+        response = client.get("/export", timeout=60, stream=True)
+        if response.status_code != 200:
+            print(f"⚠️ Export endpoint unavailable: {response.status_code}")
+            return None
+        
+        users, customers = [], []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if record["type"] == "user":
+                users.append(record["data"])
+            elif record["type"] == "customer":
+                customers.append(record["data"])
+        print(f"✅ Exported {len(users)} users and {len(customers)} customers")
+        return users, customers
+    except Exception as e:
+        print(f"⚠️ Error exporting data: {e}")
+        return None
+
 def get_all_users():
     """Fetch all users from backend"""
     try:
         print("🔍 Fetching users...")
-        response = requests.get(f"{BACKEND_URL}/users", timeout=30)
+        response = client.get("/users")
         if response.status_code == 200:
             users = response.json()
             print(f"✅ Found {len(users)} users")
@@ -35,21 +68,18 @@ def get_all_users():
         print(f"❌ Error fetching users: {e}")
         return []
 
-def get_customers_for_user(user_id, user_email):
-    """Fetch customers for a specific user"""
-    try:
-        print(f"🔍 Fetching customers for {user_email}...")
-        response = requests.get(f"{BACKEND_URL}/customers?user_id={user_id}", timeout=30)
-        if response.status_code == 200:
-            customers = response.json()
-            print(f"✅ Found {len(customers)} customers for {user_email}")
-            return customers
-        else:
-            print(f"❌ Failed to fetch customers for {user_email}: {response.status_code}")
-            return []
-    except Exception as e:
-        print(f"❌ Error fetching customers for {user_email}: {e}")
-        return []
+def get_customers_for_users(users):
+    """Fetch customers for all users concurrently"""
+    print(f"🔍 Fetching customers for {len(users)} users...")
+    all_customers = []
+    for user, customers in client.fetch_customers(users):
+        user_email = user.get('email', 'unknown')
+        if isinstance(customers, Exception):
+            print(f"❌ Error fetching customers for {user_email}: {customers}")
+            continue
+        print(f"✅ Found {len(customers)} customers for {user_email}")
+        all_customers.extend(customers)
+    return all_customers
 
 def create_manual_backup():
     """Create a complete manual backup of all data"""
@@ -57,8 +87,9 @@ def create_manual_backup():
         print("🚀 Starting manual backup...")
         print("=" * 60)
         
-        # Get all users
-        users = get_all_users()
+        # Get all users and customers in one round trip when possible
+        exported = export_all_data()
+        users = exported[0] if exported else get_all_users()
         if not users:
             print("⚠️ No users found, cannot create backup")
             return False
@@ -73,27 +104,24 @@ def create_manual_backup():
         }
         
         total_customers = 0
-        for user in users:
-            user_id = user.get('id')
-            user_email = user.get('email', 'unknown')
-            if user_id:
-                customers = get_customers_for_user(user_id, user_email)
-                all_data["customers"].extend(customers)
-                total_customers += len(customers)
-        
-        # Create timestamped backup file
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{BACKUP_DIR}/manual_backup_{timestamp}.json"
+        if exported:
+            all_data["customers"] = exported[1]
+            total_customers = len(exported[1])
+        else:
+            all_data["customers"] = get_customers_for_users(users)
+            total_customers = len(all_data["customers"])
         
-        with open(backup_filename, 'w') as f:
-            json.dump(all_data, f, indent=2)
+        # Store the snapshot; unchanged records are shared with earlier ones
+        store = ContentAddressedStore(STORE_DIR)
+        snapshot_id, new_objects = store.put_snapshot(all_data)
         
         print("=" * 60)
         print(f"✅ Manual backup created successfully!")
-        print(f"📁 File: {backup_filename}")
+        print(f"📁 Snapshot: {snapshot_id} in {STORE_DIR}")
         print(f"👥 Users backed up: {len(users)}")
         print(f"🏪 Customers backed up: {total_customers}")
-        print(f"📊 Total data size: {os.path.getsize(backup_filename)} bytes")
+        print(f"🆕 New records stored: {new_objects}")
+        print(f"📊 Total store size: {store.disk_usage()} bytes")
         print("=" * 60)
         
         return True
@@ -105,6 +133,14 @@ def create_manual_backup():
 def list_existing_backups():
     """List all existing manual backups"""
     try:
+        store = ContentAddressedStore(STORE_DIR)
+        snapshots = store.list_snapshots()
+        if snapshots:
+            print(f"\n📚 Stored manual snapshots ({len(snapshots)}, {store.disk_usage()} bytes total):")
+            for snapshot_id in reversed(snapshots):
+                manifest = store.load_manifest(snapshot_id)
+                print(f"  📄 {snapshot_id} - {len(manifest['users'])} users, {len(manifest['customers'])} customers")
+        
         backup_files = list(Path(BACKUP_DIR).glob("manual_backup_*.json"))
         if backup_files:
             print(f"\n📚 Existing manual backups ({len(backup_files)}):")
@@ -112,7 +148,7 @@ def list_existing_backups():
                 size = os.path.getsize(file)
                 modified = datetime.datetime.fromtimestamp(file.stat().st_mtime)
                 print(f"  📄 {file.name} ({size} bytes) - {modified.strftime('%Y-%m-%d %H:%M:%S')}")
-        else:
+        elif not snapshots:
             print(f"\n📚 No existing manual backups found in {BACKUP_DIR}")
     except Exception as e:
         print(f"❌ Error listing backups: {e}")
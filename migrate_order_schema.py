@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Order Schema Migration for BABS10
+Converts the orders inside existing backups to the typed order schema: item
+quantities become integers, prices become numbers instead of strings, and
+orders without an id get one. Text that is not a clean number is kept in
+``raw_qty``/``raw_price`` and the number becomes 0. Source backups are never
+modified: each file is written to a ``<name>_typed`` copy in the codec its
+name calls for, and a content-addressed store gets a new migrated snapshot on
+top of its newest one, so older restore points stay untouched.
+
+The schema and conversion rules come from the backend itself, so backups and
+stored documents are converted identically.
+
+Usage:
+    python migrate_order_schema.py                          # data_backup.json
+    python migrate_order_schema.py backup1.json backup2.json
+    python migrate_order_schema.py --store auto_backups_super/store
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from atomic_file import AtomicFile
+from backup_codec import BackupWriter, codec_for_path, iter_backup
+from backup_store import ContentAddressedStore
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+from server import migrate_customer_orders
+
+MAIN_BACKUP_FILE = "data_backup.json"
+
+def typed_path(path):
+    """``data_backup.json`` -> ``data_backup_typed.json``, keeping multi-part extensions"""
+    path = Path(path)
+    stem, dot, extensions = path.name.partition(".")
+    return path.with_name(f"{stem}_typed{dot}{extensions}")
+
+def migrate_backup_file(path):
+    """Write a typed copy of one backup file; return ``(copy path, customers converted)``
+
+    No copy is written when nothing needed converting.
+    """
+    migrated = 0
+    output = typed_path(path)
+    with AtomicFile(output) as backup_file:
+        records = iter_backup(path)
+        _, metadata = next(records)
+        with BackupWriter(backup_file.tmp_path, metadata, codec_for_path(output)) as writer:
+            for record_type, data in records:
+                if record_type == "customer" and migrate_customer_orders(data):
+                    migrated += 1
+                writer.write(record_type, data)
+        if not migrated:
+            backup_file.discard()
+    return (output if migrated else None), migrated
+
+def migrate_store(root):
+    """Add a migrated copy of the newest snapshot; return ``(snapshot_id, customers converted)``"""
+    store = ContentAddressedStore(root)
+    snapshots = store.list_snapshots()
+    if not snapshots:
+        return None, 0
+    manifest = store.load_manifest(snapshots[-1])
+    metadata = {key: value for key, value in manifest.items() if key not in ("users", "customers", "snapshot_id")}
+    metadata["migrated_from"] = snapshots[-1]
+    writer = store.snapshot_writer(metadata)
+    migrated = 0
+    for kind, record in store.iter_snapshot(snapshots[-1]):
+        if kind == "customers" and migrate_customer_orders(record):
+            migrated += 1
+        writer.add(kind, record)
+    if not migrated:
+        return None, 0
+    return writer.commit(), migrated
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert BABS10 backups to the typed order schema")
+    parser.add_argument("backup_files", nargs="*", help=f"backup files to migrate (default: {MAIN_BACKUP_FILE})")
+    parser.add_argument("--store", action="append", default=[], help="content-addressed store directory to migrate")
+    args = parser.parse_args()
+
+    backup_files = args.backup_files
+    if not backup_files and not args.store and os.path.exists(MAIN_BACKUP_FILE):
+        backup_files = [MAIN_BACKUP_FILE]
+    if not backup_files and not args.store:
+        print("❌ Nothing to migrate")
+        sys.exit(1)
+
+    for path in backup_files:
+        try:
+            output, migrated = migrate_backup_file(path)
+            if migrated:
+                print(f"✅ {path}: converted orders of {migrated} customers into {output}")
+            else:
+                print(f"✅ {path}: already uses the typed order schema")
+        except Exception as e:
+            print(f"❌ {path}: {e}")
+
+    for root in args.store:
+        try:
+            snapshot_id, migrated = migrate_store(root)
+            if snapshot_id:
+                print(f"✅ {root}: snapshot {snapshot_id} holds {migrated} converted customers")
+            else:
+                print(f"✅ {root}: newest snapshot already uses the typed order schema")
+        except Exception as e:
+            print(f"❌ {root}: {e}")
+
+if __name__ == "__main__":
+    main()
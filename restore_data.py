@@ -4,30 +4,36 @@ Data Restoration Script for BABS10
 This script restores all backed up data to ensure nothing is lost during deployment
 """
 
-import json
 import requests
 import sys
 from datetime import datetime
 
+from backup_codec import iter_backup, summarize_backup
+
 # Configuration
 API_BASE_URL = "https://babs10.onrender.com/api"  # Your deployed Render backend
 BACKUP_FILE = "data_backup.json"
 
 def load_backup_data():
-    """Load the backup data from file"""
+    """Load the backup metadata and record counts; records are streamed later"""
     try:
-        with open(BACKUP_FILE, 'r') as f:
-            return json.load(f)
+        return summarize_backup(BACKUP_FILE)
     except FileNotFoundError:
         print(f"❌ Backup file {BACKUP_FILE} not found!")
         return None
-    except json.JSONDecodeError:
+    except ValueError:
         print(f"❌ Error reading backup file {BACKUP_FILE}")
         return None
 
-def restore_users(users_data):
+def iter_backup_records(record_type):
+    """Lazily yield the backup's records of one type"""
+    for current_type, data in iter_backup(BACKUP_FILE):
+        if current_type == record_type:
+            yield data
+
+def restore_users(users_data, user_count):
     """Restore all users"""
-    print(f"🔄 Restoring {len(users_data)} users...")
+    print(f"🔄 Restoring {user_count} users...")
     
     for user in users_data:
         try:
@@ -48,9 +54,9 @@ def restore_users(users_data):
         except Exception as e:
             print(f"❌ Error restoring user {user['email']}: {str(e)}")
 
-def restore_customers(customers_data):
+def restore_customers(customers_data, customer_count):
     """Restore all customers"""
-    print(f"🔄 Restoring {len(customers_data)} customers...")
+    print(f"🔄 Restoring {customer_count} customers...")
     
     for customer in customers_data:
         try:
@@ -84,8 +90,8 @@ def main():
         sys.exit(1)
     
     print(f"📅 Backup created: {backup_data.get('backup_created', 'Unknown')}")
-    print(f"👥 Users to restore: {len(backup_data.get('users', []))}")
-    print(f"🏪 Customers to restore: {len(backup_data.get('customers', []))}")
+    print(f"👥 Users to restore: {backup_data['users']}")
+    print(f"🏪 Customers to restore: {backup_data['customers']}")
     print()
     
     # Test API connection
@@ -104,16 +110,16 @@ def main():
     print()
     
     # Restore users first
-    restore_users(backup_data.get('users', []))
+    restore_users(iter_backup_records("user"), backup_data['users'])
     print()
     
     # Restore customers
-    restore_customers(backup_data.get('customers', []))
+    restore_customers(iter_backup_records("customer"), backup_data['customers'])
     print()
     
     print("🎉 Data restoration completed!")
     print("💡 You can now log in with your existing accounts:")
-    for user in backup_data.get('users', []):
+    for user in iter_backup_records("user"):
         print(f"   📧 {user['email']} (PIN: {user['pin']})")
 
 if __name__ == "__main__":
@@ -4,11 +4,13 @@ Fixed Data Restoration Script for BABS10
 This script properly restores data by mapping old user IDs to new ones
 """
 
-import json
 import requests
 import sys
 from datetime import datetime
 
+from auto_restore_service import DEFAULT_PIN, import_records
+from backup_codec import iter_backup, ndjson_lines, read_backup, summarize_backup
+
 # Configuration
 API_BASE_URL = "https://babs10.onrender.com/api"
 BACKUP_FILE = "data_backup.json"
@@ -16,12 +18,22 @@ BACKUP_FILE = "data_backup.json"
 def load_backup_data():
     """Load the backup data from file"""
     try:
-        with open(BACKUP_FILE, 'r') as f:
-            return json.load(f)
+        return read_backup(BACKUP_FILE)
+    except FileNotFoundError:
+        print(f"❌ Backup file {BACKUP_FILE} not found!")
+        return None
+    except ValueError:
+        print(f"❌ Error reading backup file {BACKUP_FILE}")
+        return None
+
+def load_backup_summary():
+    """Read the backup metadata and record counts without loading the records"""
+    try:
+        return summarize_backup(BACKUP_FILE)
     except FileNotFoundError:
         print(f"❌ Backup file {BACKUP_FILE} not found!")
         return None
-    except json.JSONDecodeError:
+    except ValueError:
         print(f"❌ Error reading backup file {BACKUP_FILE}")
         return None
 
@@ -45,6 +57,41 @@ def get_user_id_mapping(users_data):
     
     return email_to_id
 
+def import_backup():
+    """Restore users and customers with one bulk /import request
+
+    The backup file is streamed to the backend as chunked NDJSON, with the
+    same record filtering as the auto-restore service. Users that already
+    exist are matched by email and their customers are remapped to the
+    deployed user IDs. Returns the number of customers restored, or None
+    when the backend does not offer /import.
+    """
+    print("🔄 Importing backup in one request...")
+    response = requests.post(
+        f"{API_BASE_URL}/import",
+        data=ndjson_lines(import_records(BACKUP_FILE)),
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=300
+    )
+    if response.status_code in [404, 405]:
+        print("⚠️  Import endpoint unavailable, restoring customers one by one")
+        return None
+    if response.status_code != 200:
+        print(f"❌ Bulk import failed: {response.status_code}")
+        print(f"   Response: {response.text}")
+        return 0
+    
+    counts = {"created": 0, "exists": 0, "failed": 0}
+    for result in response.json().get('results', []):
+        if result['status'] == 'failed':
+            print(f"❌ Failed to restore {result['type']} #{result['index']}: {result.get('detail')}")
+        if result['type'] == 'customer':
+            counts[result['status'] if result['status'] in counts else 'failed'] += 1
+    print(f"ℹ️  Skipped existing customers: {counts['exists']}")
+    if counts['failed']:
+        print(f"❌ Failed customers: {counts['failed']}")
+    return counts['created']
+
 def restore_customers_with_mapping(customers_data, email_to_id):
     """Restore customers using email-to-ID mapping"""
     print(f"\n🔄 Restoring {len(customers_data)} customers...")
@@ -107,13 +154,13 @@ def main():
     print("=" * 50)
     
     global backup_data
-    backup_data = load_backup_data()
-    if not backup_data:
+    summary = load_backup_summary()
+    if not summary:
         sys.exit(1)
     
-    print(f"📅 Backup created: {backup_data.get('backup_created', 'Unknown')}")
-    print(f"👥 Users to restore: {len(backup_data.get('users', []))}")
-    print(f"🏪 Customers to restore: {len(backup_data.get('customers', []))}")
+    print(f"📅 Backup created: {summary.get('backup_created', 'Unknown')}")
+    print(f"👥 Users to restore: {summary['users']}")
+    print(f"🏪 Customers to restore: {summary['customers']}")
     print()
     
     # Test API connection
@@ -131,22 +178,28 @@ def main():
     
     print()
     
-    # Get user ID mapping
-    email_to_id = get_user_id_mapping(backup_data.get('users', []))
-    
-    if not email_to_id:
-        print("❌ No user ID mapping found. Cannot restore customers.")
-        sys.exit(1)
-    
-    # Restore customers with proper mapping
-    restored_count = restore_customers_with_mapping(backup_data.get('customers', []), email_to_id)
+    restored_count = import_backup()
+    if restored_count is None:
+        # The record-by-record fallback needs the whole backup in memory
+        backup_data = load_backup_data()
+        
+        # Get user ID mapping
+        email_to_id = get_user_id_mapping(backup_data.get('users', []))
+        
+        if not email_to_id:
+            print("❌ No user ID mapping found. Cannot restore customers.")
+            sys.exit(1)
+        
+        # Restore customers with proper mapping
+        restored_count = restore_customers_with_mapping(backup_data.get('customers', []), email_to_id)
     
     print()
     print("🎉 Data restoration completed!")
     print(f"✅ Restored {restored_count} customers")
     print("💡 You can now log in with your existing accounts:")
-    for user in backup_data.get('users', []):
-        print(f"   📧 {user['email']} (PIN: {user['pin']})")
+    for record_type, user in iter_backup(BACKUP_FILE):
+        if record_type == "user":
+            print(f"   📧 {user['email']} (PIN: {DEFAULT_PIN} if created by this restore)")
 
 if __name__ == "__main__":
     main()
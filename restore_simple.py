@@ -4,11 +4,13 @@ Simple Data Restoration Script for BABS10
 This script creates users and customers from scratch in the deployed backend
 """
 
-import json
 import requests
 import sys
 from datetime import datetime
 
+from auto_restore_service import DEFAULT_PIN, import_records
+from backup_codec import ndjson_lines, read_backup, summarize_backup
+
 # Configuration
 API_BASE_URL = "https://babs10.onrender.com/api"
 BACKUP_FILE = "data_backup.json"
@@ -16,12 +18,22 @@ BACKUP_FILE = "data_backup.json"
 def load_backup_data():
     """Load the backup data from file"""
     try:
-        with open(BACKUP_FILE, 'r') as f:
-            return json.load(f)
+        return read_backup(BACKUP_FILE)
     except FileNotFoundError:
         print(f"❌ Backup file {BACKUP_FILE} not found!")
         return None
-    except json.JSONDecodeError:
+    except ValueError:
+        print(f"❌ Error reading backup file {BACKUP_FILE}")
+        return None
+
+def load_backup_summary():
+    """Read the backup metadata and record counts without loading the records"""
+    try:
+        return summarize_backup(BACKUP_FILE)
+    except FileNotFoundError:
+        print(f"❌ Backup file {BACKUP_FILE} not found!")
+        return None
+    except ValueError:
         print(f"❌ Error reading backup file {BACKUP_FILE}")
         return None
 
@@ -76,20 +88,50 @@ def create_customer(customer_data, user_id):
         print(f"❌ Error creating customer {customer_data['name']}: {str(e)}")
         return False
 
+def import_backup():
+    """Create users and customers with one bulk /import request
+
+    The backup file is streamed to the backend as chunked NDJSON, with the
+    same record filtering as the auto-restore service. Returns
+    ``(users_restored, customers_created)``, or None when the backend does
+    not offer /import.
+    """
+    response = requests.post(
+        f"{API_BASE_URL}/import",
+        data=ndjson_lines(import_records(BACKUP_FILE)),
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=300
+    )
+    
+    if response.status_code in [404, 405]:
+        print("⚠️  Import endpoint unavailable, creating records one by one")
+        return None
+    if response.status_code != 200:
+        print(f"❌ Bulk import failed: {response.status_code}")
+        return 0, 0
+    
+    summary = response.json().get('summary', {})
+    users_restored = sum(summary.get('user', {}).get(key, 0) for key in ('created', 'exists'))
+    customers_created = summary.get('customer', {}).get('created', 0)
+    for result in response.json().get('results', []):
+        if result['status'] == 'failed':
+            print(f"❌ Failed to import {result['type']} #{result['index']}: {result.get('detail')}")
+    return users_restored, customers_created
+
 def main():
     """Main restoration function"""
     print("🚀 BABS10 Simple Data Restoration Script")
     print("=" * 50)
     
-    # Load backup data
-    backup_data = load_backup_data()
-    if not backup_data:
+    # Summarize backup data
+    summary = load_backup_summary()
+    if not summary:
         print("❌ Cannot proceed without backup data")
         return
     
-    print(f"📅 Backup created: {backup_data['backup_created']}")
-    print(f"👥 Users to restore: {len(backup_data['users'])}")
-    print(f"🏪 Customers to restore: {len(backup_data['customers'])}")
+    print(f"📅 Backup created: {summary.get('backup_created', 'Unknown')}")
+    print(f"👥 Users to restore: {summary['users']}")
+    print(f"🏪 Customers to restore: {summary['customers']}")
     print()
     
     # Test API connection
@@ -106,10 +148,25 @@ def main():
     
     print()
     
+    imported = import_backup()
+    if imported is not None:
+        users_restored, customers_created = imported
+        print("🎉 Restoration Complete!")
+        print(f"✅ Users restored: {users_restored}")
+        print(f"✅ Customers created: {customers_created}")
+        print()
+        print("🔗 Your app should now work at: https://babs10.vercel.app/")
+        return
+    
+    # The record-by-record fallback needs the whole backup in memory
+    backup_data = load_backup_data()
+    if not backup_data:
+        return
+    
     # Create users first
     user_id_mapping = {}
     for user in backup_data['users']:
-        user_id = create_user(user['email'], user['pin'])
+        user_id = create_user(user['email'], user.get('pin') or DEFAULT_PIN)
         if user_id:
             user_id_mapping[user['email']] = user_id
         print()
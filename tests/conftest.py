@@ -0,0 +1,29 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "backend"))
+
+# The tests run against the in-memory stores; nothing is persisted unless a test asks for it
+os.environ.pop("MONGO_URL", None)
+os.environ.pop("PRELOAD_SNAPSHOT", None)
+os.environ["LOCAL_PERSISTENCE"] = "off"
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def memory_stores():
+    """Empty in-memory stores, reset again after the test"""
+    def reset():
+        server.in_memory_users.clear()
+        server.in_memory_customers.__init__()
+        server.in_memory_status_checks.clear()
+
+    reset()
+    yield server
+    reset()
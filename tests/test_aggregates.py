@@ -0,0 +1,103 @@
+import copy
+
+import pytest
+
+from server import (
+    OrderItem, aggregates_delta, customer_aggregates, migrate_customer_orders, order_documents, put_order,
+    refresh_aggregates, remove_order,
+)
+
+
+def order(order_id, order_date, *items):
+    return {"id": order_id, "orderDate": order_date, "items": [{"name": "item", "qty": q, "price": p} for q, p in items]}
+
+
+@pytest.fixture
+def customer():
+    return refresh_aggregates({
+        "id": "c1",
+        "money_given": 500.0,
+        "orders": [
+            order("o1", "2025-07-01", (2, 30.0), (1, 12.5)),
+            order("o2", "2025-08-01", (3, 45.0)),
+        ],
+    })
+
+
+def test_delta_matches_recomputed_difference(customer):
+    old_order = customer["orders"][0]
+    new_order = order("o1", "2025-07-02", (5, 80.25))
+    before = customer_aggregates(customer)
+    after = customer_aggregates({**customer, "orders": [new_order, customer["orders"][1]]})
+
+    delta = aggregates_delta(old_order, new_order)
+
+    assert delta["order_count"] == 0
+    assert delta["item_count"] == after["item_count"] - before["item_count"]
+    assert float(delta["spend_total"]) == pytest.approx(after["spend_total"] - before["spend_total"])
+    assert float(delta["balance"]) == pytest.approx(after["balance"] - before["balance"])
+
+
+def test_delta_for_added_and_removed_orders():
+    added = aggregates_delta(None, order("o3", "2025-08-02", (1, "$1,200")))
+    removed = aggregates_delta(order("o3", "2025-08-02", (1, 10)), None)
+
+    assert (added["order_count"], added["item_count"], float(added["spend_total"])) == (1, 1, 1200.0)
+    assert (removed["order_count"], removed["item_count"], float(removed["balance"])) == (-1, -1, 10.0)
+
+
+@pytest.mark.parametrize("change", [
+    lambda c: put_order(c, order("o3", "2025-09-01", (1, 99.99))),
+    lambda c: put_order(c, order("o2", "2025-06-01", (4, 10.0))),
+    lambda c: put_order(c, order("o1", "2025-07-01", (0, 0))),
+    lambda c: remove_order(c, "o2"),
+    lambda c: remove_order(c, "o1"),
+    lambda c: remove_order(c, "missing"),
+])
+def test_shifted_aggregates_match_full_recompute(customer, change):
+    change(customer)
+
+    assert customer["aggregates"] == customer_aggregates(customer)
+
+
+def test_shift_sequence_matches_full_recompute(customer):
+    for index in range(20):
+        put_order(customer, order(f"n{index}", f"2025-09-{index + 1:02d}", (index % 3 + 1, 0.1 * index)))
+    for index in range(0, 20, 3):
+        remove_order(customer, f"n{index}")
+    remove_order(customer, "n19")
+
+    expected = customer_aggregates(copy.deepcopy(customer))
+    assert customer["aggregates"]["order_count"] == expected["order_count"]
+    assert customer["aggregates"]["item_count"] == expected["item_count"]
+    assert customer["aggregates"]["spend_total"] == pytest.approx(expected["spend_total"])
+    assert customer["aggregates"]["balance"] == pytest.approx(expected["balance"])
+    assert customer["aggregates"]["last_order_date"] == expected["last_order_date"] == "2025-09-18"
+
+
+def test_unclean_price_counts_as_zero_and_is_flagged():
+    typed = order_documents([order("o3", "2025-08-02", (2, "12,50"), (1, 30))])[0]
+    delta = aggregates_delta(None, typed)
+
+    assert typed["items"][0]["price"] == 0 and typed["items"][0]["raw_price"] == "12,50"
+    assert (delta["item_count"], float(delta["spend_total"]), delta["unparsed_items"]) == (3, 30.0, 1)
+
+
+def test_raw_text_survives_a_round_trip_until_the_number_is_edited():
+    stored = OrderItem.parse_obj({"qty": "two", "price": 5}).model_dump(mode="json")
+    resent = OrderItem.parse_obj(stored).model_dump(mode="json")
+    edited = OrderItem.parse_obj({**stored, "qty": 2}).model_dump(mode="json")
+
+    assert (resent["qty"], resent["raw_qty"]) == (0, "two")
+    assert edited["qty"] == 2 and "raw_qty" not in edited
+
+
+def test_lenient_parse_stored_earlier_is_migrated_to_zero():
+    customer = {"id": "c2", "money_given": 0, "orders": [
+        {"id": "o1", "orderDate": "2025-08-01", "items": [{"qty": 1, "price": 1250.0, "raw_price": "12,50"}]},
+    ]}
+
+    assert customer_aggregates(customer)["spend_total"] == 0.0
+    assert migrate_customer_orders(customer)
+    assert customer["orders"][0]["items"][0]["price"] == 0
+    assert customer_aggregates(customer)["unparsed_items"] == 1
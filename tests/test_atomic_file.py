@@ -0,0 +1,37 @@
+from atomic_file import AtomicFile, verify_checksum
+
+
+def write(path, content):
+    with AtomicFile(path) as target:
+        with open(target.tmp_path, "wb") as f:
+            f.write(content)
+
+
+def test_written_file_verifies_and_detects_corruption(tmp_path):
+    path = tmp_path / "data_backup.json"
+    write(path, b'{"users": []}')
+
+    assert verify_checksum(path) is True
+    path.write_bytes(b'{"users": [')
+    assert verify_checksum(path) is False
+
+
+def test_discarded_write_keeps_the_current_file(tmp_path):
+    path = tmp_path / "data_backup.json"
+    write(path, b"old")
+
+    with AtomicFile(path) as target:
+        with open(target.tmp_path, "wb") as f:
+            f.write(b"new")
+        target.discard()
+
+    assert path.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def test_reading_a_legacy_file_leaves_no_lock_file(tmp_path):
+    path = tmp_path / "merged_backup.json"
+    path.write_text("{}")
+
+    assert verify_checksum(path) is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["merged_backup.json"]
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import auto_backup_super_aggressive as service
+import server
+from backup_codec import read_backup
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """A change feed that reports the queued poll results, and no real sleeping"""
+    polls = []
+    monkeypatch.setattr(service, "feed_state", {"epoch": None, "seq": None, "retry_at": 0.0, "pending": False})
+    monkeypatch.setattr(service, "poll_change_feed", lambda: polls.pop(0))
+    monkeypatch.setattr(service.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(service, "log_message", lambda message: None)
+    return polls
+
+
+def test_failed_backup_is_retried_before_polling_again(feed, monkeypatch):
+    results = [False, True]
+    backups = []
+    monkeypatch.setattr(service, "create_backup", lambda: backups.append(1) or results.pop(0))
+    feed.append(True)
+
+    assert service.backup_on_changes() is False
+    assert service.feed_state["pending"] is True
+
+    # No poll is queued, so this would fail if the feed were polled instead of retrying
+    assert service.backup_on_changes() is True
+    assert service.feed_state["pending"] is False
+    assert len(backups) == 2
+
+
+def test_idle_poll_does_not_back_up(feed, monkeypatch):
+    monkeypatch.setattr(service, "create_backup", lambda: pytest.fail("nothing changed"))
+    feed.append(False)
+
+    assert service.backup_on_changes() is True
+    assert service.feed_state["pending"] is False
+
+
+class AppClient:
+    """Sends the service's GETs to the app in-process and records the paths"""
+
+    def __init__(self, test_client):
+        self.test_client = test_client
+        self.paths = []
+
+    def get(self, path, params=None, timeout=None, stream=False):
+        self.paths.append(path)
+        return self.test_client.get(f"/api{path}", params=params)
+
+
+@pytest.fixture
+def backup_env(memory_stores, monkeypatch, tmp_path):
+    monkeypatch.setattr(service, "BACKUP_DIR", str(tmp_path))
+    monkeypatch.setattr(service, "STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(service, "STATE_FILE", str(tmp_path / "backup_state.json"))
+    monkeypatch.setattr(service, "MAIN_BACKUP_FILE", str(tmp_path / "data_backup.json"))
+    monkeypatch.setattr(service, "log_message", lambda message: None)
+    with TestClient(server.app) as test_client:
+        app_client = AppClient(test_client)
+        monkeypatch.setattr(service, "client", app_client)
+        yield test_client, app_client
+
+
+def exported(test_client):
+    records = [json.loads(line) for line in test_client.get("/api/export").text.splitlines() if line]
+    return without_timestamps([(record["type"], record["data"]) for record in records])
+
+
+def without_timestamps(records):
+    # Order writes bump the stored customer's updated_at, which the order change entries do not carry
+    return sorted(
+        (record_type, json.dumps({k: v for k, v in data.items() if k != "updated_at"}, sort_keys=True))
+        for record_type, data in records
+    )
+
+
+def test_backups_after_the_first_only_download_changes(backup_env):
+    test_client, app_client = backup_env
+    user = test_client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"}).json()
+    params = {"user_id": user["id"]}
+    shop = test_client.post("/api/customers", params=params, json={"name": "Shop"}).json()
+    cafe = test_client.post("/api/customers", params=params, json={"name": "Cafe"}).json()
+
+    assert service.create_backup()
+    assert "/export" in app_client.paths
+
+    app_client.paths.clear()
+    order = {"id": "o1", "orderDate": "2025-08-01", "items": [{"name": "tea", "qty": 2, "price": 30}]}
+    test_client.post(f"/api/customers/{shop['id']}/orders", params=params, json=order)
+    test_client.patch(f"/api/customers/{shop['id']}/orders/o1", params=params, json={"items": [{"name": "tea", "qty": 3, "price": 45}]})
+    test_client.delete(f"/api/customers/{cafe['id']}", params=params)
+    test_client.post("/api/customers", params=params, json={"name": "Deli", "money_given": 20})
+    test_client.post("/api/users", json={"email": "bob@example.com", "pin": "1234"})
+
+    assert service.create_backup()
+    assert set(app_client.paths) == {"/changes"}
+    backup = read_backup(service.MAIN_BACKUP_FILE)
+    backed_up = [("user", u) for u in backup["users"]] + [("customer", c) for c in backup["customers"]]
+    assert without_timestamps(backed_up) == exported(test_client)
+
+    app_client.paths.clear()
+    assert service.create_backup()
+    assert app_client.paths == ["/changes"]
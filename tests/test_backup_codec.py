@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from backup_codec import (
+    DEFAULT_CODEC,
+    MAGIC,
+    BackupFormatError,
+    BackupWriter,
+    available_codecs,
+    backup_records,
+    codec_for_path,
+    detect_codec,
+    iter_backup,
+    read_backup,
+    summarize_backup,
+    write_backup,
+)
+
+BACKUP = {
+    "backup_timestamp": "2025-08-24T13:09:46",
+    "source": "test",
+    "users": [{"id": "u1", "email": "ann@example.com", "name": "Ann"}],
+    "customers": [
+        {
+            "id": "c1", "user_id": "u1", "name": "Shop ☕", "money_given": 120.5,
+            "orders": [{"id": "o1", "orderDate": "2025-08-01", "items": [{"name": "tea", "qty": 2, "price": 30.0}]}],
+        },
+        {"id": "c2", "user_id": "u1", "name": "Cafe", "money_given": 0, "orders": []},
+    ],
+}
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_round_trip(tmp_path, codec):
+    path = tmp_path / "backup.bin"
+    write_backup(path, BACKUP, codec)
+
+    assert read_backup(path) == BACKUP
+    with open(path, "rb") as f:
+        assert detect_codec(f) == codec
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_streaming_writer_matches_write_backup(tmp_path, codec):
+    path = tmp_path / "streamed.bin"
+    records = backup_records(BACKUP)
+    _, metadata = next(records)
+    with BackupWriter(path, metadata, codec) as writer:
+        for record_type, data in records:
+            writer.write(record_type, data)
+
+    assert writer.counts == {"users": 1, "customers": 2}
+    assert list(iter_backup(path)) == list(backup_records(BACKUP))
+    assert summarize_backup(path) == {"backup_timestamp": "2025-08-24T13:09:46", "source": "test", "users": 1, "customers": 2}
+
+
+def test_unknown_codec_and_newer_version_are_rejected(tmp_path):
+    with pytest.raises(BackupFormatError):
+        write_backup(tmp_path / "x.bin", BACKUP, "xml")
+
+    path = tmp_path / "future.bin"
+    path.write_bytes(MAGIC + bytes([99, 1]))
+    with pytest.raises(BackupFormatError):
+        read_backup(path)
+
+
+@pytest.mark.parametrize("name, codec", [
+    ("data_backup.json", "json"),
+    ("super_backup_20250921_001444.json", "json"),
+    ("export.ndjson", "ndjson"),
+    ("export.ndjson.gz", "ndjson.gz"),
+    ("backup.bin", DEFAULT_CODEC),
+])
+def test_codec_follows_the_file_name(name, codec):
+    assert codec_for_path(name) == codec
+
+
+def test_json_named_backups_stay_plain_json(tmp_path):
+    path = tmp_path / "data_backup.json"
+    write_backup(path, BACKUP)
+
+    with open(path) as f:
+        assert json.load(f) == BACKUP
@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import server
+from server import BackupChangeFeed
+
+
+def test_waiting_poll_returns_as_soon_as_a_change_is_published():
+    feed = BackupChangeFeed(max_events=10)
+
+    async def run():
+        poll = asyncio.ensure_future(feed.wait(0, timeout=5))
+        await asyncio.sleep(0.01)
+        assert not poll.done()
+        feed.publish("data_changed", changes=1)
+        return await asyncio.wait_for(poll, 1)
+
+    result = asyncio.run(run())
+
+    assert [event["seq"] for event in result["changes"]] == [1]
+    assert not result["truncated"]
+
+
+def test_idle_poll_times_out_empty_and_old_positions_are_truncated():
+    feed = BackupChangeFeed(max_events=2)
+
+    idle = asyncio.run(feed.wait(0, timeout=0.01))
+    for _ in range(3):
+        feed.publish("data_changed")
+
+    assert idle["changes"] == [] and idle["seq"] == 0
+    assert feed.since(0)["truncated"]
+    assert not feed.since(1)["truncated"]
+
+
+def test_route_starts_new_subscribers_at_the_current_position(memory_stores):
+    with TestClient(server.app) as client:
+        start = client.get("/api/backup/changes").json()
+        client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"})
+        changes = client.get("/api/backup/changes", params={"since": start["seq"], "timeout": 1}).json()
+
+    assert start["changes"] == []
+    assert changes["epoch"] == start["epoch"]
+    assert [event["action"] for event in changes["changes"]] == ["data_changed"]
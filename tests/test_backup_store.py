@@ -0,0 +1,41 @@
+from atomic_file import verify_checksum
+from backup_codec import read_backup
+from backup_store import ContentAddressedStore, export_snapshot
+
+BACKUP = {
+    "backup_created": "2025-08-24T13:09:46",
+    "backup_type": "manual",
+    "users": [{"id": "u1", "email": "ann@example.com"}],
+    "customers": [{"id": "c1", "user_id": "u1", "name": "Shop", "orders": []}],
+}
+
+
+def test_snapshots_share_unchanged_records(tmp_path):
+    store = ContentAddressedStore(tmp_path / "store")
+    store.put_snapshot(BACKUP, snapshot_id="1")
+    changed = {**BACKUP, "customers": [{**BACKUP["customers"][0], "name": "Cafe"}]}
+
+    _, new_objects = store.put_snapshot(changed, snapshot_id="2")
+
+    assert new_objects == 1
+    assert store.load_snapshot()["customers"][0]["name"] == "Cafe"
+    assert store.load_snapshot("1")["customers"][0]["name"] == "Shop"
+
+
+def test_exported_snapshot_is_a_restorable_backup_file(tmp_path):
+    store = ContentAddressedStore(tmp_path / "store")
+    store.put_snapshot(BACKUP, snapshot_id="1")
+    store.put_snapshot({**BACKUP, "users": []}, snapshot_id="2")
+    path = tmp_path / "data_backup.json"
+
+    assert export_snapshot(store, path, "1") == "1"
+
+    assert read_backup(path) == {**BACKUP, "snapshot_id": "1"}
+    assert verify_checksum(path) is True
+
+
+def test_export_of_an_empty_store_writes_nothing(tmp_path):
+    path = tmp_path / "data_backup.json"
+
+    assert export_snapshot(ContentAddressedStore(tmp_path / "store"), path) is None
+    assert not path.exists()
@@ -0,0 +1,74 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import server
+from server import ChangeLog, change_entry
+
+
+def change(index):
+    return change_entry("update", "customers", f"c{index}", "u1", {"id": f"c{index}"})
+
+
+def read(log, since, limit=100):
+    return asyncio.run(log.read(since, limit))
+
+
+def test_entries_page_in_order_within_one_epoch():
+    log = ChangeLog(max_entries=100)
+    asyncio.run(log.append([change(index) for index in range(5)]))
+
+    first = read(log, 0, limit=3)
+    rest = read(log, first["next"], limit=3)
+
+    assert [entry["id"] for entry in first["changes"]] == ["c0", "c1", "c2"]
+    assert first["has_more"] and not first["truncated"]
+    assert [entry["id"] for entry in rest["changes"]] == ["c3", "c4"]
+    assert not rest["has_more"]
+    assert rest["epoch"] == first["epoch"]
+
+
+def test_new_process_starts_a_new_epoch():
+    assert read(ChangeLog(max_entries=10), 0)["epoch"] != read(ChangeLog(max_entries=10), 0)["epoch"]
+
+
+def test_reader_behind_the_ring_is_told_it_was_truncated():
+    log = ChangeLog(max_entries=3)
+    asyncio.run(log.append([change(index) for index in range(6)]))
+
+    behind = read(log, 1)
+    caught_up = read(log, 6)
+
+    assert behind["truncated"]
+    assert not caught_up["truncated"] and caught_up["changes"] == []
+
+
+def test_readers_do_not_see_past_an_append_in_flight():
+    log = ChangeLog(max_entries=100)
+
+    async def run():
+        # An append that has its sequence number but has not stored its entry yet
+        slow_seq = await log._next_seq(1)
+        log._pending.add(slow_seq)
+        await log.append([change(1)])
+        during = await log.read(0, 100)
+        log._insert({"seq": slow_seq, **change(0)})
+        log._pending.discard(slow_seq)
+        after = await log.read(0, 100)
+        return during, after
+
+    during, after = asyncio.run(run())
+
+    assert during["changes"] == []
+    assert [entry["seq"] for entry in after["changes"]] == [1, 2]
+
+
+def test_changes_route_reports_writes(memory_stores):
+    with TestClient(server.app) as client:
+        start = client.get("/api/changes", params={"since": server.change_log.seq}).json()
+        user = client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"}).json()
+        feed = client.get("/api/changes", params={"since": start["next"]}).json()
+
+    assert feed["epoch"] == start["epoch"]
+    assert [(entry["op"], entry["collection"], entry["id"]) for entry in feed["changes"]] == [("create", "users", user["id"])]
+    assert feed["head"] == feed["next"] == start["head"] + 1
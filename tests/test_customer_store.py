@@ -0,0 +1,39 @@
+from server import InMemoryCustomerStore
+
+
+def customer(customer_id, user_id, name):
+    return {"id": customer_id, "user_id": user_id, "name": name}
+
+
+def test_lookups_are_scoped_to_the_owning_user():
+    store = InMemoryCustomerStore()
+    store.add(customer("c1", "u1", "Shop"))
+    store.add(customer("c2", "u2", "Shop"))
+
+    assert store.get("c1", "u1")["name"] == "Shop"
+    assert store.get("c1", "u2") is None
+    assert store.delete("c1", "u2") is None
+    assert [c["id"] for c in store.list_for_user("u2")] == ["c2"]
+
+
+def test_user_listing_pages_by_id():
+    store = InMemoryCustomerStore()
+    for customer_id in ("c3", "c1", "c2"):
+        store.add(customer(customer_id, "u1", customer_id))
+    store.add(customer("c0", "u2", "other"))
+
+    assert [c["id"] for c in store.list_for_user("u1", limit=2)] == ["c1", "c2"]
+    assert [c["id"] for c in store.list_for_user("u1", after="c2")] == ["c3"]
+
+
+def test_put_and_delete_keep_every_index_in_step():
+    store = InMemoryCustomerStore()
+    store.add(customer("c1", "u1", "Shop"))
+    store.put(customer("c1", "u1", "Cafe"))
+
+    assert "u1_Cafe" in store and "u1_Shop" not in store
+    assert len(store) == 1
+
+    assert store.delete("c1", "u1")["name"] == "Cafe"
+    assert "u1_Cafe" not in store
+    assert store.list_for_user("u1") == [] and len(store) == 0
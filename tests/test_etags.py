@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+
+import server
+
+
+def test_unchanged_reads_get_304_until_a_write(memory_stores):
+    with TestClient(server.app) as client:
+        user = client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"}).json()
+        params = {"user_id": user["id"]}
+        first = client.get("/api/customers", params=params)
+        etag = first.headers["ETag"]
+
+        unchanged = client.get("/api/customers", params=params, headers={"If-None-Match": etag})
+        client.post("/api/customers", params=params, json={"name": "Shop"})
+        changed = client.get("/api/customers", params=params, headers={"If-None-Match": etag})
+
+    assert first.json() == []
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert [customer["name"] for customer in changed.json()] == ["Shop"]
+
+
+def test_user_etag_changes_only_with_that_users_writes(memory_stores):
+    with TestClient(server.app) as client:
+        client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"})
+        etag = client.get("/api/users/ann@example.com").headers["ETag"]
+        users_etag = client.get("/api/users").headers["ETag"]
+        client.post("/api/users", json={"email": "bob@example.com", "pin": "1234"})
+
+        ann = client.get("/api/users/ann@example.com", headers={"If-None-Match": etag})
+        users = client.get("/api/users", headers={"If-None-Match": users_etag})
+
+    assert ann.status_code == 304
+    assert users.status_code == 200 and len(users.json()) == 2
+
+
+def test_no_etags_in_mongo_mode(monkeypatch):
+    # Writes from other processes never reach these counters
+    monkeypatch.setattr(server, "mongo_available", True)
+
+    assert server.data_versions.etag("users") is None
+    assert server.data_versions.metrics()["enabled"] is False
@@ -0,0 +1,43 @@
+import requests
+
+from http_client import BackendClient
+
+
+def response(status_code, etag, body=b""):
+    result = requests.Response()
+    result.status_code = status_code
+    result.headers["ETag"] = etag
+    result._content = body
+    return result
+
+
+def revalidating_backend(client):
+    """Answer every path with a fixed ETag, and 304 when the client already has it"""
+    sent = []
+
+    def request(method, path, headers=None, **kwargs):
+        etag = f'"{path}"'
+        sent.append((path, (headers or {}).get("If-None-Match")))
+        if (headers or {}).get("If-None-Match") == etag:
+            return response(304, etag)
+        return response(200, etag, path.encode())
+
+    client.request = request
+    return sent
+
+
+def test_etag_cache_keeps_only_the_most_recently_used_responses():
+    client = BackendClient("http://backend/api", etag_cache_size=2)
+    sent = revalidating_backend(client)
+
+    client.get("/a")
+    client.get("/b")
+    assert client.get("/a").content == b"/a"
+    client.get("/c")
+    sent.clear()
+    client.get("/a")
+    client.get("/b")
+
+    assert sent == [("/a", '"/a"'), ("/b", None)]
+    assert len(client._etag_responses) == 2
+    assert client.not_modified == 2
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from auto_restore_service import import_records
+from backup_codec import ndjson_lines, write_backup
+
+
+@pytest.fixture
+def client(memory_stores):
+    with TestClient(server.app) as client:
+        yield client
+
+
+def post_import(client, body):
+    response = client.post("/api/import", content=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def statuses(payload):
+    return [(result["index"], result["type"], result["status"]) for result in payload["results"]]
+
+
+def test_import_reports_every_record(client):
+    records = [
+        {"type": "user", "data": {"id": "src-1", "email": "ann@example.com", "pin": "1234"}},
+        {"type": "user", "data": {"id": "src-2", "email": "bob@example.com"}},
+        {"type": "user", "data": {"email": "ann@example.com", "pin": "9999"}},
+        {"type": "customer", "data": {"user_id": "src-1", "name": "Shop", "orders": []}},
+        {"type": "customer", "data": {"user_id": "src-1", "name": "Shop"}},
+        {"type": "customer", "data": {"user_id": "src-2", "name": "Cafe"}},
+        {"type": "customer", "data": {"name": "Orphan"}},
+        {"type": "invoice", "data": {}},
+    ]
+
+    payload = post_import(client, json.dumps(records))
+
+    assert statuses(payload) == [
+        (0, "user", "created"),
+        (1, "user", "failed"),
+        (2, "user", "exists"),
+        (3, "customer", "created"),
+        (4, "customer", "exists"),
+        (5, "customer", "failed"),
+        (6, "customer", "failed"),
+        (7, "invoice", "failed"),
+    ]
+    user_id = payload["results"][0]["id"]
+    stored = server.in_memory_customers.get(payload["results"][3]["id"], user_id)
+    assert stored["name"] == "Shop"
+    assert payload["summary"]["user"] == {"created": 1, "exists": 1, "failed": 1}
+    assert payload["summary"]["customer"] == {"created": 1, "exists": 1, "failed": 2}
+
+
+def test_import_existing_user_and_ndjson_body(client):
+    post_import(client, json.dumps([{"type": "user", "data": {"email": "ann@example.com", "pin": "1234"}}]))
+    lines = [
+        {"type": "user", "data": {"id": "old-id", "email": "ann@example.com"}},
+        {"type": "customer", "data": {"user_id": "old-id", "name": "Shop", "money_given": 50}},
+    ]
+
+    payload = post_import(client, "\n".join(json.dumps(line) for line in lines))
+
+    assert statuses(payload) == [(0, "user", "exists"), (1, "customer", "created")]
+    user_id = payload["results"][0]["id"]
+    assert server.in_memory_customers.get(payload["results"][1]["id"], user_id)["aggregates"]["balance"] == 50.0
+
+
+def test_legacy_backup_restores_through_import_records(client, tmp_path):
+    backup_file = tmp_path / "data_backup.json"
+    write_backup(backup_file, {
+        "backup_created": "2025-08-24T13:09:46",
+        "users": [{"id": "old-user", "email": "ann@example.com", "created_at": "2025-08-24T12:45:39"}],
+        "customers": [
+            {"id": "old-1", "name": "Grandma", "money_given": 0.0, "total_spent": 0.0, "orders": []},
+            {"id": "old-2", "user_id": "old-user", "name": "Shop", "orders": []},
+        ],
+    }, "json")
+
+    payload = post_import(client, b"".join(ndjson_lines(import_records(backup_file))))
+
+    assert statuses(payload) == [(0, "user", "created"), (1, "customer", "created"), (2, "customer", "created")]
+    user_id = payload["results"][0]["id"]
+    assert {customer["name"] for customer in server.in_memory_customers.list_for_user(user_id)} == {"Grandma", "Shop"}
+
+
+def test_import_rejects_unparseable_body(client):
+    response = client.post("/api/import", content="{not json")
+
+    assert response.status_code == 400
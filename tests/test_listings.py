@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client(memory_stores):
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def test_customer_pages_follow_the_next_cursor(client):
+    user = client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"}).json()
+    params = {"user_id": user["id"]}
+    created = {client.post("/api/customers", params=params, json={"name": name}).json()["id"] for name in "ABC"}
+
+    first = client.get("/api/customers", params={**params, "limit": 2})
+    second = client.get("/api/customers", params={**params, "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert len(first.json()) == 2
+    assert len(second.json()) == 1 and "X-Next-Cursor" not in second.headers
+    assert {c["id"] for c in first.json() + second.json()} == created
+
+
+def test_fields_project_rows_and_reject_unknown_fields(client):
+    user = client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"}).json()
+    params = {"user_id": user["id"]}
+    client.post("/api/customers", params=params, json={"name": "Shop", "money_given": 50})
+
+    rows = client.get("/api/customers", params={**params, "fields": "name,money_given"}).json()
+    users = client.get("/api/users", params={"fields": "email"}).json()
+
+    assert rows == [{"id": rows[0]["id"], "name": "Shop", "money_given": 50.0}]
+    assert users == [{"id": user["id"], "email": "ann@example.com"}]
+    assert client.get("/api/users", params={"fields": "pin"}).status_code == 400
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from datetime import datetime
+
+from server import LocalPersistence
+
+NOW = datetime(2025, 8, 24, 13, 9, 46)
+
+
+def user(email="a@b.co"):
+    return {"id": f"user-{email}", "email": email, "name": "A", "pin": "hash", "created_at": NOW, "updated_at": NOW}
+
+
+def customer(customer_id, name, orders=()):
+    return {
+        "id": customer_id, "user_id": "user-a@b.co", "name": name, "money_given": 100.0, "total_spent": 0.0,
+        "orders": list(orders), "created_at": NOW, "updated_at": NOW,
+    }
+
+
+def order(order_id, qty, price, order_date="2025-08-01"):
+    return {"id": order_id, "orderDate": order_date, "items": [{"name": "tea", "qty": qty, "price": price}]}
+
+
+def write_log(store, entries, close=False):
+    """Apply writes to the in-memory stores and log them, as the routes do"""
+    async def run():
+        for op, data in entries:
+            store.apply(op, data)
+            await store.log(op, data)
+        if close:
+            # In the loop that started them, so background snapshots finish rather than get cancelled
+            await store.close()
+    asyncio.run(run())
+
+
+def reopen(memory_stores, directory):
+    """Drop the in-memory state and recover it from disk, as a restart would"""
+    memory_stores.in_memory_users.clear()
+    memory_stores.in_memory_customers.__init__()
+    memory_stores.in_memory_status_checks.clear()
+    store = LocalPersistence(directory, snapshot_every=1000, fsync=False)
+    store.load()
+    return store
+
+
+def test_log_replays_after_restart(memory_stores, tmp_path):
+    store = LocalPersistence(tmp_path, snapshot_every=1000, fsync=True)
+    store.load()
+    write_log(store, [
+        ("put_user", user()),
+        ("put_customer", customer("c1", "Ann")),
+        ("put_customer", customer("c2", "Bob")),
+        ("put_order", {"customer_id": "c1", "user_id": "user-a@b.co", "order": order("o1", 2, 30), "updated_at": NOW}),
+        ("delete_customer", {"id": "c2", "user_id": "user-a@b.co"}),
+    ])
+
+    store = reopen(memory_stores, tmp_path)
+
+    assert store.recovery["replayed_log_entries"] == 5
+    assert memory_stores.in_memory_users["a@b.co"]["created_at"] == NOW
+    assert len(memory_stores.in_memory_customers) == 1
+    ann = memory_stores.in_memory_customers.get("c1", "user-a@b.co")
+    assert [o["id"] for o in ann["orders"]] == ["o1"]
+    assert ann["aggregates"]["item_count"] == 2
+    assert ann["aggregates"]["balance"] == 70.0
+
+
+def test_torn_last_line_is_dropped_and_truncated(memory_stores, tmp_path):
+    store = LocalPersistence(tmp_path, snapshot_every=1000, fsync=False)
+    store.load()
+    write_log(store, [("put_user", user()), ("put_customer", customer("c1", "Ann"))])
+    store._wal.close()
+    intact_size = store.wal_path.stat().st_size
+    with open(store.wal_path, "ab") as f:
+        f.write(b'{"op":"put_customer","data":{"id":"c2"')
+
+    store = reopen(memory_stores, tmp_path)
+
+    assert store.recovery["replayed_log_entries"] == 2
+    assert len(memory_stores.in_memory_customers) == 1
+    assert store.wal_path.stat().st_size == intact_size
+    write_log(store, [("put_customer", customer("c3", "Cat"))])
+    store._wal.close()
+    lines = store.wal_path.read_bytes().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[-1])["data"]["id"] == "c3"
+
+
+def test_snapshot_drops_covered_log_entries(memory_stores, tmp_path):
+    store = LocalPersistence(tmp_path, snapshot_every=3, fsync=True)
+    store.load()
+
+    write_log(store, [("put_user", user())] + [("put_customer", customer(f"c{i}", f"Name {i}")) for i in range(5)], close=True)
+
+    assert store.snapshots >= 1
+    assert store.wal_path.read_bytes() == b""
+    store = reopen(memory_stores, tmp_path)
+    assert store.recovery["replayed_log_entries"] == 0
+    assert len(memory_stores.in_memory_customers) == 5
+
+
+def test_status_check_replay_is_idempotent(memory_stores, tmp_path):
+    check = {"id": "s1", "client_name": "probe", "timestamp": NOW}
+    store = LocalPersistence(tmp_path, snapshot_every=1000, fsync=False)
+    store.load()
+
+    write_log(store, [("put_status_check", check)])
+    # A crash between writing the snapshot and dropping the log replays this entry on top of it
+    store._write_snapshot(store.capture_state())
+
+    reopen(memory_stores, tmp_path)
+
+    assert [c["id"] for c in memory_stores.in_memory_status_checks] == ["s1"]
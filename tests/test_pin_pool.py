@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from server import PinWorkerPool
+
+
+def test_hash_and_verify_round_trip():
+    pool = PinWorkerPool(max_workers=2, max_queue=4)
+
+    async def run():
+        hashed = await pool.hash("1234")
+        return hashed, await pool.verify("1234", hashed), await pool.verify("0000", hashed)
+
+    try:
+        hashed, right, wrong = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert hashed != "1234" and right and not wrong
+    assert pool.metrics()["completed"] == 3
+
+
+def test_calls_beyond_the_queue_are_rejected():
+    pool = PinWorkerPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        busy = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        metrics = pool.metrics()
+        with pytest.raises(HTTPException) as rejected:
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(busy, queued)
+        return metrics, rejected.value.status_code
+
+    try:
+        metrics, status_code = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert (metrics["in_flight"], metrics["queued"]) == (1, 1)
+    assert status_code == 503
+    assert pool.metrics()["rejected"] == 1 and pool.metrics()["completed"] == 2
@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+import server
+from server import VerifiedCredentialCache
+
+
+def test_repeat_signin_skips_bcrypt_but_wrong_pins_do_not(memory_stores):
+    with TestClient(server.app) as client:
+        client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"})
+        hits = server.signin_cache.hits
+        completed = server.pin_pool.metrics()["completed"]
+
+        first = client.post("/api/users/signin", json={"email": "ann@example.com", "pin": "1234"})
+        again = client.post("/api/users/signin", json={"email": "ann@example.com", "pin": "1234"})
+        wrong = [client.post("/api/users/signin", json={"email": "ann@example.com", "pin": "0000"}) for _ in range(2)]
+
+    assert first.status_code == again.status_code == 200
+    assert [response.status_code for response in wrong] == [401, 401]
+    assert server.signin_cache.hits == hits + 1
+    # The first sign-in and both wrong PINs ran bcrypt
+    assert server.pin_pool.metrics()["completed"] == completed + 3
+
+
+def test_entries_end_with_a_new_hash_invalidation_or_ttl():
+    cache = VerifiedCredentialCache(ttl_seconds=60, max_entries=10)
+    cache.add("Ann@example.com", "1234", "hash-1")
+
+    assert cache.check("ann@example.com", "1234", "hash-1")
+    assert not cache.check("ann@example.com", "1234", "hash-2")
+
+    cache.add("ann@example.com", "1234", "hash-1")
+    cache.invalidate("ANN@example.com")
+    assert not cache.check("ann@example.com", "1234", "hash-1")
+
+    expired = VerifiedCredentialCache(ttl_seconds=-1, max_entries=10)
+    expired.add("ann@example.com", "1234", "hash-1")
+    assert not expired.check("ann@example.com", "1234", "hash-1")
+
+
+def test_oldest_entries_are_evicted_past_the_size_limit():
+    cache = VerifiedCredentialCache(ttl_seconds=60, max_entries=2)
+    for pin in ("1", "2", "3"):
+        cache.add("ann@example.com", pin, "hash")
+
+    assert not cache.check("ann@example.com", "1", "hash")
+    assert cache.check("ann@example.com", "3", "hash")
+    assert cache.metrics()["entries"] == 2
@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+
+import server
+
+
+def test_summary_is_cached_until_a_customer_write(memory_stores):
+    with TestClient(server.app) as client:
+        user = client.post("/api/users", json={"email": "ann@example.com", "pin": "1234"}).json()
+        params = {"user_id": user["id"]}
+        shop = client.post("/api/customers", params=params, json={"name": "Shop", "money_given": 100}).json()
+        client.post("/api/customers", params=params, json={"name": "Cafe", "money_given": 20})
+        order = {"id": "o1", "orderDate": "2025-08-01", "items": [{"desc": "tea", "qty": 2, "price": 150}]}
+        client.post(f"/api/customers/{shop['id']}/orders", params=params, json=order)
+
+        first = client.get(f"/api/users/{user['id']}/summary").json()
+        hits = server.user_summary_cache.hits
+        cached = client.get(f"/api/users/{user['id']}/summary").json()
+        client.delete(f"/api/customers/{shop['id']}", params=params)
+        after_write = client.get(f"/api/users/{user['id']}/summary").json()
+        missing = client.get("/api/users/nobody/summary")
+
+    assert (first["customer_count"], first["order_count"]) == (2, 1)
+    assert (first["total_money_given"], first["total_spent"]) == (120.0, 150.0)
+    assert (first["balance"], first["outstanding_balance"]) == (-30.0, 50.0)
+    assert first["last_order_date"] == "2025-08-01"
+    assert cached == first and server.user_summary_cache.hits == hits + 1
+    assert (after_write["customer_count"], after_write["total_spent"]) == (1, 0.0)
+    assert [activity["name"] for activity in after_write["recent_activity"]] == ["Cafe"]
+    assert missing.status_code == 404
@@ -4,17 +4,20 @@ Ultra Aggressive Keep-Alive for Render Free Tier
 This service pings the backend every 2 minutes to prevent sleep
 """
 
-import requests
 import time
 import datetime
 import signal
 import sys
 
+from http_client import BackendClient
+
 # Configuration
 BACKEND_URL = "https://babs10.onrender.com/api"
 PING_INTERVAL = 120  # 2 minutes
 LOG_FILE = "ultra_keep_alive.log"
 
+client = BackendClient(BACKEND_URL, retries=0)  # Revalidates /users by ETag instead of re-downloading it
+
 def log_message(message):
     """Log message to file and print to console"""
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -40,7 +43,7 @@ def ping_backend():
         
         for endpoint in endpoints:
             try:
-                response = requests.get(f"{BACKEND_URL}{endpoint}", timeout=30)
+                response = client.get(endpoint, timeout=30)
                 if response.status_code == 200:
                     log_message(f"✅ {endpoint}: {response.status_code}")
                 else: